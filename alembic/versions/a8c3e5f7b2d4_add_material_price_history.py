@@ -0,0 +1,66 @@
+"""add_material_price_history
+
+Revision ID: a8c3e5f7b2d4
+Revises: f2b8d4a6c1e9
+Create Date: 2026-10-17 15:12:08.331590
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8c3e5f7b2d4'
+down_revision: Union[str, None] = 'f2b8d4a6c1e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Append-only price intervals per material
+    op.create_table(
+        'material_price_history',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('material_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('precio_base', sa.Numeric(10, 2), nullable=False),
+        sa.Column('unidad_base', sa.String(), nullable=False),
+        sa.Column('precio_unidad_pequena', sa.Numeric(12, 6), nullable=False),
+        sa.Column('valid_from', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('valid_to', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['material_id'], ['materials.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_material_price_history_id', 'material_price_history', ['id'], unique=False)
+    op.create_index('ix_material_price_history_user_id', 'material_price_history', ['user_id'], unique=False)
+    op.create_index(
+        'ix_material_price_history_interval', 'material_price_history',
+        ['material_id', 'valid_from', 'valid_to'], unique=False
+    )
+
+    # Seed one interval per existing material with its current price, open
+    # since the material was created (closed at deletion for soft-deleted ones)
+    op.execute(
+        """
+        INSERT INTO material_price_history
+            (material_id, user_id, version, precio_base, unidad_base, precio_unidad_pequena, valid_from, valid_to)
+        SELECT id, user_id, COALESCE(version, 1), precio_base, COALESCE(unidad_base, 'kg'), precio_unidad_pequena,
+               COALESCE(created_at, CURRENT_TIMESTAMP),
+               CASE WHEN is_active = false THEN deleted_at END
+        FROM materials
+        WHERE precio_unidad_pequena IS NOT NULL
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_material_price_history_interval', table_name='material_price_history')
+    op.drop_index('ix_material_price_history_user_id', table_name='material_price_history')
+    op.drop_index('ix_material_price_history_id', table_name='material_price_history')
+    op.drop_table('material_price_history')
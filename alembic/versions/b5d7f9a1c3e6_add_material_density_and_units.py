@@ -0,0 +1,47 @@
+"""add_material_density_and_units
+
+Revision ID: b5d7f9a1c3e6
+Revises: a8c3e5f7b2d4
+Create Date: 2026-10-17 16:40:27.518304
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5d7f9a1c3e6'
+down_revision: Union[str, None] = 'a8c3e5f7b2d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Density in g/ml; NULL keeps the previous 1 l = 1000 g behaviour
+    op.add_column('materials', sa.Column('densidad', sa.Numeric(10, 4), nullable=True))
+
+    # Material-specific units defined in terms of a standard unit
+    op.create_table(
+        'material_units',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('material_id', sa.Integer(), nullable=False),
+        sa.Column('nombre', sa.String(length=50), nullable=False),
+        sa.Column('cantidad', sa.Numeric(12, 4), nullable=False),
+        sa.Column('unidad', sa.String(length=20), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['material_id'], ['materials.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('material_id', 'nombre', name='uq_material_units_material_nombre')
+    )
+    op.create_index('ix_material_units_id', 'material_units', ['id'], unique=False)
+    op.create_index('ix_material_units_material_id', 'material_units', ['material_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_material_units_material_id', table_name='material_units')
+    op.drop_index('ix_material_units_id', table_name='material_units')
+    op.drop_table('material_units')
+    op.drop_column('materials', 'densidad')
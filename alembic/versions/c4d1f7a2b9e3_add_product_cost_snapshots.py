@@ -0,0 +1,56 @@
+"""add_product_cost_snapshots
+
+Revision ID: c4d1f7a2b9e3
+Revises: remove_proforma_tables
+Create Date: 2026-10-17 09:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d1f7a2b9e3'
+down_revision: Union[str, None] = 'remove_proforma_tables'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Read model with precomputed product costs and tier prices
+    op.create_table(
+        'product_cost_snapshots',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('costo_materiales', sa.Numeric(20, 10), nullable=False),
+        sa.Column('costo_por_gramo', sa.Numeric(20, 10), nullable=False),
+        sa.Column('costo_paquete', sa.Numeric(20, 10), nullable=False),
+        sa.Column('precio_publico', sa.Numeric(20, 10), nullable=False),
+        sa.Column('precio_mayorista', sa.Numeric(20, 10), nullable=False),
+        sa.Column('precio_distribuidor', sa.Numeric(20, 10), nullable=False),
+        sa.Column('precio_publico_con_iva', sa.Numeric(20, 10), nullable=False),
+        sa.Column('precio_mayorista_con_iva', sa.Numeric(20, 10), nullable=False),
+        sa.Column('precio_distribuidor_con_iva', sa.Numeric(20, 10), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_product_cost_snapshots_id', 'product_cost_snapshots', ['id'], unique=False)
+    op.create_index('ix_product_cost_snapshots_product_id', 'product_cost_snapshots', ['product_id'], unique=True)
+    op.create_index('ix_product_cost_snapshots_user_id', 'product_cost_snapshots', ['user_id'], unique=False)
+
+    # Reverse index used to find the products affected by a material price change
+    op.create_index('ix_product_materials_material_product', 'product_materials', ['material_id', 'product_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_product_materials_material_product', table_name='product_materials')
+    op.drop_index('ix_product_cost_snapshots_user_id', table_name='product_cost_snapshots')
+    op.drop_index('ix_product_cost_snapshots_product_id', table_name='product_cost_snapshots')
+    op.drop_index('ix_product_cost_snapshots_id', table_name='product_cost_snapshots')
+    op.drop_table('product_cost_snapshots')
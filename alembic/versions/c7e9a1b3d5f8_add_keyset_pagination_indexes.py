@@ -0,0 +1,34 @@
+"""add_keyset_pagination_indexes
+
+Revision ID: c7e9a1b3d5f8
+Revises: b5d7f9a1c3e6
+Create Date: 2026-10-17 18:05:12.604117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7e9a1b3d5f8'
+down_revision: Union[str, None] = 'b5d7f9a1c3e6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # (filter, sort key, id) so each page is an index range scan, newest first
+    op.create_index('ix_inventory_movements_inventory_created', 'inventory_movements',
+                    ['inventory_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_inventory_egresos_inventory_fecha', 'inventory_egresos',
+                    ['inventory_id', 'fecha_egreso', 'id'], unique=False)
+    op.create_index('ix_inventory_egresos_user_fecha', 'inventory_egresos',
+                    ['user_id', 'fecha_egreso', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_inventory_egresos_user_fecha', table_name='inventory_egresos')
+    op.drop_index('ix_inventory_egresos_inventory_fecha', table_name='inventory_egresos')
+    op.drop_index('ix_inventory_movements_inventory_created', table_name='inventory_movements')
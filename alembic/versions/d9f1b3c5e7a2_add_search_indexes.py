@@ -0,0 +1,45 @@
+"""add_search_indexes
+
+Revision ID: d9f1b3c5e7a2
+Revises: c7e9a1b3d5f8
+Create Date: 2026-10-17 19:20:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd9f1b3c5e7a2'
+down_revision: Union[str, None] = 'c7e9a1b3d5f8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (index prefix, table, searched column)
+SEARCHED_COLUMNS = [
+    ('products_nombre', 'products', 'nombre'),
+    ('materials_nombre', 'materials', 'nombre'),
+    ('inventories_lote', 'inventories', 'lote'),
+]
+
+
+def upgrade() -> None:
+    # Other databases search from the application's in-memory prefix index
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in SEARCHED_COLUMNS:
+        # Substring and word matches: lower(column) LIKE '%term%'
+        op.execute(f'CREATE INDEX ix_{name}_trgm ON {table} USING gin (lower({column}) gin_trgm_ops)')
+        # Name prefixes of one user: lower(column) LIKE 'text%'
+        op.execute(f'CREATE INDEX ix_{name}_prefix ON {table} (user_id, lower({column}) text_pattern_ops)')
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for name, _, _ in reversed(SEARCHED_COLUMNS):
+        op.execute(f'DROP INDEX IF EXISTS ix_{name}_prefix')
+        op.execute(f'DROP INDEX IF EXISTS ix_{name}_trgm')
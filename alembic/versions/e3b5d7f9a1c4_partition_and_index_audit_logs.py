@@ -0,0 +1,153 @@
+"""partition_and_index_audit_logs
+
+Revision ID: e3b5d7f9a1c4
+Revises: d9f1b3c5e7a2
+Create Date: 2026-10-17 21:02:37.540913
+
+"""
+from datetime import date, datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3b5d7f9a1c4'
+down_revision: Union[str, None] = 'd9f1b3c5e7a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+COLUMNS = 'id, user_id, material_id, action, description, created_at, updated_at'
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _audit_logs_columns():
+    return [
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('material_id', sa.Integer(), sa.ForeignKey('materials.id'), nullable=True),
+        sa.Column('action', sa.String(length=50), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    ]
+
+
+def _partition_audit_logs(legacy: bool) -> None:
+    """
+    Recreate audit_logs partitioned by month on created_at. The partition key
+    must be part of the primary key, so it becomes (id, created_at).
+    """
+    if legacy:
+        op.execute('ALTER TABLE audit_logs RENAME TO audit_logs_legacy')
+        op.execute('ALTER TABLE audit_logs_legacy RENAME CONSTRAINT audit_logs_pkey TO audit_logs_legacy_pkey')
+        op.execute('ALTER INDEX IF EXISTS ix_audit_logs_id RENAME TO ix_audit_logs_legacy_id')
+    else:
+        op.execute('CREATE SEQUENCE audit_logs_id_seq')
+
+    op.execute(
+        "CREATE TABLE audit_logs ("
+        " id integer NOT NULL DEFAULT nextval('audit_logs_id_seq'),"
+        " user_id integer NOT NULL REFERENCES users (id),"
+        " material_id integer REFERENCES materials (id),"
+        " action varchar(50) NOT NULL,"
+        " description text,"
+        " created_at timestamptz NOT NULL DEFAULT now(),"
+        " updated_at timestamptz,"
+        " PRIMARY KEY (id, created_at)"
+        ") PARTITION BY RANGE (created_at)"
+    )
+    op.execute('ALTER SEQUENCE audit_logs_id_seq OWNED BY audit_logs.id')
+    op.execute('CREATE TABLE audit_logs_default PARTITION OF audit_logs DEFAULT')
+
+    current = datetime.utcnow().date().replace(day=1)
+    first = current
+    if legacy:
+        oldest = op.get_bind().execute(sa.text('SELECT min(created_at) FROM audit_logs_legacy')).scalar()
+        if oldest is not None:
+            first = min(first, oldest.date().replace(day=1))
+    month = first
+    while month <= _add_months(current, MONTHS_AHEAD):
+        following = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE audit_logs_y{month.year:04d}m{month.month:02d} PARTITION OF audit_logs "
+            f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{following.isoformat()} 00:00:00+00')"
+        )
+        month = following
+
+    if legacy:
+        op.execute(
+            f"INSERT INTO audit_logs ({COLUMNS}) "
+            f"SELECT id, user_id, material_id, action, description, coalesce(created_at, now()), updated_at "
+            f"FROM audit_logs_legacy"
+        )
+        op.execute('DROP TABLE audit_logs_legacy')
+    op.create_index('ix_audit_logs_id', 'audit_logs', ['id'], unique=False)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    # Earlier revisions dropped audit_logs without recreating it; databases built from them lack the table
+    legacy = sa.inspect(bind).has_table('audit_logs')
+    if bind.dialect.name == 'postgresql':
+        _partition_audit_logs(legacy)
+    elif not legacy:
+        op.create_table('audit_logs', *_audit_logs_columns())
+        op.create_index('ix_audit_logs_id', 'audit_logs', ['id'], unique=False)
+
+    # (filter, sort key, id) so each newest-first page is an index range scan
+    op.create_index('ix_audit_logs_user_created', 'audit_logs', ['user_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_audit_logs_material_created', 'audit_logs', ['material_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_audit_logs_user_action_created', 'audit_logs',
+                    ['user_id', 'action', 'created_at', 'id'], unique=False)
+
+    op.create_table('audit_log_archive',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('material_id', sa.Integer(), nullable=True),
+    sa.Column('action', sa.String(length=50), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_audit_log_archive_id', 'audit_log_archive', ['id'], unique=False)
+    op.create_index('ix_audit_log_archive_user_created', 'audit_log_archive', ['user_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_audit_log_archive_user_created', table_name='audit_log_archive')
+    op.drop_index('ix_audit_log_archive_id', table_name='audit_log_archive')
+    op.drop_table('audit_log_archive')
+
+    op.drop_index('ix_audit_logs_user_action_created', table_name='audit_logs')
+    op.drop_index('ix_audit_logs_material_created', table_name='audit_logs')
+    op.drop_index('ix_audit_logs_user_created', table_name='audit_logs')
+
+    if op.get_bind().dialect.name == 'postgresql':
+        # Back to a plain table; partitions detached by retention are left alone
+        op.execute('ALTER TABLE audit_logs RENAME TO audit_logs_partitioned')
+        op.execute('ALTER INDEX ix_audit_logs_id RENAME TO ix_audit_logs_partitioned_id')
+        op.execute(
+            "CREATE TABLE audit_logs ("
+            " id integer PRIMARY KEY DEFAULT nextval('audit_logs_id_seq'),"
+            " user_id integer NOT NULL REFERENCES users (id),"
+            " material_id integer REFERENCES materials (id),"
+            " action varchar(50) NOT NULL,"
+            " description text,"
+            " created_at timestamptz DEFAULT now(),"
+            " updated_at timestamptz"
+            ")"
+        )
+        op.execute('ALTER SEQUENCE audit_logs_id_seq OWNED BY audit_logs.id')
+        op.execute(f'INSERT INTO audit_logs ({COLUMNS}) SELECT {COLUMNS} FROM audit_logs_partitioned')
+        op.execute('DROP TABLE audit_logs_partitioned')
+        op.create_index('ix_audit_logs_id', 'audit_logs', ['id'], unique=False)
@@ -0,0 +1,47 @@
+"""add_product_variants
+
+Revision ID: e7a3c9d2f4b1
+Revises: c4d1f7a2b9e3
+Create Date: 2026-10-17 11:40:05.532871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a3c9d2f4b1'
+down_revision: Union[str, None] = 'c4d1f7a2b9e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Package sizes that share the recipe of their product
+    op.create_table(
+        'product_variants',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('nombre', sa.String(), nullable=True),
+        sa.Column('peso_empaque', sa.Numeric(10, 2), nullable=False),
+        sa.Column('costo_extra', sa.Numeric(10, 2), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_product_variants_id', 'product_variants', ['id'], unique=False)
+    op.create_index('ix_product_variants_product_id', 'product_variants', ['product_id'], unique=False)
+    op.create_index('ix_product_variants_user_id', 'product_variants', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_product_variants_user_id', table_name='product_variants')
+    op.drop_index('ix_product_variants_product_id', table_name='product_variants')
+    op.drop_index('ix_product_variants_id', table_name='product_variants')
+    op.drop_table('product_variants')
@@ -0,0 +1,47 @@
+"""add_product_components
+
+Revision ID: f2b8d4a6c1e9
+Revises: e7a3c9d2f4b1
+Create Date: 2026-10-17 13:05:51.904417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b8d4a6c1e9'
+down_revision: Union[str, None] = 'e7a3c9d2f4b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Intermediate products used as ingredients of other products
+    op.create_table(
+        'product_components',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('component_product_id', sa.Integer(), nullable=False),
+        sa.Column('cantidad', sa.Numeric(10, 2), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+        sa.ForeignKeyConstraint(['component_product_id'], ['products.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_product_components_id', 'product_components', ['id'], unique=False)
+    op.create_index('ix_product_components_product_id', 'product_components', ['product_id'], unique=False)
+    op.create_index(
+        'ix_product_components_component_product', 'product_components',
+        ['component_product_id', 'product_id'], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_product_components_component_product', table_name='product_components')
+    op.drop_index('ix_product_components_product_id', table_name='product_components')
+    op.drop_index('ix_product_components_id', table_name='product_components')
+    op.drop_table('product_components')
@@ -0,0 +1,45 @@
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Query, Response
+from sqlalchemy.orm import Session
+
+from ..database import get_db
+from ..models.user import User
+from ..schemas.audit_log import AuditLogResponse, AuditRetentionResult
+from ..services.audit_service import apply_audit_retention, get_audit_logs
+from ..utils.pagination import set_page_headers
+from .deps import get_current_admin, get_current_user
+
+router = APIRouter(prefix="/api/audit-logs", tags=["audit"])
+
+
+@router.get("/", response_model=List[AuditLogResponse])
+def read_audit_logs(
+    response: Response,
+    material_id: Optional[int] = None,
+    action: Optional[str] = None,
+    user_id: Optional[int] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(default=100, ge=1, le=500),
+    total: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Audit entries newest first, filtered by material, action, user and time range [desde, hasta)"""
+    page = get_audit_logs(db, current_user, material_id=material_id, action=action, user_id=user_id,
+                          desde=desde, hasta=hasta, cursor=cursor, limit=limit, total=total)
+    set_page_headers(response, page)
+    return page
+
+
+@router.post("/retention", response_model=AuditRetentionResult)
+def run_audit_retention(
+    meses: Optional[int] = Query(default=None, ge=1),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin)
+):
+    """Archive audit entries older than `meses` months (default: audit_retention_months)"""
+    return apply_audit_retention(db, meses)
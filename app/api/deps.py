@@ -6,7 +6,7 @@ from sqlalchemy.orm import Session
 
 from ..database import get_db
 from ..services.auth_service import get_current_user as get_user_from_token
-from ..models.user import User
+from ..models.user import Role, User
 
 security = HTTPBearer()
 
@@ -34,4 +34,9 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    return user
\ No newline at end of file
+    return user
+
+async def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
+    if current_user.role != Role.ADMIN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Administrator role required")
+    return current_user
\ No newline at end of file
@@ -1,5 +1,5 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
 from datetime import date
 
@@ -13,6 +13,7 @@ from ...services.inventory_egreso_service import (
     get_egresos_by_inventory, get_egresos_report
 )
 from ...api.deps import get_current_user
+from ...utils.pagination import set_page_headers
 
 
 router = APIRouter(prefix="/api/inventory/egresos", tags=["Inventory Egresos"])
@@ -56,25 +57,30 @@ def delete_inventory_egreso(
 @router.get("/inventory/{inventory_id}", response_model=List[InventoryEgresoResponse])
 def get_egresos_for_inventory(
     inventory_id: int,
+    response: Response,
     skip: int = Query(0, ge=0, description="Number of records to skip"),
     limit: int = Query(100, ge=1, le=1000, description="Maximum number of records to return"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    total: Optional[str] = Query(None, description="'exact' or 'estimated' to return X-Total-Count"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get all egresses for a specific inventory entry"""
-    results = get_egresos_by_inventory(db, inventory_id, current_user)
-    # Apply pagination
-    paginated_results = results[skip:skip + limit]
-    return [result.model_dump() for result in paginated_results]
+    results = get_egresos_by_inventory(db, inventory_id, current_user, skip, limit, cursor, total)
+    set_page_headers(response, results)
+    return [result.model_dump() for result in results]
 
 
 @router.get("/report", response_model=List[InventoryEgresoResponse])
 def get_egresos_report_endpoint(
+    response: Response,
     fecha_desde: Optional[date] = Query(None, description="Start date filter (YYYY-MM-DD)"),
     fecha_hasta: Optional[date] = Query(None, description="End date filter (YYYY-MM-DD)"),
     tipo_cliente: Optional[str] = Query(None, description="Client type filter: 'publico', 'mayorista', 'distribuidor'"),
     skip: int = Query(0, ge=0, description="Number of records to skip"),
     limit: int = Query(100, ge=1, le=1000, description="Maximum number of records to return"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    total: Optional[str] = Query(None, description="'exact' or 'estimated' to return X-Total-Count"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -86,7 +92,8 @@ def get_egresos_report_endpoint(
             detail="tipo_cliente must be one of: 'publico', 'mayorista', 'distribuidor'"
         )
 
-    results = get_egresos_report(db, current_user, fecha_desde, fecha_hasta, tipo_cliente)
-    # Apply pagination
-    paginated_results = results[skip:skip + limit]
-    return [result.model_dump() for result in paginated_results]
\ No newline at end of file
+    results = get_egresos_report(
+        db, current_user, fecha_desde, fecha_hasta, tipo_cliente, skip, limit, cursor, total
+    )
+    set_page_headers(response, results)
+    return [result.model_dump() for result in results]
\ No newline at end of file
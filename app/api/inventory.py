@@ -1,5 +1,5 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from sqlalchemy.orm import Session
 
 from ..database import get_db
@@ -12,8 +12,11 @@ from ..schemas.inventory import (
 from ..services.inventory_service import (
     create_inventory_entry, get_inventory, get_inventories, update_inventory, delete_inventory,
     register_stock_movement, get_inventory_movements, get_inventory_summary,
-    get_inventory_by_product, check_low_stock
+    get_inventory_by_product, check_low_stock, get_inventories_version, INVENTORY_VIEWS
 )
+from ..utils.conditional import not_modified, set_validator_headers
+from ..utils.fieldsets import parse_fieldset, sparse_response
+from ..utils.pagination import set_page_headers
 
 router = APIRouter(prefix="/api/inventory", tags=["inventory"])
 
@@ -48,20 +51,39 @@ def create_new_inventory_entry(
 
 @router.get("/", response_model=List[InventoryResponse])
 def read_inventories(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     product_id: Optional[int] = Query(None, description="Filter by product ID"),
     lote: Optional[str] = Query(None, description="Filter by batch/lot number"),
     stock_status: Optional[str] = Query(None, description="Filter by stock status: 'low' or 'ok'"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    total: Optional[str] = Query(None, description="'exact' or 'estimated' to return X-Total-Count"),
+    fields: Optional[str] = Query(None, description="Comma separated response fields, e.g. lote,stock_actual"),
+    view: Optional[str] = Query(None, description="'summary' for stock columns only, or 'full'"),
     db: Session = Depends(get_db)
 ):
     """Get all inventory entries for the current user with optional filters"""
+    fieldset = parse_fieldset(InventoryResponse, fields, view, INVENTORY_VIEWS)
     # For testing, get the first user
     user = db.query(User).first()
     if not user:
         return []
 
-    results = get_inventories(db, user, skip, limit, product_id, lote, stock_status)
+    # Answer revalidations from one aggregate query, before loading or pricing anything
+    version = get_inventories_version(db, user)
+    cached = not_modified(request, version)
+    if cached is not None:
+        return cached
+
+    results = get_inventories(db, user, skip, limit, product_id, lote, stock_status, cursor, total, fieldset)
+    if fieldset is not None:
+        response = sparse_response(results)
+        set_validator_headers(response, request, version)
+        return response
+    set_page_headers(response, results)
+    set_validator_headers(response, request, version)
     return [result.model_dump() for result in results]
 
 
@@ -180,8 +202,11 @@ def create_stock_movement(
 @router.get("/{inventory_id}/movements", response_model=List[InventoryMovementResponse])
 def read_inventory_movements(
     inventory_id: int,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    total: Optional[str] = Query(None, description="'exact' or 'estimated' to return X-Total-Count"),
     db: Session = Depends(get_db)
 ):
     """Get movement history for a specific inventory entry"""
@@ -190,7 +215,8 @@ def read_inventory_movements(
     if not user:
         return []
 
-    results = get_inventory_movements(db, inventory_id, user, skip, limit)
+    results = get_inventory_movements(db, inventory_id, user, skip, limit, cursor, total)
+    set_page_headers(response, results)
     return [result.model_dump() for result in results]
 
 
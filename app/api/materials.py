@@ -1,15 +1,31 @@
-from typing import List
+import io
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, Depends, File, Query, HTTPException, Request, Response, UploadFile
 from sqlalchemy.orm import Session
 
 from ..database import get_db
 from app.api.deps import get_current_user
 from ..models.user import User
-from ..schemas.material import MaterialCreate, MaterialResponse, MaterialUpdate, CantidadQuery, CostosResponse
+from ..schemas.material import (
+    MaterialCreate, MaterialResponse, MaterialUpdate, CantidadQuery, CostosResponse, MaterialUnitCreate, MaterialUnitResponse,
+    CostMatrixRequest, CostMatrixResponse
+)
+from ..schemas.price_simulation import PriceSimulationRequest, PriceSimulationResponse
+from ..schemas.price_history import MaterialPriceHistoryResponse
+from ..schemas.material_price_import import MaterialPriceImportResult
+from ..schemas.material_usage import MaterialWhereUsed, MaterialWhereUsedRequest
 from ..services.material_service import (
-    create_material, get_material, get_materials, update_material, delete_material, calculate_costs
+    create_material, get_material, get_materials, update_material, delete_material, calculate_costs, calculate_cost_matrix,
+    get_material_units, add_material_unit, delete_material_unit, get_materials_version
 )
+from ..services.price_simulation_service import simulate_material_price_changes
+from ..services.price_history_service import get_material_price_history
+from ..services.material_price_import_service import PRICE_LIST_READERS, import_material_prices
+from ..services.material_usage_service import get_material_where_used, get_where_used
+from ..services.product_import_service import detect_format
+from ..utils.conditional import not_modified, set_validator_headers
+from ..utils.pagination import set_page_headers
 
 router = APIRouter(prefix="/api/materials", tags=["materials"])
 
@@ -42,12 +58,19 @@ def create_material_test(material: MaterialCreate, db: Session = Depends(get_db)
         raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
 
 @router.get("/", response_model=List[MaterialResponse])
-def read_materials(skip: int = 0, limit: int = Query(default=100, le=100), db: Session = Depends(get_db)):
+def read_materials(request: Request, response: Response, skip: int = 0, limit: int = Query(default=100, le=100), cursor: Optional[str] = None, total: Optional[str] = None, db: Session = Depends(get_db)):
     # For testing, get the first user
     user = db.query(User).first()
     if not user:
         return []
-    return get_materials(db, user, skip, limit)
+    version = get_materials_version(db, user)
+    cached = not_modified(request, version)
+    if cached is not None:
+        return cached
+    page = get_materials(db, user, skip, limit, cursor, total)
+    set_page_headers(response, page)
+    set_validator_headers(response, request, version)
+    return page
 
 @router.get("/{material_id}", response_model=MaterialResponse)
 async def read_material(material_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
@@ -63,4 +86,53 @@ async def delete_material_route(material_id: int, current_user: User = Depends(g
 
 @router.post("/{material_id}/costos", response_model=CostosResponse)
 async def read_costs(material_id: int, query: CantidadQuery, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    return calculate_costs(db, material_id, query, current_user)
\ No newline at end of file
+    return calculate_costs(db, material_id, query, current_user)
+
+@router.get("/{material_id}/units", response_model=List[MaterialUnitResponse])
+async def read_material_units(material_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    return get_material_units(db, material_id, current_user)
+
+@router.post("/{material_id}/units", response_model=MaterialUnitResponse)
+async def create_material_unit(material_id: int, unit: MaterialUnitCreate, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Define a material-specific unit, e.g. 'caneca' = 20 l"""
+    return add_material_unit(db, material_id, unit, current_user)
+
+@router.delete("/{material_id}/units/{unit_id}")
+async def delete_material_unit_route(material_id: int, unit_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    return delete_material_unit(db, material_id, unit_id, current_user)
+
+@router.get("/{material_id}/price-history", response_model=List[MaterialPriceHistoryResponse])
+async def read_price_history(material_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Price intervals of a material, oldest first"""
+    return get_material_price_history(db, material_id, current_user)
+
+@router.get("/{material_id}/where-used", response_model=MaterialWhereUsed)
+def read_material_where_used(material_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Active products using a material, with its quantity, cost and share of each product's cost"""
+    return get_material_where_used(db, material_id, current_user)
+
+@router.post("/cost-matrix", response_model=CostMatrixResponse)
+def read_cost_matrix(query: CostMatrixRequest, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Costs of many materials at many quantities, as columnar arrays"""
+    return calculate_cost_matrix(db, query, current_user)
+
+@router.post("/where-used", response_model=List[MaterialWhereUsed])
+def read_where_used(request: MaterialWhereUsedRequest, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Where-used of many materials in one query; unknown ids are left out"""
+    return get_where_used(db, current_user, request.material_ids)
+
+@router.post("/price-simulation", response_model=PriceSimulationResponse)
+async def simulate_price_changes(simulation: PriceSimulationRequest, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Preview the impact of hypothetical material prices on product costs and prices (read-only)"""
+    return simulate_material_price_changes(db, simulation, current_user)
+
+@router.post("/price-list", response_model=MaterialPriceImportResult)
+def import_price_list(file: UploadFile = File(...), format: Optional[str] = None, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Apply a supplier price list (CSV or NDJSON) in one transaction and report the product price deltas"""
+    try:
+        format = detect_format(file.filename, format)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    return import_material_prices(db, current_user, PRICE_LIST_READERS[format](stream))
\ No newline at end of file
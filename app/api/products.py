@@ -1,4 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import io
+from datetime import datetime
+from decimal import Decimal
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, Response, UploadFile, status
 from sqlalchemy.orm import Session, joinedload
 from app.api.deps import get_current_user
 
@@ -8,14 +13,25 @@ from ..models.user import User
 from ..models.product import Product, ProductMaterial
 from ..schemas.product import (
     ProductCreate, ProductUpdate, ProductResponse,
-    ProductMaterialCreate
+    ProductMaterialCreate, ProductComponentCreate, ProductComponentResponse,
+    PriceMatrixRequest, PriceMatrixResponse, CostQuoteRequest, CostQuoteResponse, ProductBulkDuplicateRequest
 )
 from ..services.product_service import (
     create_product, get_product, get_products, update_product, delete_product,
     add_material_to_product, remove_material_from_product, calculate_total_costs,
-    duplicate_product
+    duplicate_product, calculate_price_matrix, add_component_to_product, remove_component_from_product,
+    calculate_cost_quote, duplicate_product_bulk, get_products_version, PRODUCT_VIEWS
 )
-from ..utils.unit_converter import calculate_cost_for_quantity
+from ..schemas.product_variant import ProductVariantCreate, ProductVariantUpdate, ProductVariantResponse, ProductFamilyResponse
+from ..services.product_variant_service import create_variant, get_product_family, update_variant, delete_variant
+from ..schemas.price_history import CostHistoryResponse
+from ..schemas.product_import import ProductImportResult
+from ..services.product_import_service import IMPORT_READERS, detect_format, import_products
+from ..services.price_history_service import date_series, get_product_costs_as_of
+from ..utils.conditional import not_modified, set_validator_headers
+from ..utils.fieldsets import parse_fieldset, sparse_response
+from ..utils.pagination import set_page_headers
+from ..utils.unit_converter import UnknownUnitError, calculate_cost_for_quantity
 # from .deps import get_current_user
 
 router = APIRouter(prefix="/api/products", tags=["products"])
@@ -34,16 +50,42 @@ async def create_new_product(
 
 @router.get("/")
 def read_products(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    min_price: Optional[Decimal] = None,
+    max_price: Optional[Decimal] = None,
+    sort_by: Optional[str] = None,
+    tipo_cliente: str = "publico",
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    total: Optional[str] = Query(None, description="'exact' or 'estimated' to return X-Total-Count"),
+    fields: Optional[str] = Query(None, description="Comma separated response fields, e.g. nombre,precio_publico_con_iva"),
+    view: Optional[str] = Query(None, description="'summary' for name and prices only, or 'full'"),
     db: Session = Depends(get_db)
 ):
-    """Get all products for the current user"""
+    """Get all products for the current user, optionally filtered and sorted by price"""
+    fieldset = parse_fieldset(ProductResponse, fields, view, PRODUCT_VIEWS)
     # For testing, get the first user
     user = db.query(User).first()
     if not user:
         return []
-    results = get_products(db, user, skip, limit)
+
+    # Answer revalidations from one aggregate query, before loading or pricing anything
+    version = get_products_version(db, user)
+    cached = not_modified(request, version)
+    if cached is not None:
+        return cached
+
+    results = get_products(
+        db, user, skip, limit, min_price, max_price, sort_by, tipo_cliente, cursor, total, fieldset
+    )
+    if fieldset is not None:
+        response = sparse_response(results)
+        set_validator_headers(response, request, version)
+        return response
+    set_page_headers(response, results)
+    set_validator_headers(response, request, version)
     return [result.model_dump() for result in results]
 
 
@@ -60,6 +102,57 @@ def get_total_costs(
     return result.model_dump()
 
 
+@router.get("/costs/as-of", response_model=CostHistoryResponse)
+def get_costs_as_of(
+    fecha: datetime,
+    product_ids: Optional[List[int]] = Query(default=None),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Product costs and prices with the material prices in force at the given date"""
+    return get_product_costs_as_of(db, current_user, [fecha], product_ids)
+
+
+@router.get("/costs/history", response_model=CostHistoryResponse)
+def get_costs_history(
+    desde: datetime,
+    hasta: datetime,
+    paso_dias: int = 1,
+    product_ids: Optional[List[int]] = Query(default=None),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Product costs and prices from desde to hasta every paso_dias days, resolved in one query"""
+    return get_product_costs_as_of(db, current_user, date_series(desde, hasta, paso_dias), product_ids)
+
+
+@router.post("/import", response_model=ProductImportResult)
+def import_products_route(
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Stream a CSV or NDJSON catalog of products and recipes; invalid rows are reported, not fatal"""
+    try:
+        format = detect_format(file.filename, format)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    return import_products(db, current_user, IMPORT_READERS[format](stream))
+
+
+@router.post("/cost-calculator", response_model=CostQuoteResponse)
+def calculate_cost_quote_route(
+    request: CostQuoteRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Cost of many (product, quantity, unit) lines, e.g. a quote, in one request"""
+    return calculate_cost_quote(db, request, current_user)
+
+
 @router.get("/{product_id}")
 def read_product(
     product_id: int,
@@ -133,6 +226,30 @@ def remove_material_from_existing_product(
     return {"message": "Material removed from product successfully"}
 
 
+@router.post("/{product_id}/components", response_model=ProductComponentResponse, status_code=status.HTTP_201_CREATED)
+def add_component_to_existing_product(
+    product_id: int,
+    component_data: ProductComponentCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Use another product (e.g. a base) as an ingredient of this product"""
+    result = add_component_to_product(db, product_id, component_data, current_user)
+    return result.model_dump()
+
+
+@router.delete("/{product_id}/components/{component_product_id}")
+def remove_component_from_existing_product(
+    product_id: int,
+    component_product_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Remove an intermediate product from a product recipe"""
+    remove_component_from_product(db, product_id, component_product_id, current_user)
+    return {"message": "Component removed from product successfully"}
+
+
 @router.get("/{product_id}/cost-calculator")
 def calculate_cost_by_unit(
     product_id: int,
@@ -159,19 +276,14 @@ def calculate_cost_by_unit(
         raise HTTPException(status_code=404, detail="Product not found")
 
     # Get adjusted cost per gram
-    cost_per_gram = product.calcular_costo_por_gramo_ajustado()
+    precios = product.pricing_snapshot()
+    cost_per_gram = precios.costo_por_gramo
 
     # Calculate cost for the specified quantity and unit
-    total_cost = calculate_cost_for_quantity(cost_per_gram, quantity, unit)
-
-    # Calculate prices with margins and IVA
-    costo_total = product.calcular_costo_total()
-    precio_publico = product.precio_publico
-    precio_mayorista = product.precio_mayorista
-    precio_distribuidor = product.precio_distribuidor
-    iva_publico = product.iva_publico
-    iva_mayorista = product.iva_mayorista
-    iva_distribuidor = product.iva_distribuidor
+    try:
+        total_cost = calculate_cost_for_quantity(cost_per_gram, quantity, unit)
+    except UnknownUnitError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
     return {
         "product_id": product_id,
@@ -179,18 +291,78 @@ def calculate_cost_by_unit(
         "unit": unit,
         "cost_per_gram_adjusted": str(cost_per_gram),
         "total_cost": str(total_cost),
-        "precio_publico": str(precio_publico),
-        "precio_mayorista": str(precio_mayorista),
-        "precio_distribuidor": str(precio_distribuidor),
-        "iva_publico": str(iva_publico),
-        "iva_mayorista": str(iva_mayorista),
-        "iva_distribuidor": str(iva_distribuidor),
-        "precio_publico_con_iva": str(product.precio_publico_con_iva),
-        "precio_mayorista_con_iva": str(product.precio_mayorista_con_iva),
-        "precio_distribuidor_con_iva": str(product.precio_distribuidor_con_iva)
+        "precio_publico": str(precios.precio_publico),
+        "precio_mayorista": str(precios.precio_mayorista),
+        "precio_distribuidor": str(precios.precio_distribuidor),
+        "iva_publico": str(precios.iva_publico),
+        "iva_mayorista": str(precios.iva_mayorista),
+        "iva_distribuidor": str(precios.iva_distribuidor),
+        "precio_publico_con_iva": str(precios.precio_publico_con_iva),
+        "precio_mayorista_con_iva": str(precios.precio_mayorista_con_iva),
+        "precio_distribuidor_con_iva": str(precios.precio_distribuidor_con_iva)
     }
 
 
+@router.post("/{product_id}/price-matrix", response_model=PriceMatrixResponse)
+def calculate_product_price_matrix(
+    product_id: int,
+    request: PriceMatrixRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Price grid over package weights, margins and IVA rates for one product"""
+    result = calculate_price_matrix(db, product_id, request, current_user)
+    return result.model_dump()
+
+
+@router.post("/{product_id}/variants", response_model=ProductVariantResponse, status_code=status.HTTP_201_CREATED)
+def create_product_variant(
+    product_id: int,
+    variant: ProductVariantCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Add a package size that shares the product recipe"""
+    result = create_variant(db, product_id, variant, current_user)
+    return result.model_dump()
+
+
+@router.get("/{product_id}/variants", response_model=ProductFamilyResponse)
+def read_product_variants(
+    product_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """List every package size of a product from one recipe evaluation"""
+    result = get_product_family(db, product_id, current_user)
+    return result.model_dump()
+
+
+@router.put("/{product_id}/variants/{variant_id}", response_model=ProductVariantResponse)
+def update_product_variant(
+    product_id: int,
+    variant_id: int,
+    variant: ProductVariantUpdate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Update a package size"""
+    result = update_variant(db, product_id, variant_id, variant, current_user)
+    return result.model_dump()
+
+
+@router.delete("/{product_id}/variants/{variant_id}")
+def delete_product_variant(
+    product_id: int,
+    variant_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Delete a package size (soft delete)"""
+    delete_variant(db, product_id, variant_id, current_user)
+    return {"message": "Variant deleted successfully"}
+
+
 @router.post("/{product_id}/duplicate")
 def duplicate_product_endpoint(
     product_id: int,
@@ -209,4 +381,18 @@ def duplicate_product_endpoint(
         duplicate_data["peso_empaque"],
         user
     )
-    return result.model_dump()
\ No newline at end of file
+    return result.model_dump()
+
+
+@router.post(
+    "/{product_id}/duplicate/bulk", response_model=List[ProductResponse], status_code=status.HTTP_201_CREATED
+)
+def duplicate_product_bulk_endpoint(
+    product_id: int,
+    request: ProductBulkDuplicateRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Duplicate a product into several package sizes in one transaction"""
+    results = duplicate_product_bulk(db, product_id, request, current_user)
+    return [result.model_dump() for result in results]
\ No newline at end of file
@@ -0,0 +1,24 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from ..database import get_db
+from ..models.user import User
+from ..schemas.search import SearchResult
+from ..services.search_service import parse_search_types, search
+from .deps import get_current_user
+
+router = APIRouter(prefix="/api/search", tags=["search"])
+
+
+@router.get("/", response_model=List[SearchResult])
+def search_catalog(
+    q: str = Query(..., min_length=1, max_length=100, description="Text typed so far"),
+    tipos: Optional[str] = Query(None, description="Comma separated: producto, material, lote"),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Ranked autocomplete over product names, material names and lot codes"""
+    return search(db, current_user, q, parse_search_types(tipos), limit)
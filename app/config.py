@@ -1,7 +1,11 @@
+import os
 from pydantic_settings import BaseSettings
-from pydantic import ConfigDict
+from pydantic import ConfigDict, model_validator
 from typing import Dict
 
+# Backend root, so default paths do not depend on the working directory
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 class Settings(BaseSettings):
     model_config = ConfigDict(env_file=".env")
 
@@ -10,6 +14,20 @@ class Settings(BaseSettings):
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
 
+    # Files written at runtime; relative paths below are resolved inside it
+    data_dir: str = os.path.join(BASE_DIR, "data")
+
+    # Audit events are written behind the request by a background thread
+    audit_write_behind: bool = True
+    audit_queue_size: int = 10000
+    audit_batch_size: int = 500
+    audit_flush_interval: float = 0.5  # Seconds the writer waits for a first event
+    audit_write_retries: int = 4  # Attempts per batch before it goes to the fallback file
+    audit_retry_backoff: float = 0.2  # Seconds before the first retry, doubled on each one
+    audit_fallback_path: str = "audit_fallback.ndjson"  # Under data_dir; batches that could not be written, replayed later
+    audit_retention_months: int = 24  # Older entries are archived (detached partitions on PostgreSQL)
+    audit_partition_months_ahead: int = 3
+
     # IVA percentages per country (in percent)
     iva_percentages: Dict[str, float] = {
         "Spain": 21.0,
@@ -21,4 +39,10 @@ class Settings(BaseSettings):
         "Default": 21.0
     }
 
+    @model_validator(mode='after')
+    def resolve_paths(self):
+        self.data_dir = os.path.abspath(self.data_dir)
+        self.audit_fallback_path = os.path.join(self.data_dir, self.audit_fallback_path)
+        return self
+
 settings = Settings()
\ No newline at end of file
@@ -1,9 +1,12 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.database import Base, engine
-from app.api import auth, materials, products, inventory
+from app.api import auth, materials, products, inventory, search, audit
 from app.api.endpoints import inventory_egresos
+from app.services.audit_service import audit_writer, start_audit_writer
 # Import all models to ensure they are registered with SQLAlchemy
 
 __all__ = ["app"]
@@ -11,10 +14,21 @@ __all__ = ["app"]
 # Create all tables (commented out for production - use Alembic migrations)
 # Base.metadata.create_all(bind=engine)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_audit_writer()
+    try:
+        yield
+    finally:
+        # Queued audit events are written before the process exits
+        audit_writer.stop()
+
+
 app = FastAPI(
     title="Precios Soley API",
     description="API for managing materials and prices",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -23,6 +37,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "X-Total-Count-Estimated", "ETag", "Last-Modified"],
 )
 
 app.include_router(auth.router)
@@ -30,3 +45,5 @@ app.include_router(materials.router)
 app.include_router(products.router)
 app.include_router(inventory.router)
 app.include_router(inventory_egresos.router)
+app.include_router(search.router)
+app.include_router(audit.router)
@@ -1,10 +1,15 @@
-from .base import BaseEntity
-from .user import User
-from .material import Material
-from .product import Product, ProductMaterial
-from .inventory import Inventory, InventoryMovement
-
-__all__ = [
-    "BaseEntity", "User", "Material", "Product", "ProductMaterial",
-    "Proforma", "ProformaItem", "Inventory", "InventoryMovement"
+from .base import BaseEntity
+from .user import User
+from .material import Material
+from .product import Product, ProductMaterial, ProductComponent
+from .inventory import Inventory, InventoryMovement
+from .product_cost_snapshot import ProductCostSnapshot
+from .product_variant import ProductVariant
+from .material_price_history import MaterialPriceHistory
+from .material_unit import MaterialUnit
+
+__all__ = [
+    "BaseEntity", "User", "Material", "Product", "ProductMaterial", "ProductComponent",
+    "Proforma", "ProformaItem", "Inventory", "InventoryMovement", "ProductCostSnapshot",
+    "ProductVariant", "MaterialPriceHistory", "MaterialUnit"
 ]
\ No newline at end of file
@@ -1,11 +1,34 @@
-from sqlalchemy import Column, String, Text, ForeignKey, Integer
+from sqlalchemy import Column, String, Text, ForeignKey, Integer, DateTime, Index
 
 from .base import BaseEntity
 
 class AuditLog(BaseEntity):
+    """
+    On PostgreSQL the table is partitioned by month on created_at (see
+    audit_service.ensure_audit_partitions); elsewhere it is a plain table.
+    """
     __tablename__ = "audit_logs"
+    __table_args__ = (
+        # Newest-first pages of one user, optionally of one material or action
+        Index("ix_audit_logs_user_created", "user_id", "created_at", "id"),
+        Index("ix_audit_logs_material_created", "material_id", "created_at", "id"),
+        Index("ix_audit_logs_user_action_created", "user_id", "action", "created_at", "id"),
+    )
 
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     material_id = Column(Integer, ForeignKey("materials.id"), nullable=True)
     action = Column(String(50), nullable=False)  # e.g., 'create', 'update', 'delete'
     description = Column(Text)
+
+class AuditLogArchive(BaseEntity):
+    """Audit rows past the retention period, moved out of audit_logs with their original id"""
+    __tablename__ = "audit_log_archive"
+    __table_args__ = (
+        Index("ix_audit_log_archive_user_created", "user_id", "created_at"),
+    )
+
+    user_id = Column(Integer, nullable=False)
+    material_id = Column(Integer, nullable=True)
+    action = Column(String(50), nullable=False)
+    description = Column(Text)
+    archived_at = Column(DateTime(timezone=True), nullable=False)
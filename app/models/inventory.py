@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Numeric, DateTime, Boolean, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, Boolean, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 
 from .base import BaseEntity
@@ -41,6 +41,9 @@ class Inventory(BaseEntity):
 
 class InventoryMovement(BaseEntity):
     __tablename__ = "inventory_movements"
+    __table_args__ = (
+        Index('ix_inventory_movements_inventory_created', 'inventory_id', 'created_at', 'id'),
+    )
 
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     inventory_id = Column(Integer, ForeignKey("inventories.id"), nullable=False)
@@ -31,6 +31,9 @@ class InventoryEgreso(BaseEntity):
         Index('ix_inventory_egresos_product_id', 'product_id'),
         Index('ix_inventory_egresos_fecha_egreso', 'fecha_egreso'),
         Index('ix_inventory_egresos_user_id', 'user_id'),
+        # Keyset pagination, newest first, per inventory and per user
+        Index('ix_inventory_egresos_inventory_fecha', 'inventory_id', 'fecha_egreso', 'id'),
+        Index('ix_inventory_egresos_user_fecha', 'user_id', 'fecha_egreso', 'id'),
     )
 
     def __init__(self, **kwargs):
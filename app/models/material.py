@@ -5,6 +5,7 @@ from sqlalchemy import Column, Integer, String, Numeric, Boolean, ForeignKey, Da
 from sqlalchemy.orm import relationship
 
 from .base import BaseEntity
+from ..utils.unit_converter import es_unidad_estandar, factor_a_gramos
 
 class UnidadBase(str, Enum):
     KG = "kg"
@@ -17,14 +18,25 @@ class Material(BaseEntity):
     nombre = Column(String, nullable=False)
     precio_base = Column(Numeric(10, 2), nullable=False)  # e.g., 3.45 for price per kg/l
     unidad_base = Column(String, default=UnidadBase.KG.value)
-    precio_unidad_pequena = Column(Numeric(12, 6), nullable=False)  # e.g., 0.00345 for per gram/ml
+    precio_unidad_pequena = Column(Numeric(12, 6), nullable=False)  # e.g., 0.00345 for per gram
+    densidad = Column(Numeric(10, 4), nullable=True)  # g/ml, converts litres to grams; None means 1
     is_active = Column(Boolean, default=True)
     deleted_at = Column(DateTime, nullable=True)
     version = Column(Integer, default=1)
 
     user = relationship("User", back_populates="materials")
     product_materials = relationship("ProductMaterial", back_populates="material", cascade="all, delete-orphan")
+    unidades = relationship("MaterialUnit", back_populates="material", cascade="all, delete-orphan")
 
     def calcular_precio_cantidad(self, cantidad: Decimal) -> Decimal:
-        # Calculate cost for given quantity in grams/ml
-        return self.precio_unidad_pequena * cantidad
\ No newline at end of file
+        # Calculate cost for given quantity in grams
+        return self.precio_unidad_pequena * cantidad
+
+    def factor_a_gramos(self, unidad: str) -> Decimal:
+        """Exact grams in one unit of this material, standard or material-specific"""
+        definicion = None
+        if not es_unidad_estandar(unidad):
+            definicion = next(
+                ((u.cantidad, u.unidad) for u in self.unidades if u.nombre == unidad), None
+            )
+        return factor_a_gramos(unidad, self.densidad, definicion)
\ No newline at end of file
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, ForeignKey, Index
+from sqlalchemy.orm import relationship
+
+from .base import BaseEntity
+
+
+class MaterialPriceHistory(BaseEntity):
+    """
+    Append-only price history of a material. Each row is the price that was
+    in force during [valid_from, valid_to); valid_to is NULL for the current price.
+    """
+    __tablename__ = "material_price_history"
+    __table_args__ = (
+        Index("ix_material_price_history_interval", "material_id", "valid_from", "valid_to"),
+    )
+
+    material_id = Column(Integer, ForeignKey("materials.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    version = Column(Integer, nullable=False, default=1)  # Material.version that introduced this price
+    precio_base = Column(Numeric(10, 2), nullable=False)
+    unidad_base = Column(String, nullable=False)
+    precio_unidad_pequena = Column(Numeric(12, 6), nullable=False)
+    valid_from = Column(DateTime(timezone=True), nullable=False)
+    valid_to = Column(DateTime(timezone=True), nullable=True)
+
+    material = relationship("Material")
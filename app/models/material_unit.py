@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, Numeric, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import relationship
+
+from .base import BaseEntity
+
+
+class MaterialUnit(BaseEntity):
+    """Material-specific purchase unit, e.g. 'caneca' = 20 l or 'saco' = 25 kg"""
+    __tablename__ = "material_units"
+    __table_args__ = (
+        UniqueConstraint("material_id", "nombre", name="uq_material_units_material_nombre"),
+    )
+
+    material_id = Column(Integer, ForeignKey("materials.id"), nullable=False, index=True)
+    nombre = Column(String(50), nullable=False)
+    cantidad = Column(Numeric(12, 4), nullable=False)  # Amount of `unidad` in one of this unit
+    unidad = Column(String(20), nullable=False)  # Standard unit, see utils.unit_converter.UNIDADES
+
+    material = relationship("Material", back_populates="unidades")
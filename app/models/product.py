@@ -1,10 +1,32 @@
+import weakref
 from datetime import datetime
 from decimal import Decimal
-from sqlalchemy import Column, Integer, String, Numeric, DateTime, Boolean, ForeignKey
+from typing import Optional, Set
+from sqlalchemy import (
+    Column, Integer, String, Numeric, DateTime, Boolean, ForeignKey, Index, and_, case, event, func, literal, select
+)
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.hybrid import hybrid_property
 
 from .base import BaseEntity
+from .material import Material
+from ..utils.fixed_point import to_micro
+from ..utils.pricing import (
+    DEFAULT_IVA_PERCENTAGE, PricingSnapshot, RecipeCycleError, calcular_costo_componente, calcular_snapshot,
+    costo_componente, pricing_stats
+)
+
+# Instance attribute holding the products whose memoized snapshot was computed
+# from a node (recipe line, material or intermediate product): the in-memory
+# reverse edges walked to invalidate only what is downstream of a change.
+_DEPENDENTS_KEY = '_pricing_dependents'
+
+
+def _depends_on(node, product) -> None:
+    dependents = node.__dict__.get(_DEPENDENTS_KEY)
+    if dependents is None:
+        dependents = node.__dict__[_DEPENDENTS_KEY] = weakref.WeakSet()
+    dependents.add(product)
 
 
 class Product(BaseEntity):
@@ -38,14 +60,16 @@ class Product(BaseEntity):
     product_materials = relationship("ProductMaterial", back_populates="product", cascade="all, delete-orphan")
     inventories = relationship("Inventory", back_populates="product", cascade="all, delete-orphan")
     inventory_egresos = relationship("InventoryEgreso", back_populates="product")
+    cost_snapshot = relationship("ProductCostSnapshot", back_populates="product", uselist=False, cascade="all, delete-orphan")
+    variants = relationship("ProductVariant", back_populates="product", cascade="all, delete-orphan")
+    components = relationship(
+        "ProductComponent", foreign_keys="ProductComponent.product_id",
+        back_populates="product", cascade="all, delete-orphan"
+    )
 
     def calcular_costo_materiales(self) -> Decimal:
         """Calculate total cost of all materials only (excluding additional costs)"""
-        total = Decimal('0')
-        for pm in self.product_materials:
-            if pm.material and pm.material.is_active:
-                total += pm.material.calcular_precio_cantidad(pm.cantidad)
-        return total
+        return self.pricing_snapshot().costo_materiales
 
     def calcular_costo_total(self) -> Decimal:
         """Calculate total cost of all materials only (production cost)"""
@@ -53,68 +77,176 @@ class Product(BaseEntity):
 
     def calcular_costo_por_gramo_ajustado(self) -> Decimal:
         """Calculate adjusted cost per gram based on final production weight"""
-        costo_total = self.calcular_costo_total()
-        if self.peso_final_producido and self.peso_final_producido > 0:
-            return costo_total / self.peso_final_producido
-        else:
-            # Fallback to material-based calculation: material cost per gram of materials
-            costo_materiales = self.calcular_costo_materiales()
-            total_material_weight = sum(pm.cantidad for pm in self.product_materials if pm.material and pm.material.is_active)
-            return costo_materiales / total_material_weight if total_material_weight > 0 else Decimal('0')
+        return self.pricing_snapshot().costo_por_gramo
+
+    @hybrid_property
+    def costo_materiales(self) -> Decimal:
+        """Total cost of active materials"""
+        return self.pricing_snapshot().costo_materiales
+
+    @costo_materiales.expression
+    def costo_materiales(cls):
+        return func.round(_costo_materiales_expression(cls), 6)
+
+    @hybrid_property
+    def costo_por_gramo(self) -> Decimal:
+        """Adjusted cost per gram"""
+        return self.pricing_snapshot().costo_por_gramo
+
+    @costo_por_gramo.expression
+    def costo_por_gramo(cls):
+        return func.round(_costo_por_gramo_expression(cls), 6)
+
+    @hybrid_property
+    def costo_paquete(self) -> Decimal:
+        """Cost of the selected package including additional costs"""
+        return self.pricing_snapshot().costo_paquete
+
+    @costo_paquete.expression
+    def costo_paquete(cls):
+        return func.round(_costo_paquete_expression(cls), 6)
+
+    def pricing_snapshot(self, _evaluating: Optional[Set[int]] = None) -> PricingSnapshot:
+        """
+        Return the memoized pricing snapshot, recomputing it only after a
+        change to the product or to something its recipe reads.
+        `_evaluating` holds the products on the current evaluation path.
+        """
+        cached = self.__dict__.get('_pricing_cache')
+        if cached is not None:
+            pricing_stats.hits += 1
+            return cached
+
+        pricing_stats.misses += 1
+        snapshot = self._compute_pricing_snapshot(set() if _evaluating is None else _evaluating)
+        self._pricing_cache = snapshot
+        return snapshot
+
+    def _compute_pricing_snapshot(self, evaluating: Set[int]) -> PricingSnapshot:
+        """Walk the recipe once and derive every cost and price from it"""
+        # The path is local to this evaluation, so concurrent evaluations never share it
+        if id(self) in evaluating:
+            raise RecipeCycleError(f"Product {self.id} is an ingredient of itself")
+
+        evaluating.add(id(self))
+        try:
+            costo_receta = 0
+            peso_receta = 0
+            for pm in self.product_materials:
+                _depends_on(pm, self)
+                if pm.material is not None:
+                    _depends_on(pm.material, self)
+                if pm.material and pm.material.is_active:
+                    cantidad = to_micro(pm.cantidad)
+                    costo_receta += to_micro(pm.material.precio_unidad_pequena) * cantidad
+                    peso_receta += cantidad
+
+            # Intermediate products contribute their cost per gram; their own
+            # snapshot is memoized, so shared bases are evaluated once
+            for pc in self.components:
+                _depends_on(pc, self)
+                if pc.component is not None:
+                    _depends_on(pc.component, self)
+                if pc.component and pc.component.is_active:
+                    cantidad = to_micro(pc.cantidad)
+                    base = pc.component.pricing_snapshot(evaluating)
+                    costo_receta += costo_componente(base.costo_por_gramo_exacto, cantidad)
+                    peso_receta += cantidad
+        finally:
+            evaluating.discard(id(self))
+
+        return calcular_snapshot(
+            costo_receta=costo_receta,
+            peso_receta=peso_receta,
+            costo_adicionales=self.calcular_costo_adicionales_total(),
+            margen_publico=self.margen_publico,
+            margen_mayorista=self.margen_mayorista,
+            margen_distribuidor=self.margen_distribuidor,
+            iva_percentage=self.iva_percentage,
+            peso_final_producido=self.peso_final_producido,
+            peso_empaque=self.peso_empaque
+        )
 
     @hybrid_property
     def iva_publico(self) -> Decimal:
         """Calculate IVA amount for retail price"""
-        precio = self.precio_publico
-        iva_pct = self.iva_percentage or 21.0  # Default to 21% if None
-        return precio * Decimal(iva_pct / 100)
+        return self.pricing_snapshot().iva_publico
+
+    @iva_publico.expression
+    def iva_publico(cls):
+        return func.round(_iva_expression(cls, cls.margen_publico), 6)
 
     @hybrid_property
     def iva_mayorista(self) -> Decimal:
         """Calculate IVA amount for wholesale price"""
-        precio = self.precio_mayorista
-        iva_pct = self.iva_percentage or 21.0  # Default to 21% if None
-        return precio * Decimal(iva_pct / 100)
+        return self.pricing_snapshot().iva_mayorista
+
+    @iva_mayorista.expression
+    def iva_mayorista(cls):
+        return func.round(_iva_expression(cls, cls.margen_mayorista), 6)
 
     @hybrid_property
     def iva_distribuidor(self) -> Decimal:
         """Calculate IVA amount for distributor price"""
-        precio = self.precio_distribuidor
-        iva_pct = self.iva_percentage or 21.0  # Default to 21% if None
-        return precio * Decimal(iva_pct / 100)
+        return self.pricing_snapshot().iva_distribuidor
+
+    @iva_distribuidor.expression
+    def iva_distribuidor(cls):
+        return func.round(_iva_expression(cls, cls.margen_distribuidor), 6)
 
     @hybrid_property
     def precio_publico_con_iva(self) -> Decimal:
         """Calculate retail price including IVA"""
-        return self.precio_publico + self.iva_publico
+        return self.pricing_snapshot().precio_publico_con_iva
+
+    @precio_publico_con_iva.expression
+    def precio_publico_con_iva(cls):
+        return func.round(_precio_con_iva_expression(cls, cls.margen_publico), 6)
 
     @hybrid_property
     def precio_mayorista_con_iva(self) -> Decimal:
         """Calculate wholesale price including IVA"""
-        return self.precio_mayorista + self.iva_mayorista
+        return self.pricing_snapshot().precio_mayorista_con_iva
+
+    @precio_mayorista_con_iva.expression
+    def precio_mayorista_con_iva(cls):
+        return func.round(_precio_con_iva_expression(cls, cls.margen_mayorista), 6)
 
     @hybrid_property
     def precio_distribuidor_con_iva(self) -> Decimal:
         """Calculate distributor price including IVA"""
-        return self.precio_distribuidor + self.iva_distribuidor
+        return self.pricing_snapshot().precio_distribuidor_con_iva
+
+    @precio_distribuidor_con_iva.expression
+    def precio_distribuidor_con_iva(cls):
+        return func.round(_precio_con_iva_expression(cls, cls.margen_distribuidor), 6)
 
     @hybrid_property
     def precio_publico(self) -> Decimal:
         """Calculate retail selling price based on package profit margin"""
-        precios = self.calcular_precios_por_empaque()
-        return precios['precio_publico_paquete']
+        return self.pricing_snapshot().precio_publico
+
+    @precio_publico.expression
+    def precio_publico(cls):
+        return func.round(_precio_expression(cls, cls.margen_publico), 6)
 
     @hybrid_property
     def precio_mayorista(self) -> Decimal:
         """Calculate wholesale selling price based on package profit margin"""
-        precios = self.calcular_precios_por_empaque()
-        return precios['precio_mayorista_paquete']
+        return self.pricing_snapshot().precio_mayorista
+
+    @precio_mayorista.expression
+    def precio_mayorista(cls):
+        return func.round(_precio_expression(cls, cls.margen_mayorista), 6)
 
     @hybrid_property
     def precio_distribuidor(self) -> Decimal:
         """Calculate distributor selling price based on package profit margin"""
-        precios = self.calcular_precios_por_empaque()
-        return precios['precio_distribuidor_paquete']
+        return self.pricing_snapshot().precio_distribuidor
+
+    @precio_distribuidor.expression
+    def precio_distribuidor(cls):
+        return func.round(_precio_expression(cls, cls.margen_distribuidor), 6)
 
     def calcular_costo_adicionales_total(self) -> Decimal:
         """Calculate total additional costs per package"""
@@ -134,44 +266,7 @@ class Product(BaseEntity):
 
     def calcular_precios_por_empaque(self) -> dict:
         """Calculate prices for the selected package weight"""
-        if not self.peso_empaque:
-            # Fallback: assume 1 unit package with additional costs
-            costo_base_paquete = self.calcular_costo_adicionales_total()
-            return {
-                'costo_paquete': costo_base_paquete,
-                'precio_publico_paquete': costo_base_paquete / (1 - self.margen_publico / 100) if self.margen_publico < 100 else Decimal('0'),
-                'precio_mayorista_paquete': costo_base_paquete / (1 - self.margen_mayorista / 100) if self.margen_mayorista < 100 else Decimal('0'),
-                'precio_distribuidor_paquete': costo_base_paquete / (1 - self.margen_distribuidor / 100) if self.margen_distribuidor < 100 else Decimal('0'),
-                'precio_publico_con_iva_paquete': (costo_base_paquete / (1 - self.margen_publico / 100) if self.margen_publico < 100 else Decimal('0')) * (1 + (self.iva_percentage or 21.0) / 100),
-                'precio_mayorista_con_iva_paquete': (costo_base_paquete / (1 - self.margen_mayorista / 100) if self.margen_mayorista < 100 else Decimal('0')) * (1 + (self.iva_percentage or 21.0) / 100),
-                'precio_distribuidor_con_iva_paquete': (costo_base_paquete / (1 - self.margen_distribuidor / 100) if self.margen_distribuidor < 100 else Decimal('0')) * (1 + (self.iva_percentage or 21.0) / 100)
-            }
-
-        # Calculate material cost per package
-        costo_por_gramo = self.calcular_costo_por_gramo_ajustado()
-        costo_materiales_paquete = costo_por_gramo * self.peso_empaque
-
-        # Add additional costs to package cost
-        costo_base_paquete = costo_materiales_paquete + self.calcular_costo_adicionales_total()
-
-        # Apply margins to package base cost (materials + additional costs)
-        precio_publico_paquete = costo_base_paquete / (1 - self.margen_publico / 100) if self.margen_publico < 100 else Decimal('0')
-        precio_mayorista_paquete = costo_base_paquete / (1 - self.margen_mayorista / 100) if self.margen_mayorista < 100 else Decimal('0')
-        precio_distribuidor_paquete = costo_base_paquete / (1 - self.margen_distribuidor / 100) if self.margen_distribuidor < 100 else Decimal('0')
-
-        # Calculate IVA on package prices
-        iva_pct = self.iva_percentage or 21.0
-        iva_factor = Decimal(iva_pct / 100)
-
-        return {
-            'costo_paquete': costo_base_paquete,
-            'precio_publico_paquete': precio_publico_paquete,
-            'precio_mayorista_paquete': precio_mayorista_paquete,
-            'precio_distribuidor_paquete': precio_distribuidor_paquete,
-            'precio_publico_con_iva_paquete': precio_publico_paquete + (precio_publico_paquete * iva_factor),
-            'precio_mayorista_con_iva_paquete': precio_mayorista_paquete + (precio_mayorista_paquete * iva_factor),
-            'precio_distribuidor_con_iva_paquete': precio_distribuidor_paquete + (precio_distribuidor_paquete * iva_factor)
-        }
+        return self.pricing_snapshot().precios_por_empaque()
 
 
 class ProductMaterial(BaseEntity):
@@ -186,8 +281,168 @@ class ProductMaterial(BaseEntity):
     product = relationship("Product", back_populates="product_materials")
     material = relationship("Material", back_populates="product_materials")
 
+    # Reverse index: material -> products that use it
+    __table_args__ = (
+        Index('ix_product_materials_material_product', 'material_id', 'product_id'),
+    )
+
     def calcular_costo(self) -> Decimal:
         """Calculate cost for this material in the product"""
         if self.material and self.material.is_active:
             return self.material.calcular_precio_cantidad(self.cantidad)
-        return Decimal('0')
\ No newline at end of file
+        return Decimal('0')
+
+
+class ProductComponent(BaseEntity):
+    """An intermediate product (e.g. a soap base) used as an ingredient of another product"""
+    __tablename__ = "product_components"
+
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True)
+    component_product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    cantidad = Column(Numeric(10, 2), nullable=False)  # quantity in grams/ml
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    product = relationship("Product", foreign_keys=[product_id], back_populates="components")
+    component = relationship("Product", foreign_keys=[component_product_id])
+
+    # Reverse index: intermediate product -> products that use it
+    __table_args__ = (
+        Index('ix_product_components_component_product', 'component_product_id', 'product_id'),
+    )
+
+    def calcular_costo(self) -> Decimal:
+        """Calculate cost for this intermediate product in the recipe"""
+        if self.component and self.component.is_active:
+            return calcular_costo_componente(self.component.pricing_snapshot(), self.cantidad)
+        return Decimal('0')
+
+
+# SQL counterparts of the pricing snapshot. They follow the same formulas; the
+# values reported by the API still come from the fixed-point core, so rounding
+# can differ in the last micro-unit. Only raw materials are aggregated, so the
+# product listing filters and sorts on product_cost_snapshots, which include
+# intermediate products, and uses these only for products without a snapshot.
+def _sql_decimal(value: str):
+    # Numeric literal keeps Postgres in NUMERIC and avoids integer division on SQLite
+    return literal(Decimal(value), Numeric(20, 10))
+
+
+def _costo_materiales_expression(cls):
+    return select(
+        func.coalesce(func.sum(ProductMaterial.cantidad * Material.precio_unidad_pequena), 0)
+    ).select_from(ProductMaterial).join(
+        Material, Material.id == ProductMaterial.material_id
+    ).where(
+        ProductMaterial.product_id == cls.id,
+        Material.is_active == True
+    ).correlate(cls).scalar_subquery()
+
+
+def _costo_por_gramo_expression(cls):
+    # One correlated aggregate over the recipe; falls back to material weight
+    costo = func.coalesce(func.sum(ProductMaterial.cantidad * Material.precio_unidad_pequena), 0) * _sql_decimal('1')
+    peso = func.coalesce(func.sum(ProductMaterial.cantidad), 0)
+    return select(
+        case(
+            (cls.peso_final_producido > 0, costo / cls.peso_final_producido),
+            (peso > 0, costo / peso),
+            else_=0
+        )
+    ).select_from(ProductMaterial).join(
+        Material, Material.id == ProductMaterial.material_id
+    ).where(
+        ProductMaterial.product_id == cls.id,
+        Material.is_active == True
+    ).correlate(cls).scalar_subquery()
+
+
+def _costo_adicionales_expression(cls):
+    total = cls.costo_transporte
+    for column in (
+        cls.costo_etiqueta, cls.costo_envase, cls.costo_caja, cls.costo_mano_obra, cls.costo_energia,
+        cls.costo_depreciacion, cls.costo_mantenimiento, cls.costo_administrativo,
+        cls.costo_comercializacion, cls.costo_financiero
+    ):
+        total = total + func.coalesce(column, 0)
+    return total
+
+
+def _costo_paquete_expression(cls):
+    adicionales = _costo_adicionales_expression(cls)
+    return case(
+        (and_(cls.peso_empaque != None, cls.peso_empaque != 0),
+         _costo_por_gramo_expression(cls) * cls.peso_empaque + adicionales),
+        else_=adicionales
+    )
+
+
+def _precio_expression(cls, margen):
+    cien = _sql_decimal('100')
+    return case(
+        (margen < 100, _costo_paquete_expression(cls) * cien / (cien - margen)),
+        else_=0
+    )
+
+
+def _iva_percentage_expression(cls):
+    # Same as `iva_percentage or 21`: NULL and 0 fall back to the default
+    return func.coalesce(func.nullif(cls.iva_percentage, 0), _sql_decimal(str(DEFAULT_IVA_PERCENTAGE)))
+
+
+def _iva_expression(cls, margen):
+    return _precio_expression(cls, margen) * _iva_percentage_expression(cls) / _sql_decimal('100')
+
+
+def _precio_con_iva_expression(cls, margen):
+    cien = _sql_decimal('100')
+    return _precio_expression(cls, margen) * (cien + _iva_percentage_expression(cls)) / cien
+
+
+# Product columns that feed into the pricing snapshot
+PRICING_COLUMNS = (
+    'iva_percentage', 'margen_publico', 'margen_mayorista', 'margen_distribuidor',
+    'costo_etiqueta', 'costo_envase', 'costo_caja', 'costo_transporte', 'costo_mano_obra',
+    'costo_energia', 'costo_depreciacion', 'costo_mantenimiento', 'costo_administrativo',
+    'costo_comercializacion', 'costo_financiero', 'peso_ingredientes_base',
+    'peso_final_producido', 'peso_empaque'
+)
+
+
+def _invalidate_pricing(target, *args) -> None:
+    """
+    Drop the memoized snapshot of `target`, if it is a product, and of every
+    product priced from it, directly or through intermediate products. Only
+    what is downstream of the change is recomputed; other snapshots stay.
+    """
+    pending = [target]
+    while pending:
+        node = pending.pop()
+        # Expire events may fire for instances that were already garbage collected
+        if node is None:
+            continue
+        node.__dict__.pop('_pricing_cache', None)
+        dependents = node.__dict__.pop(_DEPENDENTS_KEY, None)
+        if dependents:
+            pending.extend(dependents)
+
+
+event.listen(Product.product_materials, 'append', _invalidate_pricing)
+event.listen(Product.product_materials, 'remove', _invalidate_pricing)
+event.listen(Product.components, 'append', _invalidate_pricing)
+event.listen(Product.components, 'remove', _invalidate_pricing)
+
+# Each changed node invalidates itself and what was priced from it: products
+# through their own columns, recipe lines, and material prices.
+for _column in PRICING_COLUMNS + ('is_active',):
+    event.listen(getattr(Product, _column), 'set', _invalidate_pricing)
+event.listen(Product, 'expire', _invalidate_pricing)
+for _attr in (ProductMaterial.cantidad, ProductMaterial.material_id, ProductMaterial.material):
+    event.listen(_attr, 'set', _invalidate_pricing)
+event.listen(ProductMaterial, 'expire', _invalidate_pricing)
+for _attr in (ProductComponent.cantidad, ProductComponent.component_product_id, ProductComponent.component):
+    event.listen(_attr, 'set', _invalidate_pricing)
+event.listen(ProductComponent, 'expire', _invalidate_pricing)
+for _attr in (Material.precio_unidad_pequena, Material.is_active):
+    event.listen(_attr, 'set', _invalidate_pricing)
+event.listen(Material, 'expire', _invalidate_pricing)
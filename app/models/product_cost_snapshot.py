@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, Numeric, ForeignKey
+from sqlalchemy.orm import relationship
+
+from .base import BaseEntity
+
+
+class ProductCostSnapshot(BaseEntity):
+    """
+    Precomputed cost and tier prices of a product, kept in sync with material
+    prices. Package-size variants have no snapshot of their own: their prices
+    are derived on read from the product's evaluated recipe (calcular_variante).
+    """
+    __tablename__ = "product_cost_snapshots"
+
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False, unique=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    costo_materiales = Column(Numeric(20, 10), nullable=False)
+    costo_por_gramo = Column(Numeric(20, 10), nullable=False)
+    costo_paquete = Column(Numeric(20, 10), nullable=False)
+    precio_publico = Column(Numeric(20, 10), nullable=False)
+    precio_mayorista = Column(Numeric(20, 10), nullable=False)
+    precio_distribuidor = Column(Numeric(20, 10), nullable=False)
+    precio_publico_con_iva = Column(Numeric(20, 10), nullable=False)
+    precio_mayorista_con_iva = Column(Numeric(20, 10), nullable=False)
+    precio_distribuidor_con_iva = Column(Numeric(20, 10), nullable=False)
+
+    product = relationship("Product", back_populates="cost_snapshot")
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, Numeric, Boolean, ForeignKey
+from sqlalchemy.orm import relationship
+
+from .base import BaseEntity
+
+
+class ProductVariant(BaseEntity):
+    """Package size of a product; every variant shares the product's recipe"""
+    __tablename__ = "product_variants"
+
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    nombre = Column(String, nullable=True)  # Optional label, e.g. "Galon"
+    peso_empaque = Column(Numeric(10, 2), nullable=False)  # Package weight in grams
+    costo_extra = Column(Numeric(10, 2), nullable=True, default=0.0)  # Extra cost per package on top of the product's
+    is_active = Column(Boolean, default=True)
+
+    product = relationship("Product", back_populates="variants")
@@ -0,0 +1,22 @@
+from typing import List, Optional
+from datetime import datetime
+from pydantic import BaseModel
+
+
+class AuditLogResponse(BaseModel):
+    id: int
+    user_id: int
+    material_id: Optional[int] = None
+    action: str
+    description: Optional[str] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class AuditRetentionResult(BaseModel):
+    corte: datetime  # Entries created before this instant left audit_logs
+    archivados: int  # Rows moved to audit_log_archive
+    particiones_desvinculadas: List[str]  # PostgreSQL partitions detached as standalone tables
+    particiones_creadas: List[str]  # PostgreSQL partitions created for the coming months
@@ -13,6 +13,7 @@ class MaterialBase(BaseModel):
     nombre: str
     precio_base: Decimal
     unidad_base: UnidadBase = UnidadBase.KG
+    densidad: Optional[Decimal] = None  # g/ml, used to convert litres to grams
     cantidades_deseadas: Optional[List[Decimal]] = None
 
 class MaterialCreate(MaterialBase):
@@ -23,10 +24,18 @@ class MaterialCreate(MaterialBase):
             raise ValueError('precio_base must be positive')
         return v
 
+    @field_validator('densidad', mode='after')
+    @classmethod
+    def densidad_must_be_positive(cls, v):
+        if v is not None and v <= 0:
+            raise ValueError('densidad must be positive')
+        return v
+
 class MaterialUpdate(BaseModel):
     nombre: Optional[str] = None
     precio_base: Optional[Decimal] = None
     unidad_base: Optional[UnidadBase] = None
+    densidad: Optional[Decimal] = None  # null clears it; omit the field to keep it
 
     @field_validator('precio_base', mode='after')
     @classmethod
@@ -35,20 +44,90 @@ class MaterialUpdate(BaseModel):
             raise ValueError('precio_base must be positive')
         return v
 
+    @field_validator('densidad', mode='after')
+    @classmethod
+    def densidad_positive(cls, v):
+        if v is not None and v <= 0:
+            raise ValueError('densidad must be positive')
+        return v
+
 class MaterialResponse(BaseModel):
     id: int
     nombre: str
     precio_base: Decimal
     unidad_base: str
     precio_unidad_pequena: Decimal
+    densidad: Optional[Decimal] = None
     is_active: bool
 
     class Config:
         from_attributes = True
 
+class MaterialUnitCreate(BaseModel):
+    nombre: str
+    cantidad: Decimal
+    unidad: str  # Standard unit: g, kg, ml, l, galon, ...
+
+    @field_validator('cantidad', mode='after')
+    @classmethod
+    def cantidad_must_be_positive(cls, v):
+        if v <= 0:
+            raise ValueError('cantidad must be positive')
+        return v
+
+class MaterialUnitResponse(BaseModel):
+    id: int
+    material_id: int
+    nombre: str
+    cantidad: Decimal
+    unidad: str
+    gramos: Decimal  # Grams in one unit, including the material density
+
+    class Config:
+        from_attributes = True
+
 class CostosResponse(BaseModel):
     material: MaterialResponse
     costos: dict[str, Decimal]
 
 class CantidadQuery(BaseModel):
-    cantidades: List[Decimal]
\ No newline at end of file
+    cantidades: List[Decimal]
+    unidad: str = 'g'  # Standard or material-specific unit of the quantities
+
+# Bounds of one cost matrix request
+MAX_MATRIX_MATERIALS = 500
+MAX_MATRIX_CANTIDADES = 100
+
+class CostMatrixRequest(BaseModel):
+    material_ids: List[int]
+    cantidades: List[Decimal]
+    unidad: str = 'g'  # Standard or material-specific unit of the quantities
+
+    @field_validator('material_ids', mode='after')
+    @classmethod
+    def material_ids_in_range(cls, v):
+        if not v:
+            raise ValueError('At least one material id is required')
+        if len(set(v)) > MAX_MATRIX_MATERIALS:
+            raise ValueError(f'At most {MAX_MATRIX_MATERIALS} materials per request')
+        return v
+
+    @field_validator('cantidades', mode='after')
+    @classmethod
+    def cantidades_in_range(cls, v):
+        if not v:
+            raise ValueError('At least one cantidad is required')
+        if len(v) > MAX_MATRIX_CANTIDADES:
+            raise ValueError(f'At most {MAX_MATRIX_CANTIDADES} cantidades per request')
+        return v
+
+class CostMatrixResponse(BaseModel):
+    # Columnar: one entry per material in material_ids, nombres and gramos_por_unidad;
+    # costos[i][j] is the cost of cantidades[j] of material_ids[i]
+    unidad: str
+    cantidades: List[Decimal]
+    material_ids: List[int]
+    nombres: List[str]
+    gramos_por_unidad: List[Decimal]
+    costos: List[List[Decimal]]
+    no_encontrados: List[int]  # Requested ids that are not active materials of the user
\ No newline at end of file
@@ -0,0 +1,55 @@
+from typing import List, Optional
+from decimal import Decimal
+from pydantic import BaseModel, field_validator
+
+
+class MaterialPriceImportRow(BaseModel):
+    material_id: Optional[int] = None
+    material: Optional[str] = None  # Material name, when the id is not known
+    precio_base: Decimal
+
+    @field_validator('precio_base', mode='after')
+    @classmethod
+    def precio_base_must_be_positive(cls, v):
+        if v <= 0:
+            raise ValueError('precio_base must be positive')
+        return v
+
+
+class MaterialPriceImportError(BaseModel):
+    line: int
+    material: Optional[str] = None
+    error: str
+
+
+class ImportedMaterialPrice(BaseModel):
+    material_id: int
+    nombre: str
+    precio_base_anterior: Decimal
+    precio_base_nuevo: Decimal
+
+
+class ImportedProductPriceDelta(BaseModel):
+    product_id: int
+    nombre: str
+    costo_paquete_anterior: Decimal
+    costo_paquete_nuevo: Decimal
+    delta_costo_paquete: Decimal
+    precio_publico_anterior: Decimal
+    precio_publico_nuevo: Decimal
+    delta_precio_publico: Decimal
+    precio_mayorista_anterior: Decimal
+    precio_mayorista_nuevo: Decimal
+    delta_precio_mayorista: Decimal
+    precio_distribuidor_anterior: Decimal
+    precio_distribuidor_nuevo: Decimal
+    delta_precio_distribuidor: Decimal
+
+
+class MaterialPriceImportResult(BaseModel):
+    updated: int
+    unchanged: int  # Rows whose price was already current
+    failed: int
+    materiales: List[ImportedMaterialPrice]
+    productos: List[ImportedProductPriceDelta]  # Every product whose cost was recomputed
+    errors: List[MaterialPriceImportError]  # Capped at MAX_REPORTED_ERRORS; `failed` counts them all
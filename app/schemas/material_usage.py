@@ -0,0 +1,36 @@
+from typing import List, Optional
+from decimal import Decimal
+from pydantic import BaseModel, field_validator
+
+# Materials accepted by one batch where-used request
+MAX_WHERE_USED_MATERIALS = 500
+
+
+class MaterialWhereUsedRequest(BaseModel):
+    material_ids: List[int]
+
+    @field_validator('material_ids', mode='after')
+    @classmethod
+    def material_ids_in_range(cls, v):
+        if not v:
+            raise ValueError('At least one material id is required')
+        if len(set(v)) > MAX_WHERE_USED_MATERIALS:
+            raise ValueError(f'At most {MAX_WHERE_USED_MATERIALS} materials per request')
+        return v
+
+
+class MaterialUsage(BaseModel):
+    product_id: int
+    nombre: str
+    cantidad: Decimal  # Grams of the material in the recipe
+    costo: Decimal  # cantidad * precio_unidad_pequena
+    porcentaje_costo: Optional[Decimal] = None  # Share of the product's recipe cost; None without a cost snapshot
+
+
+class MaterialWhereUsed(BaseModel):
+    material_id: int
+    nombre: str
+    precio_unidad_pequena: Decimal
+    total_productos: int
+    costo_total: Decimal  # Sum of the material's cost over every product using it
+    productos: List[MaterialUsage]  # Highest cost first
@@ -0,0 +1,40 @@
+from typing import List, Optional
+from decimal import Decimal
+from datetime import datetime
+from pydantic import BaseModel
+
+
+class MaterialPriceHistoryResponse(BaseModel):
+    id: int
+    material_id: int
+    version: int
+    precio_base: Decimal
+    unidad_base: str
+    precio_unidad_pequena: Decimal
+    valid_from: datetime
+    valid_to: Optional[datetime] = None  # None while the price is current
+
+    class Config:
+        from_attributes = True
+
+
+class ProductCostPoint(BaseModel):
+    fecha: datetime
+    costo_materiales: Decimal
+    costo_por_gramo: Decimal
+    costo_paquete: Decimal
+    precio_publico: Decimal
+    precio_mayorista: Decimal
+    precio_distribuidor: Decimal
+
+
+class ProductCostSeries(BaseModel):
+    product_id: int
+    nombre: str
+    puntos: List[ProductCostPoint]
+
+
+class CostHistoryResponse(BaseModel):
+    """Product costs reconstructed from the material price history at each date"""
+    fechas: List[datetime]
+    productos: List[ProductCostSeries]
@@ -0,0 +1,54 @@
+from typing import List, Optional
+from decimal import Decimal
+from pydantic import BaseModel, field_validator
+
+
+class MaterialPriceChange(BaseModel):
+    material_id: int
+    precio_base: Decimal
+
+    @field_validator('precio_base', mode='after')
+    @classmethod
+    def precio_base_must_be_positive(cls, v):
+        if v <= 0:
+            raise ValueError('precio_base must be positive')
+        return v
+
+
+class PriceSimulationRequest(BaseModel):
+    cambios: List[MaterialPriceChange]
+    margen_minimo: Optional[Decimal] = None  # Flag products whose margin at current prices drops below this
+
+    @field_validator('cambios', mode='after')
+    @classmethod
+    def cambios_not_empty(cls, v):
+        if not v:
+            raise ValueError('At least one material price change is required')
+        return v
+
+
+class ProductPriceDelta(BaseModel):
+    product_id: int
+    nombre: str
+    costo_paquete_actual: Decimal
+    costo_paquete_simulado: Decimal
+    delta_costo_paquete: Decimal
+    precio_publico_actual: Decimal
+    precio_publico_simulado: Decimal
+    delta_precio_publico: Decimal
+    precio_mayorista_actual: Decimal
+    precio_mayorista_simulado: Decimal
+    delta_precio_mayorista: Decimal
+    precio_distribuidor_actual: Decimal
+    precio_distribuidor_simulado: Decimal
+    delta_precio_distribuidor: Decimal
+    # Margin left if current prices are kept and the new costs are absorbed
+    margen_efectivo_publico: Decimal
+    margen_efectivo_mayorista: Decimal
+    margen_efectivo_distribuidor: Decimal
+    bajo_margen_minimo: bool = False
+
+
+class PriceSimulationResponse(BaseModel):
+    productos: List[ProductPriceDelta]
+    total_productos: int
@@ -1,7 +1,7 @@
 from typing import List, Optional
 from decimal import Decimal
 from datetime import datetime
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, field_validator, model_validator
 
 from .material import MaterialResponse
 
@@ -46,6 +46,30 @@ class ProductMaterialResponse(BaseModel):
         from_attributes = True
 
 
+class ProductComponentCreate(BaseModel):
+    component_product_id: int
+    cantidad: Decimal
+
+    @field_validator('cantidad', mode='after')
+    @classmethod
+    def cantidad_must_be_positive(cls, v):
+        if v <= 0:
+            raise ValueError('cantidad must be positive')
+        return v
+
+
+class ProductComponentResponse(BaseModel):
+    id: int
+    product_id: int
+    component_product_id: int
+    nombre: str
+    cantidad: Decimal
+    costo: Decimal
+
+    class Config:
+        from_attributes = True
+
+
 class ProductBase(BaseModel):
     nombre: str
     iva_percentage: float = 21.0
@@ -159,6 +183,7 @@ class ProductResponse(BaseModel):
     created_at: datetime
     updated_at: Optional[datetime] = None
     product_materials: List[ProductMaterialResponse] = []
+    product_components: List[ProductComponentResponse] = []
 
     class Config:
         from_attributes = True
@@ -177,4 +202,130 @@ class ProductSummaryResponse(BaseModel):
 class CostosTotalesResponse(BaseModel):
     productos: List[ProductSummaryResponse]
     costo_total_general: Decimal
-    total_productos: int
\ No newline at end of file
+    total_productos: int
+
+
+class PriceMatrixRequest(BaseModel):
+    pesos_empaque: List[Decimal]
+    margenes: List[Decimal]
+    iva_percentages: Optional[List[Decimal]] = None  # Defaults to the product IVA
+
+    @field_validator('pesos_empaque', mode='after')
+    @classmethod
+    def pesos_valid(cls, v):
+        if not v or len(v) > 100:
+            raise ValueError('pesos_empaque must have between 1 and 100 values')
+        if any(peso <= 0 for peso in v):
+            raise ValueError('Package weights must be positive')
+        return v
+
+    @field_validator('margenes', mode='after')
+    @classmethod
+    def margenes_valid(cls, v):
+        if not v or len(v) > 100:
+            raise ValueError('margenes must have between 1 and 100 values')
+        if any(margen < 0 or margen >= 100 for margen in v):
+            raise ValueError('Margin percentage must be between 0 and 99.99')
+        return v
+
+    @field_validator('iva_percentages', mode='after')
+    @classmethod
+    def iva_percentages_valid(cls, v):
+        if v is not None:
+            if not v or len(v) > 10:
+                raise ValueError('iva_percentages must have between 1 and 10 values')
+            if any(iva < 0 or iva > 100 for iva in v):
+                raise ValueError('IVA percentage must be between 0 and 100')
+        return v
+
+
+class PriceMatrixResponse(BaseModel):
+    product_id: int
+    costo_por_gramo: Decimal
+    costo_adicionales: Decimal
+    pesos_empaque: List[Decimal]
+    margenes: List[Decimal]
+    iva_percentages: List[Decimal]
+    costos_paquete: List[Decimal]  # [peso]
+    precios: List[List[Decimal]]  # [peso][margen]
+    precios_con_iva: List[List[List[Decimal]]]  # [peso][margen][iva]
+
+
+class ProductDuplicateItem(BaseModel):
+    nombre: str
+    peso_empaque: Decimal
+
+    @field_validator('nombre', mode='after')
+    @classmethod
+    def nombre_not_empty(cls, v):
+        if not v.strip():
+            raise ValueError('Product name cannot be empty')
+        return v.strip()
+
+    @field_validator('peso_empaque', mode='after')
+    @classmethod
+    def peso_empaque_must_be_positive(cls, v):
+        if v <= 0:
+            raise ValueError('peso_empaque must be positive')
+        return v
+
+
+class ProductBulkDuplicateRequest(BaseModel):
+    variantes: List[ProductDuplicateItem]
+
+    @field_validator('variantes', mode='after')
+    @classmethod
+    def variantes_valid(cls, v):
+        if not v or len(v) > 100:
+            raise ValueError('variantes must have between 1 and 100 entries')
+        nombres = [item.nombre for item in v]
+        if len(set(nombres)) != len(nombres):
+            raise ValueError('Product names must be unique within the request')
+        return v
+
+
+class CostQuoteLine(BaseModel):
+    product_id: Optional[int] = None
+    material_id: Optional[int] = None  # Quote a raw material instead of a product
+    quantity: Decimal
+    unit: str = 'g'  # Standard unit, or a material-specific one on material lines
+
+    @field_validator('quantity', mode='after')
+    @classmethod
+    def quantity_must_be_positive(cls, v):
+        if v <= 0:
+            raise ValueError('quantity must be positive')
+        return v
+
+    @model_validator(mode='after')
+    def one_item(self):
+        if (self.product_id is None) == (self.material_id is None):
+            raise ValueError('Each line needs exactly one of product_id or material_id')
+        return self
+
+
+class CostQuoteRequest(BaseModel):
+    lines: List[CostQuoteLine]
+
+    @field_validator('lines', mode='after')
+    @classmethod
+    def lines_valid(cls, v):
+        if not v or len(v) > 500:
+            raise ValueError('lines must have between 1 and 500 entries')
+        return v
+
+
+class CostQuoteLineResponse(BaseModel):
+    product_id: Optional[int] = None
+    material_id: Optional[int] = None
+    nombre: str
+    quantity: Decimal
+    unit: str
+    gramos: Decimal
+    costo_por_gramo: Decimal
+    costo_total: Decimal
+
+
+class CostQuoteResponse(BaseModel):
+    lines: List[CostQuoteLineResponse]
+    costo_total: Decimal
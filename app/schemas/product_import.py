@@ -0,0 +1,35 @@
+from typing import List, Optional
+from decimal import Decimal
+from pydantic import BaseModel, field_validator
+
+from .product import ProductBase
+
+
+class ProductImportLine(BaseModel):
+    material_id: Optional[int] = None
+    material: Optional[str] = None  # Material name, when the id is not known
+    cantidad: Decimal
+
+    @field_validator('cantidad', mode='after')
+    @classmethod
+    def cantidad_must_be_positive(cls, v):
+        if v <= 0:
+            raise ValueError('cantidad must be positive')
+        return v
+
+
+class ProductImportRow(ProductBase):
+    product_materials: List[ProductImportLine] = []
+
+
+class ProductImportError(BaseModel):
+    line: int  # First line of the product in the source file
+    nombre: Optional[str] = None
+    error: str
+
+
+class ProductImportResult(BaseModel):
+    created: int
+    failed: int
+    product_ids: List[int]
+    errors: List[ProductImportError]  # Capped at MAX_REPORTED_ERRORS; `failed` counts them all
@@ -0,0 +1,79 @@
+from typing import List, Optional
+from decimal import Decimal
+from datetime import datetime
+from pydantic import BaseModel, field_validator
+
+
+class ProductVariantBase(BaseModel):
+    nombre: Optional[str] = None
+    peso_empaque: Decimal
+    costo_extra: Optional[Decimal] = Decimal('0')  # Extra cost per package on top of the product's additional costs
+
+    @field_validator('peso_empaque', mode='after')
+    @classmethod
+    def peso_empaque_must_be_positive(cls, v):
+        if v <= 0:
+            raise ValueError('peso_empaque must be positive')
+        return v
+
+    @field_validator('costo_extra', mode='after')
+    @classmethod
+    def costo_extra_non_negative(cls, v):
+        if v is not None and v < 0:
+            raise ValueError('costo_extra must be non-negative')
+        return v
+
+
+class ProductVariantCreate(ProductVariantBase):
+    pass
+
+
+class ProductVariantUpdate(BaseModel):
+    nombre: Optional[str] = None
+    peso_empaque: Optional[Decimal] = None
+    costo_extra: Optional[Decimal] = None
+
+    @field_validator('peso_empaque', mode='after')
+    @classmethod
+    def peso_empaque_positive(cls, v):
+        if v is not None and v <= 0:
+            raise ValueError('peso_empaque must be positive')
+        return v
+
+    @field_validator('costo_extra', mode='after')
+    @classmethod
+    def costo_extra_non_negative(cls, v):
+        if v is not None and v < 0:
+            raise ValueError('costo_extra must be non-negative')
+        return v
+
+
+class ProductVariantResponse(BaseModel):
+    id: int
+    product_id: int
+    nombre: Optional[str] = None
+    peso_empaque: Decimal
+    costo_extra: Decimal
+    costo_paquete: Decimal
+    precio_publico: Decimal
+    precio_mayorista: Decimal
+    precio_distribuidor: Decimal
+    precio_publico_con_iva: Decimal
+    precio_mayorista_con_iva: Decimal
+    precio_distribuidor_con_iva: Decimal
+    is_active: bool
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class ProductFamilyResponse(BaseModel):
+    """A product recipe with every package size priced from one recipe evaluation"""
+    product_id: int
+    nombre: str
+    costo_materiales: Decimal
+    costo_por_gramo: Decimal
+    variantes: List[ProductVariantResponse]
+    total_variantes: int
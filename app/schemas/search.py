@@ -0,0 +1,11 @@
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class SearchResult(BaseModel):
+    tipo: str  # 'producto', 'material' or 'lote'
+    id: int  # Product, material or inventory id
+    nombre: str  # Product or material name, or the lot code
+    detalle: Optional[str] = None  # Material base unit, or the product of a lot
+    rank: int  # 0 exact, 1 name prefix, 2 word prefix, 3 substring (PostgreSQL only)
@@ -0,0 +1,390 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, event, insert, inspect, literal, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.audit_log import AuditLog, AuditLogArchive
+from ..models.user import Role, User
+from ..schemas.audit_log import AuditRetentionResult
+from ..utils.pagination import Page, keyset_page
+
+# Session.info key of the events staged in the current transaction
+_PENDING_KEY = "pending_audit_events"
+
+
+class AuditEvent(NamedTuple):
+    user_id: int
+    material_id: Optional[int]
+    action: str
+    description: str
+    created_at: datetime
+
+
+def _write_events(bind: Engine, events: List[AuditEvent]) -> None:
+    """One multi-row INSERT in its own transaction"""
+    with bind.begin() as connection:
+        connection.execute(insert(AuditLog), [audit_event._asdict() for audit_event in events])
+
+
+class AuditWriter:
+    """
+    Bounded in-process queue of committed audit events, drained by one
+    background thread in multi-row INSERTs of up to `batch_size` rows.
+    Without a running worker, or when the queue is full, events are
+    written by the caller instead, in a single attempt so the request
+    never waits on a failing audit store. The worker retries a failed
+    write with exponential backoff. A batch that still fails is appended
+    to `fallback_path` and replayed after a later successful write, so no
+    committed event is lost.
+    """
+
+    def __init__(self, maxsize: int, batch_size: int, interval: float, retries: int = 4,
+                 backoff: float = 0.2, fallback_path: Optional[str] = None):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.retries = max(1, retries)
+        self.backoff = backoff
+        self.fallback_path = fallback_path
+        self._fallback_lock = threading.Lock()
+        self._queue: "queue.Queue[Tuple[Engine, AuditEvent]]" = queue.Queue(maxsize)
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._atexit_registered = False
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        with self._lock:
+            if self.running:
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+            if not self._atexit_registered:
+                atexit.register(self.stop)
+                self._atexit_registered = True
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """Write every queued event, then stop the worker"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stopping.set()
+            thread.join(timeout)
+            if thread.is_alive():
+                logging.error("Audit writer did not stop within %s seconds", timeout)
+        # Events queued while the worker was shutting down
+        self._drain()
+
+    def flush(self) -> None:
+        """Block until every queued event has been written"""
+        if self.running:
+            self._queue.join()
+        else:
+            self._drain()
+
+    def submit(self, bind: Engine, events: List[AuditEvent]) -> None:
+        if not self.running:
+            self._write(bind, events, inline=True)
+            return
+        overflow = []
+        for audit_event in events:
+            try:
+                self._queue.put_nowait((bind, audit_event))
+            except queue.Full:
+                overflow.append(audit_event)
+        if overflow:
+            logging.warning("Audit queue full; writing %d events inline", len(overflow))
+            self._write(bind, overflow, inline=True)
+
+    def _run(self) -> None:
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self.interval)]
+            except queue.Empty:
+                if self._stopping.is_set():
+                    return
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write_batch(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _drain(self) -> None:
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._write_batch(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write_batch(self, batch: List[Tuple[Engine, AuditEvent]]) -> None:
+        by_bind = defaultdict(list)
+        for bind, audit_event in batch:
+            by_bind[bind].append(audit_event)
+        for bind, events in by_bind.items():
+            self._write(bind, events)
+
+    def _write(self, bind: Engine, events: List[AuditEvent], inline: bool = False) -> None:
+        """
+        Inline writes run on the request thread: one attempt, and the replay
+        of the fallback file is left to the worker when there is one
+        """
+        attempts = 1 if inline else self.retries
+        delay = self.backoff
+        for attempt in range(1, attempts + 1):
+            try:
+                _write_events(bind, events)
+                break
+            except Exception:
+                if attempt == attempts:
+                    logging.error("Could not write %d audit events after %d attempts", len(events), attempt,
+                                  exc_info=True)
+                    self._save_fallback(events)
+                    return
+                logging.warning("Audit write failed (attempt %d of %d); retrying in %.2f s",
+                                attempt, attempts, delay, exc_info=True)
+                time.sleep(delay)
+                delay *= 2
+        if not (inline and self.running):
+            self._replay_fallback(bind)
+
+    def _save_fallback(self, events: List[AuditEvent]) -> None:
+        if not self.fallback_path:
+            logging.error("No audit fallback file; dropping %d events: %r", len(events), events)
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.fallback_path)), exist_ok=True)
+        with self._fallback_lock, open(self.fallback_path, "a", encoding="utf-8") as fallback:
+            for audit_event in events:
+                fallback.write(json.dumps({**audit_event._asdict(), "created_at": audit_event.created_at.isoformat()}) + "\n")
+
+    def _replay_fallback(self, bind: Engine) -> None:
+        """Write the events saved while the database was failing, then remove the file"""
+        if not self.fallback_path or not os.path.exists(self.fallback_path):
+            return
+        with self._fallback_lock:
+            try:
+                with open(self.fallback_path, encoding="utf-8") as fallback:
+                    events = [
+                        AuditEvent(**{**row, "created_at": datetime.fromisoformat(row["created_at"])})
+                        for row in map(json.loads, filter(str.strip, fallback))
+                    ]
+                if events:
+                    _write_events(bind, events)
+                os.remove(self.fallback_path)
+            except FileNotFoundError:
+                return
+            except Exception:
+                logging.error("Could not replay the audit fallback file %s", self.fallback_path, exc_info=True)
+                return
+        logging.warning("Replayed %d audit events from %s", len(events), self.fallback_path)
+
+
+audit_writer = AuditWriter(
+    settings.audit_queue_size, settings.audit_batch_size, settings.audit_flush_interval,
+    retries=settings.audit_write_retries, backoff=settings.audit_retry_backoff,
+    fallback_path=settings.audit_fallback_path
+)
+
+
+def start_audit_writer() -> None:
+    """Start the background writer, unless write-behind is disabled in the settings"""
+    if settings.audit_write_behind:
+        audit_writer.start()
+
+
+def _entity_id(entity: Any) -> Optional[int]:
+    if entity is None or isinstance(entity, int):
+        return entity
+    # The identity survives expire-on-commit, so reading it emits no SQL
+    identity = inspect(entity).identity
+    return identity[0] if identity else None
+
+
+def record_audit(db: Session, user_id: int, action: str, description: str, material: Any = None) -> None:
+    """
+    Stage an audit event in the session's transaction. `material` may be an
+    instance not flushed yet: its id is read once the transaction commits.
+    Committed events go to the audit writer; rolled back ones are dropped.
+    """
+    db.info.setdefault(_PENDING_KEY, []).append((user_id, material, action, description, datetime.utcnow()))
+
+
+@event.listens_for(Session, "after_commit")
+def _submit_committed_events(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    audit_writer.submit(session.get_bind(), [
+        AuditEvent(user_id, _entity_id(material), action, description, created_at)
+        for user_id, material, action, description, created_at in pending
+    ])
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_events(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def get_audit_logs(
+    db: Session,
+    user: User,
+    material_id: Optional[int] = None,
+    action: Optional[str] = None,
+    user_id: Optional[int] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    total: Optional[str] = None
+) -> Page:
+    """
+    Audit entries, newest first. Users see their own entries; administrators
+    see everyone's, or one user's with `user_id`. `desde` is inclusive and
+    `hasta` exclusive; on PostgreSQL the range prunes the monthly partitions.
+    """
+    if user.role != Role.ADMIN:
+        if user_id is not None and user_id != user.id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Cannot read other users' audit log")
+        user_id = user.id
+
+    query = db.query(AuditLog)
+    if user_id is not None:
+        query = query.filter(AuditLog.user_id == user_id)
+    if material_id is not None:
+        query = query.filter(AuditLog.material_id == material_id)
+    if action is not None:
+        query = query.filter(AuditLog.action == action)
+    if desde is not None:
+        query = query.filter(AuditLog.created_at >= desde)
+    if hasta is not None:
+        query = query.filter(AuditLog.created_at < hasta)
+    return keyset_page(db, query, "audit_logs:created_at", AuditLog.created_at, AuditLog.id, descending=True,
+                       cursor=cursor, limit=limit, total=total)
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def audit_partition_name(month: date) -> str:
+    return f"audit_logs_y{month.year:04d}m{month.month:02d}"
+
+
+def _audit_partitions(db: Session) -> List[str]:
+    return list(db.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = 'audit_logs'"
+    )).scalars())
+
+
+def _create_audit_partition(db: Session, month: date) -> str:
+    # Entries of the month may already sit in the default partition; they move to the new one
+    name = audit_partition_name(month)
+    bounds = {"start": datetime(month.year, month.month, 1), "end": datetime.combine(_add_months(month, 1), datetime.min.time())}
+    in_month = "created_at >= :start AND created_at < :end"
+    db.execute(text("ALTER TABLE audit_logs DETACH PARTITION audit_logs_default"))
+    db.execute(text(
+        f"CREATE TABLE {name} PARTITION OF audit_logs "
+        f"FOR VALUES FROM ('{bounds['start'].isoformat()}+00') TO ('{bounds['end'].isoformat()}+00')"
+    ))
+    db.execute(text(f"INSERT INTO {name} SELECT * FROM audit_logs_default WHERE {in_month}"), bounds)
+    db.execute(text(f"DELETE FROM audit_logs_default WHERE {in_month}"), bounds)
+    db.execute(text("ALTER TABLE audit_logs ATTACH PARTITION audit_logs_default DEFAULT"))
+    return name
+
+
+def ensure_audit_partitions(db: Session, months_ahead: Optional[int] = None, today: Optional[date] = None) -> List[str]:
+    """
+    PostgreSQL: create the monthly partitions of audit_logs from the current
+    month through `months_ahead` months, returning the new ones. Entries
+    outside every partition land in audit_logs_default. No-op elsewhere.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return []
+    months_ahead = settings.audit_partition_months_ahead if months_ahead is None else months_ahead
+    month = (today or datetime.utcnow().date()).replace(day=1)
+    existing = set(_audit_partitions(db))
+    created = []
+    for offset in range(months_ahead + 1):
+        current = _add_months(month, offset)
+        if audit_partition_name(current) not in existing:
+            created.append(_create_audit_partition(db, current))
+    db.commit()
+    return created
+
+
+def _archive_audit_rows(db: Session, cutoff: datetime, batch_size: int) -> int:
+    """Move entries older than `cutoff` to audit_log_archive, one committed batch at a time"""
+    archived = 0
+    columns = ("id", "user_id", "material_id", "action", "description", "created_at")
+    while True:
+        ids = db.scalars(
+            select(AuditLog.id).where(AuditLog.created_at < cutoff).order_by(AuditLog.id).limit(batch_size)
+        ).all()
+        if not ids:
+            return archived
+        db.execute(insert(AuditLogArchive).from_select(
+            [*columns, "archived_at"],
+            select(*(getattr(AuditLog, column) for column in columns), literal(datetime.utcnow(), AuditLogArchive.archived_at.type))
+            .where(AuditLog.id.in_(ids))
+        ))
+        db.execute(delete(AuditLog).where(AuditLog.id.in_(ids)), execution_options={"synchronize_session": False})
+        db.commit()
+        archived += len(ids)
+
+
+def apply_audit_retention(
+    db: Session, months: Optional[int] = None, today: Optional[date] = None, batch_size: int = 5000
+) -> AuditRetentionResult:
+    """
+    Keep `months` whole months of audit history (plus the current one) in
+    audit_logs. On PostgreSQL, expired monthly partitions are detached and
+    left as standalone tables, without rewriting any row, and upcoming
+    partitions are created. Remaining expired rows, and every expired row on
+    other databases, are archived to audit_log_archive and deleted.
+    """
+    months = settings.audit_retention_months if months is None else months
+    today = today or datetime.utcnow().date()
+    cutoff_month = _add_months(today.replace(day=1), -months)
+    cutoff = datetime(cutoff_month.year, cutoff_month.month, 1)
+
+    creadas, desvinculadas = [], []
+    if db.get_bind().dialect.name == "postgresql":
+        creadas = ensure_audit_partitions(db, today=today)
+        for name in sorted(_audit_partitions(db)):
+            if name != "audit_logs_default" and name < audit_partition_name(cutoff_month):
+                db.execute(text(f"ALTER TABLE audit_logs DETACH PARTITION {name}"))
+                desvinculadas.append(name)
+        db.commit()
+
+    archivados = _archive_audit_rows(db, cutoff, batch_size)
+    return AuditRetentionResult(
+        corte=cutoff, archivados=archivados, particiones_desvinculadas=desvinculadas, particiones_creadas=creadas
+    )
@@ -0,0 +1,166 @@
+from typing import Dict, Iterable, List, Mapping
+
+from sqlalchemy import exists, insert, select, update
+from sqlalchemy.orm import Session
+
+from ..models.product import Product, ProductMaterial
+from ..models.product_cost_snapshot import ProductCostSnapshot
+from ..models.user import User
+from ..utils.pricing import PricingSnapshot
+from .pricing_engine import downstream_products, load_component_graph, price_catalog
+
+
+# Snapshot columns, each stored from the PricingSnapshot field of the same name
+SNAPSHOT_PRICE_COLUMNS = (
+    'costo_materiales', 'costo_por_gramo', 'costo_paquete',
+    'precio_publico', 'precio_mayorista', 'precio_distribuidor',
+    'precio_publico_con_iva', 'precio_mayorista_con_iva', 'precio_distribuidor_con_iva'
+)
+
+
+def _apply_pricing(snapshot: ProductCostSnapshot, precios: PricingSnapshot) -> None:
+    for column in SNAPSHOT_PRICE_COLUMNS:
+        setattr(snapshot, column, getattr(precios, column))
+
+
+def refresh_product_cost_snapshots(db: Session, user: User, product_ids: Iterable[int]) -> Dict[int, ProductCostSnapshot]:
+    """
+    Recompute and upsert the cost snapshots of the given products and of every
+    product downstream of them in the recipe DAG.
+    Runs inside the caller's transaction; the caller is responsible for committing.
+    """
+    product_ids = list(set(product_ids))
+    if not product_ids:
+        return {}
+
+    # Make pending recipe and price changes visible to the batch queries below
+    db.flush()
+
+    # Products that use these as intermediate bases are re-evaluated too; nothing else is
+    product_ids = downstream_products(product_ids, load_component_graph(db, user))
+
+    products = db.query(Product).filter(
+        Product.id.in_(product_ids),
+        Product.user_id == user.id,
+        Product.is_active == True
+    ).all()
+    pricing = price_catalog(db, user, products)
+
+    existing = {
+        snapshot.product_id: snapshot
+        for snapshot in db.query(ProductCostSnapshot).filter(
+            ProductCostSnapshot.product_id.in_(product_ids)
+        ).all()
+    }
+
+    snapshots = {}
+    for product in products:
+        snapshot = existing.get(product.id)
+        if snapshot is None:
+            snapshot = ProductCostSnapshot(product_id=product.id, user_id=user.id)
+            db.add(snapshot)
+        _apply_pricing(snapshot, pricing.snapshots[product.id])
+        snapshots[product.id] = snapshot
+
+    return snapshots
+
+
+def store_product_cost_snapshots(db: Session, user: User, precios: Mapping[int, PricingSnapshot]) -> None:
+    """
+    Insert, in one statement, the snapshots of new products whose prices were
+    already computed. New products have no dependents, so nothing downstream
+    is refreshed.
+    """
+    rows = [
+        dict(product_id=product_id, user_id=user.id, **{
+            column: getattr(pricing, column) for column in SNAPSHOT_PRICE_COLUMNS
+        })
+        for product_id, pricing in precios.items()
+    ]
+    if rows:
+        db.execute(insert(ProductCostSnapshot), rows)
+
+
+def save_product_cost_snapshots(db: Session, user: User, precios: Mapping[int, PricingSnapshot]) -> None:
+    """
+    Upsert snapshots whose prices were already computed: one executemany
+    UPDATE of the existing rows by primary key and one INSERT of the rest.
+    The caller must include every product downstream of a changed one.
+    """
+    if not precios:
+        return
+    existing = dict(db.query(ProductCostSnapshot.product_id, ProductCostSnapshot.id).filter(
+        ProductCostSnapshot.product_id.in_(list(precios))
+    ).all())
+    updates = [
+        dict(id=existing[product_id], **{column: getattr(pricing, column) for column in SNAPSHOT_PRICE_COLUMNS})
+        for product_id, pricing in precios.items() if product_id in existing
+    ]
+    if updates:
+        db.execute(update(ProductCostSnapshot), updates)
+    store_product_cost_snapshots(db, user, {
+        product_id: pricing for product_id, pricing in precios.items() if product_id not in existing
+    })
+
+
+def get_products_using_materials(db: Session, user: User, material_ids: Iterable[int]) -> List[int]:
+    """Resolve the active products that use any of the given materials (material -> products reverse index)"""
+    material_ids = list(set(material_ids))
+    if not material_ids:
+        return []
+
+    rows = db.query(ProductMaterial.product_id).join(Product).filter(
+        ProductMaterial.material_id.in_(material_ids),
+        Product.user_id == user.id,
+        Product.is_active == True
+    ).distinct().all()
+    return [row.product_id for row in rows]
+
+
+def refresh_snapshots_for_materials(db: Session, user: User, material_ids: Iterable[int]) -> Dict[int, ProductCostSnapshot]:
+    """Incrementally refresh only the products affected by a material price change"""
+    product_ids = get_products_using_materials(db, user, material_ids)
+    return refresh_product_cost_snapshots(db, user, product_ids)
+
+
+def backfill_product_cost_snapshots(db: Session, batch_size: int = 500) -> int:
+    """
+    Write the snapshot of every active product that has none, for every
+    user, `batch_size` products per priced batch and commit. Deploy runs it
+    through backfill_cost_snapshots.py after the migrations, so the read model
+    is complete from deploy time. Returns the number of snapshots written.
+    """
+    missing = ~exists().where(ProductCostSnapshot.product_id == Product.id)
+    user_ids = db.scalars(
+        select(Product.user_id).where(Product.is_active == True, missing).distinct().order_by(Product.user_id)
+    ).all()
+
+    written = 0
+    for user in db.query(User).filter(User.id.in_(user_ids)).order_by(User.id).all() if user_ids else []:
+        while True:
+            products = db.query(Product).filter(
+                Product.user_id == user.id,
+                Product.is_active == True,
+                missing
+            ).order_by(Product.id).limit(batch_size).all()
+            if not products:
+                break
+            pricing = price_catalog(db, user, products)
+            store_product_cost_snapshots(db, user, {product.id: pricing.snapshots[product.id] for product in products})
+            db.commit()
+            written += len(products)
+    return written
+
+
+def get_product_cost_snapshot(db: Session, product: Product, user: User) -> ProductCostSnapshot:
+    """
+    Read the precomputed snapshot of a product, backfilling it if it does not
+    exist yet. Existing products are backfilled at deploy and every write path
+    stores one, so this fallback should not write in practice.
+    """
+    snapshot = db.query(ProductCostSnapshot).filter(
+        ProductCostSnapshot.product_id == product.id
+    ).first()
+    if snapshot is None:
+        snapshot = refresh_product_cost_snapshots(db, user, [product.id])[product.id]
+    return snapshot
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Optional
 from datetime import date, datetime
 from decimal import Decimal
 
@@ -10,17 +10,20 @@ from ..models.inventory import Inventory
 from ..models.product import Product
 from ..models.inventory_egreso import InventoryEgreso
 from ..models.user import User
+from ..models.product_cost_snapshot import ProductCostSnapshot
 from ..schemas.inventory_egreso import (
     InventoryEgresoCreate, InventoryEgresoUpdate, InventoryEgresoResponse
 )
+from .cost_snapshot_service import get_product_cost_snapshot
+from ..utils.pagination import Page, keyset_page
 
 
-def _get_precio_by_tipo_cliente(product: Product, tipo_cliente: str) -> Decimal:
+def _get_precio_by_tipo_cliente(snapshot: ProductCostSnapshot, tipo_cliente: str) -> Decimal:
     """Helper function to get price based on client type"""
     price_mapping = {
-        'publico': product.precio_publico_con_iva,
-        'mayorista': product.precio_mayorista_con_iva,
-        'distribuidor': product.precio_distribuidor_con_iva
+        'publico': snapshot.precio_publico_con_iva,
+        'mayorista': snapshot.precio_mayorista_con_iva,
+        'distribuidor': snapshot.precio_distribuidor_con_iva
     }
 
     precio = price_mapping.get(tipo_cliente)
@@ -68,7 +71,8 @@ def create_egreso(db: Session, inventory_id: int, egreso_data: InventoryEgresoCr
         )
 
     # Get price based on client type
-    precio_unitario = _get_precio_by_tipo_cliente(product, egreso_data.tipo_cliente)
+    snapshot = get_product_cost_snapshot(db, product, user)
+    precio_unitario = _get_precio_by_tipo_cliente(snapshot, egreso_data.tipo_cliente)
     valor_total = precio_unitario * egreso_data.cantidad
 
     # Create egress record
@@ -159,7 +163,8 @@ def update_egreso(db: Session, egreso_id: int, egreso_data: InventoryEgresoUpdat
     if egreso_data.tipo_cliente is not None and egreso_data.tipo_cliente != egreso.tipo_cliente:
         egreso.tipo_cliente = egreso_data.tipo_cliente
         # Recalculate price
-        precio_unitario = _get_precio_by_tipo_cliente(product, egreso.tipo_cliente)
+        snapshot = get_product_cost_snapshot(db, product, user)
+        precio_unitario = _get_precio_by_tipo_cliente(snapshot, egreso.tipo_cliente)
         egreso.precio_unitario = precio_unitario
         egreso.valor_total = precio_unitario * egreso.cantidad
 
@@ -221,8 +226,25 @@ def delete_egreso(db: Session, egreso_id: int, user: User) -> bool:
     return True
 
 
-def get_egresos_by_inventory(db: Session, inventory_id: int, user: User) -> List[InventoryEgresoResponse]:
-    """Get all egresses for a specific inventory"""
+def _egresos_page(db: Session, query, key: str, skip: int, limit: int, cursor: Optional[str], total: Optional[str]) -> Page:
+    """Newest first, paged on (fecha_egreso, id) in the database"""
+    page = keyset_page(
+        db, query, key, InventoryEgreso.fecha_egreso, InventoryEgreso.id,
+        descending=True, cursor=cursor, limit=limit, skip=skip, total=total
+    )
+    return page.map(_build_egreso_response)
+
+
+def get_egresos_by_inventory(
+    db: Session,
+    inventory_id: int,
+    user: User,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    total: Optional[str] = None
+) -> Page:
+    """Get the egresses of a specific inventory, one page at a time"""
     # Validate inventory belongs to user
     inventory = db.query(Inventory).filter(
         Inventory.id == inventory_id,
@@ -237,14 +259,14 @@ def get_egresos_by_inventory(db: Session, inventory_id: int, user: User) -> List
         )
 
     # Get egresses with product info
-    egresos = db.query(InventoryEgreso).options(
+    query = db.query(InventoryEgreso).options(
         joinedload(InventoryEgreso.product)
     ).filter(
         InventoryEgreso.inventory_id == inventory_id,
         InventoryEgreso.user_id == user.id
-    ).order_by(InventoryEgreso.fecha_egreso.desc()).all()
+    )
 
-    return [_build_egreso_response(egreso) for egreso in egresos]
+    return _egresos_page(db, query, "egresos:inventory", skip, limit, cursor, total)
 
 
 def get_egresos_report(
@@ -252,9 +274,13 @@ def get_egresos_report(
     user: User,
     fecha_desde: Optional[date] = None,
     fecha_hasta: Optional[date] = None,
-    tipo_cliente: Optional[str] = None
-) -> List[InventoryEgresoResponse]:
-    """Get egress report with optional filters"""
+    tipo_cliente: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    total: Optional[str] = None
+) -> Page:
+    """Get egress report with optional filters, one page at a time"""
     query = db.query(InventoryEgreso).options(
         joinedload(InventoryEgreso.product),
         joinedload(InventoryEgreso.inventory)
@@ -270,10 +296,7 @@ def get_egresos_report(
     if tipo_cliente:
         query = query.filter(InventoryEgreso.tipo_cliente == tipo_cliente)
 
-    # Order by date descending
-    egresos = query.order_by(InventoryEgreso.fecha_egreso.desc()).all()
-
-    return [_build_egreso_response(egreso) for egreso in egresos]
+    return _egresos_page(db, query, "egresos:report", skip, limit, cursor, total)
 
 
 def _build_egreso_response(egreso: InventoryEgreso) -> InventoryEgresoResponse:
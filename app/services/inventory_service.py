@@ -1,15 +1,20 @@
-from typing import List, Optional
+from typing import FrozenSet, List, Optional
 from datetime import date
 from decimal import Decimal
 
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, joinedload, load_only, selectinload
 from sqlalchemy import func, or_
 
 from ..models.inventory import Inventory, InventoryMovement
 from ..models.inventory_egreso import InventoryEgreso
 from ..models.product import Product
 from ..models.user import User
+from .cost_snapshot_service import get_product_cost_snapshot
+from .product_service import product_collection_sources
+from ..utils.conditional import CollectionVersion, collection_version
+from ..utils.fieldsets import build_partial
+from ..utils.pagination import Page, keyset_page
 from ..schemas.inventory import (
     InventoryCreate, InventoryUpdate, InventoryResponse,
     InventoryMovementCreate, InventoryMovementResponse,
@@ -31,8 +36,8 @@ def create_inventory_entry(db: Session, inventory: InventoryCreate, user: User)
             detail="Product not found"
         )
 
-    # Calculate unit cost from product cost
-    costo_unitario = product.calcular_costo_por_gramo_ajustado()
+    # Calculate unit cost from the precomputed product cost
+    costo_unitario = get_product_cost_snapshot(db, product, user).costo_por_gramo
     costo_total = costo_unitario * inventory.cantidad_producida
 
     # Create inventory entry
@@ -89,16 +94,31 @@ def get_inventories(
     limit: int = 100,
     product_id: Optional[int] = None,
     lote: Optional[str] = None,
-    stock_status: Optional[str] = None
-) -> List[InventoryResponse]:
-    query = db.query(Inventory).options(
-        joinedload(Inventory.product),
-        joinedload(Inventory.inventory_movements)
-    ).filter(
+    stock_status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    total: Optional[str] = None,
+    fields: Optional[FrozenSet[str]] = None
+) -> Page:
+    """
+    With `fields`, only those columns are selected and the product and
+    movements are loaded only when requested.
+    """
+    query = db.query(Inventory).filter(
         Inventory.user_id == user.id,
         Inventory.is_active == True
     )
 
+    if fields is None or 'product' in fields:
+        query = query.options(joinedload(Inventory.product))
+    # Movements are loaded per page with one IN query so the LIMIT applies to inventories
+    if fields is None or 'inventory_movements' in fields:
+        query = query.options(selectinload(Inventory.inventory_movements))
+    if fields is not None:
+        columns = {name for name in fields if name in Inventory.__table__.columns}
+        if 'stock_status' in fields:
+            columns.update(('stock_actual', 'stock_minimo'))
+        query = query.options(load_only(*(getattr(Inventory, name) for name in columns | {'id'})))
+
     if product_id:
         query = query.filter(Inventory.product_id == product_id)
 
@@ -119,9 +139,25 @@ def get_inventories(
                 )
             )
 
-    inventories = query.offset(skip).limit(limit).all()
+    page = keyset_page(
+        db, query, "inventories:id", Inventory.id, Inventory.id,
+        cursor=cursor, limit=limit, skip=skip, total=total
+    )
+    if fields is not None:
+        return page.map(lambda inventory: _build_partial_inventory_response(inventory, fields))
+    return page.map(_build_inventory_response)
 
-    return [_build_inventory_response(inv) for inv in inventories]
+
+def get_inventories_version(db: Session, user: User) -> CollectionVersion:
+    """
+    Collection validator of the user's inventory, from one aggregate query.
+    Entries embed their movements and their priced product.
+    """
+    sources = [
+        (Inventory, Inventory.user_id == user.id),
+        (InventoryMovement, InventoryMovement.user_id == user.id),
+    ] + product_collection_sources(user)
+    return collection_version(db, f"inventories:{user.id}", sources)
 
 
 def update_inventory(
@@ -164,7 +200,7 @@ def update_inventory(
         inventory.cantidad_producida = inventory_update.cantidad_producida
         # Recalculate costs
         if inventory.product:
-            inventory.costo_unitario = inventory.product.calcular_costo_por_gramo_ajustado()
+            inventory.costo_unitario = get_product_cost_snapshot(db, inventory.product, user).costo_por_gramo
             inventory.costo_total = inventory.costo_unitario * inventory.cantidad_producida
 
     if inventory_update.stock_minimo is not None:
@@ -309,30 +345,21 @@ def get_inventory_movements(
     inventory_id: int,
     user: User,
     skip: int = 0,
-    limit: int = 100
-) -> List[InventoryMovementResponse]:
-    movements = db.query(InventoryMovement).filter(
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    total: Optional[str] = None
+) -> Page:
+    """Newest first; pages follow (created_at, id) on ix_inventory_movements_inventory_created"""
+    query = db.query(InventoryMovement).filter(
         InventoryMovement.inventory_id == inventory_id,
         InventoryMovement.user_id == user.id
-    ).order_by(InventoryMovement.created_at.desc()).offset(skip).limit(limit).all()
-
-    return [
-        InventoryMovementResponse(
-            id=movement.id,
-            user_id=movement.user_id,
-            inventory_id=movement.inventory_id,
-            tipo_movimiento=movement.tipo_movimiento,
-            cantidad=movement.cantidad,
-            motivo=movement.motivo,
-            referencia=movement.referencia,
-            stock_anterior=movement.stock_anterior,
-            stock_posterior=movement.stock_posterior,
-            usuario_responsable=movement.usuario_responsable,
-            created_at=movement.created_at,
-            movimiento_display=movement.movimiento_display
-        )
-        for movement in movements
-    ]
+    )
+    movements = keyset_page(
+        db, query, "inventory_movements:created_at", InventoryMovement.created_at, InventoryMovement.id,
+        descending=True, cursor=cursor, limit=limit, skip=skip, total=total
+    )
+
+    return movements.map(_build_movement_response)
 
 
 def get_inventory_summary(db: Session, user: User) -> InventoryDashboardResponse:
@@ -446,92 +473,107 @@ def check_low_stock(db: Session, user: User) -> List[InventorySummaryResponse]:
     return summaries
 
 
+# Named projections for ?view=; None is the full representation
+INVENTORY_VIEWS = {
+    'summary': (
+        'product_id', 'lote', 'fecha_produccion', 'stock_actual', 'stock_minimo', 'stock_status',
+        'costo_unitario', 'ubicacion'
+    ),
+    'full': None
+}
+
+
+def _build_inventory_product_response(product: Product):
+    """Convert SQLAlchemy Product to Pydantic ProductResponse, without recipe lines"""
+    from ..schemas.product import ProductResponse
+    precios = product.pricing_snapshot()
+    return ProductResponse(
+        id=product.id,
+        nombre=product.nombre,
+        costo_total=str(precios.costo_materiales),
+        costo_etiqueta=str(product.costo_etiqueta or Decimal('0')),
+        costo_envase=str(product.costo_envase or Decimal('0')),
+        costo_caja=str(product.costo_caja or Decimal('0')),
+        costo_transporte=str(product.costo_transporte),
+        costo_mano_obra=str(product.costo_mano_obra or Decimal('0')),
+        costo_energia=str(product.costo_energia or Decimal('0')),
+        costo_depreciacion=str(product.costo_depreciacion or Decimal('0')),
+        costo_mantenimiento=str(product.costo_mantenimiento or Decimal('0')),
+        costo_administrativo=str(product.costo_administrativo or Decimal('0')),
+        costo_comercializacion=str(product.costo_comercializacion or Decimal('0')),
+        costo_financiero=str(product.costo_financiero or Decimal('0')),
+        iva_percentage=product.iva_percentage or 21.0,
+        iva_publico=str(precios.iva_publico),
+        iva_mayorista=str(precios.iva_mayorista),
+        iva_distribuidor=str(precios.iva_distribuidor),
+        margen_publico=product.margen_publico,
+        margen_mayorista=product.margen_mayorista,
+        margen_distribuidor=product.margen_distribuidor,
+        precio_publico=str(precios.precio_publico),
+        precio_mayorista=str(precios.precio_mayorista),
+        precio_distribuidor=str(precios.precio_distribuidor),
+        precio_publico_con_iva=str(precios.precio_publico_con_iva),
+        precio_mayorista_con_iva=str(precios.precio_mayorista_con_iva),
+        precio_distribuidor_con_iva=str(precios.precio_distribuidor_con_iva),
+        peso_ingredientes_base=product.peso_ingredientes_base,
+        peso_final_producido=product.peso_final_producido,
+        peso_empaque=product.peso_empaque,
+        costo_paquete=str(precios.costo_paquete),
+        precio_publico_paquete=str(precios.precio_publico),
+        precio_mayorista_paquete=str(precios.precio_mayorista),
+        precio_distribuidor_paquete=str(precios.precio_distribuidor),
+        precio_publico_con_iva_paquete=str(precios.precio_publico_con_iva),
+        precio_mayorista_con_iva_paquete=str(precios.precio_mayorista_con_iva),
+        precio_distribuidor_con_iva_paquete=str(precios.precio_distribuidor_con_iva),
+        costo_por_gramo=str(precios.costo_por_gramo),
+        is_active=product.is_active,
+        created_at=product.created_at,
+        updated_at=product.updated_at,
+        product_materials=[]  # We'll skip this for now to avoid complexity
+    )
+
+
+def _build_movement_response(movement: InventoryMovement) -> InventoryMovementResponse:
+    return InventoryMovementResponse(
+        id=movement.id,
+        user_id=movement.user_id,
+        inventory_id=movement.inventory_id,
+        tipo_movimiento=movement.tipo_movimiento,
+        cantidad=movement.cantidad,
+        motivo=movement.motivo,
+        referencia=movement.referencia,
+        stock_anterior=movement.stock_anterior,
+        stock_posterior=movement.stock_posterior,
+        usuario_responsable=movement.usuario_responsable,
+        created_at=movement.created_at,
+        movimiento_display=movement.movimiento_display
+    )
+
+
+def _inventory_column_values(inventory: Inventory, fields: Optional[FrozenSet[str]] = None) -> dict:
+    """InventoryResponse fields read from the inventory row, all of them or only `fields`"""
+    names = (
+        'id', 'user_id', 'product_id', 'fecha_produccion', 'cantidad_producida', 'costo_unitario',
+        'costo_total', 'stock_actual', 'stock_minimo', 'ubicacion', 'lote', 'notas', 'is_active',
+        'created_at', 'updated_at', 'stock_status'
+    )
+    return {name: getattr(inventory, name) for name in names if fields is None or name in fields}
+
+
 def _build_inventory_response(inventory: Inventory) -> InventoryResponse:
     """Helper function to build InventoryResponse with calculated fields"""
-    # Convert SQLAlchemy Product to Pydantic ProductResponse
-    product_response = None
-    if inventory.product:
-        from ..schemas.product import ProductResponse
-        product_response = ProductResponse(
-            id=inventory.product.id,
-            nombre=inventory.product.nombre,
-            costo_total=str(inventory.product.calcular_costo_total()),
-            costo_etiqueta=str(inventory.product.costo_etiqueta or Decimal('0')),
-            costo_envase=str(inventory.product.costo_envase or Decimal('0')),
-            costo_caja=str(inventory.product.costo_caja or Decimal('0')),
-            costo_transporte=str(inventory.product.costo_transporte),
-            costo_mano_obra=str(inventory.product.costo_mano_obra or Decimal('0')),
-            costo_energia=str(inventory.product.costo_energia or Decimal('0')),
-            costo_depreciacion=str(inventory.product.costo_depreciacion or Decimal('0')),
-            costo_mantenimiento=str(inventory.product.costo_mantenimiento or Decimal('0')),
-            costo_administrativo=str(inventory.product.costo_administrativo or Decimal('0')),
-            costo_comercializacion=str(inventory.product.costo_comercializacion or Decimal('0')),
-            costo_financiero=str(inventory.product.costo_financiero or Decimal('0')),
-            iva_percentage=inventory.product.iva_percentage or 21.0,
-            iva_publico=str(inventory.product.iva_publico),
-            iva_mayorista=str(inventory.product.iva_mayorista),
-            iva_distribuidor=str(inventory.product.iva_distribuidor),
-            margen_publico=inventory.product.margen_publico,
-            margen_mayorista=inventory.product.margen_mayorista,
-            margen_distribuidor=inventory.product.margen_distribuidor,
-            precio_publico=str(inventory.product.precio_publico),
-            precio_mayorista=str(inventory.product.precio_mayorista),
-            precio_distribuidor=str(inventory.product.precio_distribuidor),
-            precio_publico_con_iva=str(inventory.product.precio_publico_con_iva),
-            precio_mayorista_con_iva=str(inventory.product.precio_mayorista_con_iva),
-            precio_distribuidor_con_iva=str(inventory.product.precio_distribuidor_con_iva),
-            peso_ingredientes_base=inventory.product.peso_ingredientes_base,
-            peso_final_producido=inventory.product.peso_final_producido,
-            peso_empaque=inventory.product.peso_empaque,
-            costo_paquete=str(inventory.product.calcular_precios_por_empaque()['costo_paquete']),
-            precio_publico_paquete=str(inventory.product.calcular_precios_por_empaque()['precio_publico_paquete']),
-            precio_mayorista_paquete=str(inventory.product.calcular_precios_por_empaque()['precio_mayorista_paquete']),
-            precio_distribuidor_paquete=str(inventory.product.calcular_precios_por_empaque()['precio_distribuidor_paquete']),
-            precio_publico_con_iva_paquete=str(inventory.product.calcular_precios_por_empaque()['precio_publico_con_iva_paquete']),
-            precio_mayorista_con_iva_paquete=str(inventory.product.calcular_precios_por_empaque()['precio_mayorista_con_iva_paquete']),
-            precio_distribuidor_con_iva_paquete=str(inventory.product.calcular_precios_por_empaque()['precio_distribuidor_con_iva_paquete']),
-            costo_por_gramo=str(inventory.product.calcular_costo_por_gramo_ajustado()),
-            is_active=inventory.product.is_active,
-            created_at=inventory.product.created_at,
-            updated_at=inventory.product.updated_at,
-            product_materials=[]  # We'll skip this for now to avoid complexity
-        )
+    return InventoryResponse(
+        **_inventory_column_values(inventory),
+        product=_build_inventory_product_response(inventory.product) if inventory.product else None,
+        inventory_movements=[_build_movement_response(movement) for movement in inventory.inventory_movements]
+    )
 
-    # Build movement responses
-    movements = []
-    for movement in inventory.inventory_movements:
-        movements.append(InventoryMovementResponse(
-            id=movement.id,
-            user_id=movement.user_id,
-            inventory_id=movement.inventory_id,
-            tipo_movimiento=movement.tipo_movimiento,
-            cantidad=movement.cantidad,
-            motivo=movement.motivo,
-            referencia=movement.referencia,
-            stock_anterior=movement.stock_anterior,
-            stock_posterior=movement.stock_posterior,
-            usuario_responsable=movement.usuario_responsable,
-            created_at=movement.created_at,
-            movimiento_display=movement.movimiento_display
-        ))
 
-    return InventoryResponse(
-        id=inventory.id,
-        user_id=inventory.user_id,
-        product_id=inventory.product_id,
-        fecha_produccion=inventory.fecha_produccion,
-        cantidad_producida=inventory.cantidad_producida,
-        costo_unitario=inventory.costo_unitario,
-        costo_total=inventory.costo_total,
-        stock_actual=inventory.stock_actual,
-        stock_minimo=inventory.stock_minimo,
-        ubicacion=inventory.ubicacion,
-        lote=inventory.lote,
-        notas=inventory.notas,
-        is_active=inventory.is_active,
-        created_at=inventory.created_at,
-        updated_at=inventory.updated_at,
-        product=product_response,
-        inventory_movements=movements,
-        stock_status=inventory.stock_status
-    )
\ No newline at end of file
+def _build_partial_inventory_response(inventory: Inventory, fields: FrozenSet[str]):
+    """Only the requested InventoryResponse fields; related rows are read only when asked for"""
+    values = _inventory_column_values(inventory, fields)
+    if 'product' in fields:
+        values['product'] = _build_inventory_product_response(inventory.product) if inventory.product else None
+    if 'inventory_movements' in fields:
+        values['inventory_movements'] = [_build_movement_response(m) for m in inventory.inventory_movements]
+    return build_partial(InventoryResponse, fields, values)
\ No newline at end of file
@@ -0,0 +1,171 @@
+import csv
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Session
+
+from ..models.material import Material
+from ..models.product import Product
+from ..models.user import User
+from ..schemas.material_price_import import (
+    ImportedMaterialPrice, ImportedProductPriceDelta, MaterialPriceImportError, MaterialPriceImportResult,
+    MaterialPriceImportRow
+)
+from ..utils.calculator import calcular_precio_unidad_pequena
+from ..utils.fixed_point import to_micro
+from .audit_service import record_audit
+from .cost_snapshot_service import get_products_using_materials, save_product_cost_snapshots
+from .price_history_service import record_material_prices
+from .pricing_engine import (
+    active_price_vector, downstream_products, load_bill_of_materials, load_component_graph, price_products
+)
+from .product_import_service import MAX_REPORTED_ERRORS, ImportRecord, _format_validation_error, read_ndjson
+
+
+def read_price_list_csv(lines: Iterable[str]) -> Iterator[ImportRecord]:
+    """One price per row: material_id or material (name), and precio_base"""
+    reader = csv.DictReader(lines)
+    for row in reader:
+        values = {key.strip(): (value or "").strip() for key, value in row.items() if key}
+        yield reader.line_num, {key: value for key, value in values.items() if value != ""}
+
+
+PRICE_LIST_READERS = {"csv": read_price_list_csv, "ndjson": read_ndjson}
+
+
+def _product_delta(product: Product, anterior, nuevo) -> ImportedProductPriceDelta:
+    return ImportedProductPriceDelta(
+        product_id=product.id,
+        nombre=product.nombre,
+        costo_paquete_anterior=anterior.costo_paquete,
+        costo_paquete_nuevo=nuevo.costo_paquete,
+        delta_costo_paquete=nuevo.costo_paquete - anterior.costo_paquete,
+        precio_publico_anterior=anterior.precio_publico,
+        precio_publico_nuevo=nuevo.precio_publico,
+        delta_precio_publico=nuevo.precio_publico - anterior.precio_publico,
+        precio_mayorista_anterior=anterior.precio_mayorista,
+        precio_mayorista_nuevo=nuevo.precio_mayorista,
+        delta_precio_mayorista=nuevo.precio_mayorista - anterior.precio_mayorista,
+        precio_distribuidor_anterior=anterior.precio_distribuidor,
+        precio_distribuidor_nuevo=nuevo.precio_distribuidor,
+        delta_precio_distribuidor=nuevo.precio_distribuidor - anterior.precio_distribuidor
+    )
+
+
+def import_material_prices(db: Session, user: User, records: Iterable[ImportRecord]) -> MaterialPriceImportResult:
+    """
+    Apply a supplier price list in one transaction. Rows are validated as
+    they stream in; the materials are matched by id or name in one locking
+    query, updated with one executemany UPDATE and audited with one
+    multi-row INSERT. Only the products that use the changed materials, and
+    the products built on them, are re-priced. Invalid rows are reported,
+    not fatal.
+    """
+    result = MaterialPriceImportResult(updated=0, unchanged=0, failed=0, materiales=[], productos=[], errors=[])
+
+    def fail(line: int, material: Optional[str], error: str) -> None:
+        result.failed += 1
+        if len(result.errors) < MAX_REPORTED_ERRORS:
+            result.errors.append(MaterialPriceImportError(line=line, material=material, error=error))
+
+    # 1. Schema validation, in memory, as the file streams
+    parsed: List[Tuple[int, MaterialPriceImportRow]] = []
+    for line, record in records:
+        if "__error__" in record:
+            fail(line, None, record["__error__"])
+            continue
+        try:
+            row = MaterialPriceImportRow.model_validate(record)
+        except ValidationError as exc:
+            fail(line, record.get("material"), _format_validation_error(exc))
+            continue
+        if row.material_id is None and not (row.material or "").strip():
+            fail(line, None, "Row needs material_id or material")
+            continue
+        parsed.append((line, row))
+    if not parsed:
+        return result
+
+    # 2. Every referenced material in one query, locked until the commit
+    material_ids = {row.material_id for _, row in parsed if row.material_id is not None}
+    material_names = {row.material.strip() for _, row in parsed if row.material_id is None}
+    materials = db.query(Material).with_for_update().filter(
+        Material.user_id == user.id,
+        Material.is_active == True,
+        or_(Material.id.in_(material_ids), Material.nombre.in_(material_names))
+    ).all()
+    by_id = {material.id: material for material in materials}
+    by_name = {material.nombre: material for material in materials}
+
+    cambios: Dict[int, Tuple[Material, Decimal, Decimal]] = {}
+    seen: Set[int] = set()
+    for line, row in parsed:
+        if row.material_id is not None:
+            material = by_id.get(row.material_id)
+            reference = str(row.material_id)
+        else:
+            reference = row.material.strip()
+            material = by_name.get(reference)
+        if material is None:
+            fail(line, reference, f"Material {reference!r} not found")
+            continue
+        if material.id in seen:
+            fail(line, reference, "Material listed more than once")
+            continue
+        seen.add(material.id)
+        if row.precio_base == material.precio_base:
+            result.unchanged += 1
+            continue
+        precio_unidad_pequena = calcular_precio_unidad_pequena(row.precio_base, material.unidad_base, material.densidad)
+        cambios[material.id] = (material, row.precio_base, precio_unidad_pequena)
+    if not cambios:
+        return result
+
+    # 3. Affected products priced before and after, from one load of the recipe DAG
+    graph = load_component_graph(db, user)
+    product_ids = downstream_products(get_products_using_materials(db, user, cambios), graph)
+    products = db.query(Product).filter(
+        Product.id.in_(product_ids),
+        Product.is_active == True
+    ).order_by(Product.id).all() if product_ids else []
+    bom = load_bill_of_materials(db, user, products, graph=graph)
+    precios_anteriores = active_price_vector(bom.materials)
+    precios_nuevos = dict(precios_anteriores)
+    for material_id, (_, _, precio_unidad_pequena) in cambios.items():
+        precios_nuevos[material_id] = to_micro(precio_unidad_pequena)
+    anteriores = price_products(products, bom.recipes, precios_anteriores, bom.components, bom.products)
+    nuevos = price_products(products, bom.recipes, precios_nuevos, bom.components, bom.products)
+
+    # 4. One statement per table: materials, price history, cost snapshots; the audit
+    # events are batched by the audit writer. Rows are built first, since the bulk
+    # UPDATE also refreshes the loaded materials.
+    materiales = []
+    updates, history = [], []
+    for material, precio_base, precio_unidad_pequena in cambios.values():
+        version = material.version + 1
+        materiales.append(ImportedMaterialPrice(
+            material_id=material.id, nombre=material.nombre,
+            precio_base_anterior=material.precio_base, precio_base_nuevo=precio_base
+        ))
+        updates.append({"id": material.id, "precio_base": precio_base,
+                        "precio_unidad_pequena": precio_unidad_pequena, "version": version})
+        history.append({"material_id": material.id, "user_id": user.id, "version": version,
+                        "precio_base": precio_base, "unidad_base": material.unidad_base,
+                        "precio_unidad_pequena": precio_unidad_pequena})
+        record_audit(db, user.id, "update_material",
+                     f"Updated material '{material.nombre}' - fields: precio_base "
+                     f"(price list: {material.precio_base} -> {precio_base})", material=material.id)
+
+    db.execute(update(Material), updates)
+    record_material_prices(db, history, datetime.utcnow())
+    save_product_cost_snapshots(db, user, nuevos)
+
+    result.materiales = materiales
+    result.productos = [_product_delta(product, anteriores[product.id], nuevos[product.id]) for product in products]
+    result.updated = len(cambios)
+
+    db.commit()
+    return result
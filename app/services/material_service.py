@@ -1,16 +1,25 @@
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import exists, select
 
 from ..models.material import Material
 from ..models.user import User
 from ..models.product import ProductMaterial, Product
-from ..models.audit_log import AuditLog
-from ..schemas.material import MaterialCreate, MaterialUpdate, MaterialResponse, CantidadQuery, CostosResponse
+from ..models.material_unit import MaterialUnit
+from ..schemas.material import (
+    MaterialCreate, MaterialUpdate, MaterialResponse, CantidadQuery, CostosResponse,
+    MaterialUnitCreate, MaterialUnitResponse, CostMatrixRequest, CostMatrixResponse
+)
 from ..utils.calculator import calcular_precio_unidad_pequena
+from ..utils.conditional import CollectionVersion, collection_version
+from ..utils.pagination import Page, keyset_page
+from ..utils.unit_converter import UnknownUnitError, es_unidad_estandar
+from .audit_service import record_audit
+from .cost_snapshot_service import refresh_snapshots_for_materials
+from .price_history_service import record_material_price, close_material_price_history
 
 def _validate_material_uniqueness(db: Session, nombre: str, user_id: int, exclude_id: int = None) -> None:
     """
@@ -32,17 +41,12 @@ def _validate_material_uniqueness(db: Session, nombre: str, user_id: int, exclud
         )
 
 
-def _create_audit_log(db: Session, user_id: int, material_id: int, action: str, description: str) -> None:
+def _create_audit_log(db: Session, user_id: int, material, action: str, description: str) -> None:
     """
     Create an audit log entry for material operations.
+    `material` is the Material (or its id); the entry is written after the commit.
     """
-    audit_log = AuditLog(
-        user_id=user_id,
-        material_id=material_id,
-        action=action,
-        description=description
-    )
-    db.add(audit_log)
+    record_audit(db, user_id, action, description, material=material)
 
 
 def create_material(db: Session, material: MaterialCreate, user: User) -> MaterialResponse:
@@ -53,7 +57,7 @@ def create_material(db: Session, material: MaterialCreate, user: User) -> Materi
     _validate_material_uniqueness(db, material.nombre, user.id)
 
     # Calculate derived price
-    precio_unidad_pequena = calcular_precio_unidad_pequena(material.precio_base, material.unidad_base)
+    precio_unidad_pequena = calcular_precio_unidad_pequena(material.precio_base, material.unidad_base, material.densidad)
 
     # Create material
     db_material = Material(
@@ -61,27 +65,20 @@ def create_material(db: Session, material: MaterialCreate, user: User) -> Materi
         nombre=material.nombre,
         precio_base=material.precio_base,
         unidad_base=material.unidad_base,
+        densidad=material.densidad,
         precio_unidad_pequena=precio_unidad_pequena
     )
     db.add(db_material)
+    record_material_price(db, db_material)
 
-    # Create audit log
+    # Create audit log; it carries the material id assigned by the flush
     _create_audit_log(
-        db, user.id, None, "create_material",
+        db, user.id, db_material, "create_material",
         f"Created material '{material.nombre}' with price {material.precio_base}"
     )
 
     db.commit()
     db.refresh(db_material)
-
-    # Update audit log with material ID
-    db.query(AuditLog).filter(
-        AuditLog.user_id == user.id,
-        AuditLog.material_id.is_(None),
-        AuditLog.action == "create_material"
-    ).update({"material_id": db_material.id})
-
-    db.commit()
     return db_material
 
 def get_material(db: Session, material_id: int, user: User) -> MaterialResponse:
@@ -90,8 +87,15 @@ def get_material(db: Session, material_id: int, user: User) -> MaterialResponse:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Material not found")
     return material
 
-def get_materials(db: Session, user: User, skip: int = 0, limit: int = 100) -> List[Material]:
-    return db.query(Material).filter(Material.user_id == user.id, Material.is_active == True).offset(skip).limit(limit).all()
+def get_materials(
+    db: Session, user: User, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, total: Optional[str] = None
+) -> Page:
+    query = db.query(Material).filter(Material.user_id == user.id, Material.is_active == True)
+    return keyset_page(db, query, "materials:id", Material.id, Material.id, cursor=cursor, limit=limit, skip=skip, total=total)
+
+def get_materials_version(db: Session, user: User) -> CollectionVersion:
+    """Collection validator of the user's materials, from one aggregate query"""
+    return collection_version(db, f"materials:{user.id}", [(Material, Material.user_id == user.id)])
 
 def update_material(db: Session, material_id: int, material_update: MaterialUpdate, user: User) -> MaterialResponse:
     """
@@ -119,21 +123,31 @@ def update_material(db: Session, material_id: int, material_update: MaterialUpda
 
     if material_update.precio_base is not None:
         material.precio_base = material_update.precio_base
-        material.precio_unidad_pequena = calcular_precio_unidad_pequena(
-            material_update.precio_base, material.unidad_base
-        )
         updated_fields.append("precio_base")
 
     if material_update.unidad_base is not None:
         material.unidad_base = material_update.unidad_base
+        updated_fields.append("unidad_base")
+
+    # An explicit null clears the density; an omitted field leaves it as is
+    if "densidad" in material_update.model_fields_set:
+        material.densidad = material_update.densidad
+        updated_fields.append("densidad")
+
+    precio_cambiado = any(field in updated_fields for field in ("precio_base", "unidad_base", "densidad"))
+    if precio_cambiado:
         material.precio_unidad_pequena = calcular_precio_unidad_pequena(
-            material.precio_base, material_update.unidad_base
+            material.precio_base, material.unidad_base, material.densidad
         )
-        updated_fields.append("unidad_base")
 
     # Update version
     material.version += 1
 
+    # Keep precomputed product costs in sync within the same transaction
+    if precio_cambiado:
+        record_material_price(db, material)
+        refresh_snapshots_for_materials(db, user, [material.id])
+
     # Create audit log
     _create_audit_log(
         db, user.id, material.id, "update_material",
@@ -168,15 +182,10 @@ def _soft_delete_material(db: Session, material: Material, user: User) -> None:
     material.is_active = False
     material.deleted_at = datetime.utcnow()
     material.version += 1
+    close_material_price_history(db, material.id, material.deleted_at)
 
     # Audit log
-    audit_log = AuditLog(
-        user_id=user.id,
-        material_id=material.id,
-        action="delete_material",
-        description=f"Soft deleted material '{material.nombre}'"
-    )
-    db.add(audit_log)
+    _create_audit_log(db, user.id, material, "delete_material", f"Soft deleted material '{material.nombre}'")
 
 
 def delete_material(db: Session, material_id: int, user: User) -> bool:
@@ -213,7 +222,117 @@ def delete_material(db: Session, material_id: int, user: User) -> bool:
 
 def calculate_costs(db: Session, material_id: int, query: CantidadQuery, user: User) -> CostosResponse:
     material = get_material(db, material_id, user)
+    try:
+        factor = material.factor_a_gramos(query.unidad)
+    except UnknownUnitError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
     costos = {}
     for cantidad in query.cantidades:
-        costos[str(cantidad)] = material.calcular_precio_cantidad(cantidad)
-    return CostosResponse(material=material, costos=costos)
\ No newline at end of file
+        costos[str(cantidad)] = material.calcular_precio_cantidad(cantidad * factor)
+    return CostosResponse(material=material, costos=costos)
+
+
+def calculate_cost_matrix(db: Session, query: CostMatrixRequest, user: User) -> CostMatrixResponse:
+    """
+    Cost of every quantity for every material, as columnar arrays. The
+    materials (and their own units, when the unit is not standard) are
+    loaded in one query; each row is one unit factor times the quantities.
+    """
+    material_ids = list(dict.fromkeys(query.material_ids))
+    materials_query = db.query(Material).filter(
+        Material.id.in_(material_ids),
+        Material.user_id == user.id,
+        Material.is_active == True
+    )
+    if not es_unidad_estandar(query.unidad):
+        materials_query = materials_query.options(joinedload(Material.unidades))
+    by_id = {material.id: material for material in materials_query}
+
+    response = CostMatrixResponse(
+        unidad=query.unidad, cantidades=query.cantidades, material_ids=[], nombres=[],
+        gramos_por_unidad=[], costos=[], no_encontrados=[]
+    )
+    for material_id in material_ids:
+        material = by_id.get(material_id)
+        if material is None:
+            response.no_encontrados.append(material_id)
+            continue
+        try:
+            factor = material.factor_a_gramos(query.unidad)
+        except UnknownUnitError as exc:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"{exc} for material {material_id}")
+        precio_unidad = material.precio_unidad_pequena * factor
+        response.material_ids.append(material_id)
+        response.nombres.append(material.nombre)
+        response.gramos_por_unidad.append(factor)
+        response.costos.append([precio_unidad * cantidad for cantidad in query.cantidades])
+    return response
+
+
+def _build_unit_response(material: Material, unit: MaterialUnit) -> MaterialUnitResponse:
+    return MaterialUnitResponse(
+        id=unit.id,
+        material_id=unit.material_id,
+        nombre=unit.nombre,
+        cantidad=unit.cantidad,
+        unidad=unit.unidad,
+        gramos=material.factor_a_gramos(unit.nombre)
+    )
+
+
+def get_material_units(db: Session, material_id: int, user: User) -> List[MaterialUnitResponse]:
+    material = get_material(db, material_id, user)
+    return [_build_unit_response(material, unit) for unit in material.unidades]
+
+
+def add_material_unit(db: Session, material_id: int, unit_data: MaterialUnitCreate, user: User) -> MaterialUnitResponse:
+    """
+    Define a material-specific unit (e.g. 'caneca' = 20 l) in terms of a
+    standard unit; its gram factor follows the material density.
+    """
+    material = get_material(db, material_id, user)
+
+    nombre = unit_data.nombre.strip()
+    if not nombre or es_unidad_estandar(nombre):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unit name must be non-empty and different from the standard units"
+        )
+    if not es_unidad_estandar(unit_data.unidad):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown unit '{unit_data.unidad}'"
+        )
+    if any(unit.nombre == nombre for unit in material.unidades):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unit already defined for this material"
+        )
+
+    unit = MaterialUnit(nombre=nombre, cantidad=unit_data.cantidad, unidad=unit_data.unidad)
+    material.unidades.append(unit)
+    _create_audit_log(
+        db, user.id, material.id, "add_material_unit",
+        f"Added unit '{nombre}' = {unit_data.cantidad} {unit_data.unidad} to material '{material.nombre}'"
+    )
+
+    db.commit()
+    db.refresh(unit)
+    return _build_unit_response(material, unit)
+
+
+def delete_material_unit(db: Session, material_id: int, unit_id: int, user: User) -> bool:
+    material = get_material(db, material_id, user)
+    unit = next((unit for unit in material.unidades if unit.id == unit_id), None)
+    if unit is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unit not found")
+
+    material.unidades.remove(unit)
+    _create_audit_log(
+        db, user.id, material.id, "delete_material_unit",
+        f"Removed unit '{unit.nombre}' from material '{material.nombre}'"
+    )
+
+    db.commit()
+    return True
\ No newline at end of file
@@ -0,0 +1,90 @@
+from decimal import Decimal
+from typing import Dict, Iterable, List
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import Session
+
+from ..models.material import Material
+from ..models.product import Product, ProductMaterial
+from ..models.product_cost_snapshot import ProductCostSnapshot
+from ..models.user import User
+from ..schemas.material_usage import MaterialUsage, MaterialWhereUsed
+
+COSTO_DECIMALS = Decimal("0.000001")
+PORCENTAJE_DECIMALS = Decimal("0.01")
+
+
+def _where_used_statement(user: User, material_ids: List[int]):
+    """
+    Material -> active products in one grouped join, driven by the
+    (material_id, product_id) index of product_materials. Lines of inactive
+    products fall into the NULL product group, which keeps unused materials
+    in the result.
+    """
+    cantidad = func.sum(ProductMaterial.cantidad)
+    costo = cantidad * Material.precio_unidad_pequena
+    return select(
+        Material.id.label("material_id"),
+        Material.nombre.label("material_nombre"),
+        Material.precio_unidad_pequena,
+        Product.id.label("product_id"),
+        Product.nombre.label("product_nombre"),
+        cantidad.label("cantidad"),
+        ProductCostSnapshot.costo_materiales
+    ).select_from(Material).outerjoin(
+        ProductMaterial, ProductMaterial.material_id == Material.id
+    ).outerjoin(
+        Product, and_(Product.id == ProductMaterial.product_id, Product.user_id == user.id, Product.is_active == True)
+    ).outerjoin(
+        ProductCostSnapshot, ProductCostSnapshot.product_id == Product.id
+    ).where(
+        Material.id.in_(material_ids),
+        Material.user_id == user.id,
+        Material.is_active == True
+    ).group_by(
+        Material.id, Material.nombre, Material.precio_unidad_pequena,
+        Product.id, Product.nombre, ProductCostSnapshot.costo_materiales
+    ).order_by(Material.id, costo.desc(), Product.id)
+
+
+def get_where_used(db: Session, user: User, material_ids: Iterable[int]) -> List[MaterialWhereUsed]:
+    """
+    Every active product using each material, with the grams used, the cost
+    they add and their share of the product's recipe cost (the stored cost
+    snapshot, so intermediate products count). Unknown material ids are
+    left out; the result follows the order of `material_ids`.
+    """
+    material_ids = list(dict.fromkeys(material_ids))
+    if not material_ids:
+        return []
+
+    usages: Dict[int, MaterialWhereUsed] = {}
+    for row in db.execute(_where_used_statement(user, material_ids)):
+        usage = usages.get(row.material_id)
+        if usage is None:
+            usage = usages[row.material_id] = MaterialWhereUsed(
+                material_id=row.material_id, nombre=row.material_nombre,
+                precio_unidad_pequena=row.precio_unidad_pequena,
+                total_productos=0, costo_total=Decimal("0"), productos=[]
+            )
+        if row.product_id is None:
+            continue
+        costo = (row.cantidad * row.precio_unidad_pequena).quantize(COSTO_DECIMALS)
+        porcentaje = None
+        if row.costo_materiales:
+            porcentaje = (costo * 100 / row.costo_materiales).quantize(PORCENTAJE_DECIMALS)
+        usage.productos.append(MaterialUsage(
+            product_id=row.product_id, nombre=row.product_nombre, cantidad=row.cantidad,
+            costo=costo, porcentaje_costo=porcentaje
+        ))
+        usage.total_productos += 1
+        usage.costo_total += costo
+    return [usages[material_id] for material_id in material_ids if material_id in usages]
+
+
+def get_material_where_used(db: Session, material_id: int, user: User) -> MaterialWhereUsed:
+    usages = get_where_used(db, user, [material_id])
+    if not usages:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Material not found")
+    return usages[0]
@@ -0,0 +1,191 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import DateTime, Numeric, and_, func, insert, literal, or_, select, union_all
+from sqlalchemy.orm import Session
+
+from ..models.material import Material
+from ..models.material_price_history import MaterialPriceHistory
+from ..models.product import Product, ProductMaterial
+from ..models.user import User
+from ..schemas.price_history import CostHistoryResponse, ProductCostPoint, ProductCostSeries
+from ..utils.fixed_point import to_micro, to_micro_squared
+from .pricing_engine import load_component_graph, rollup_products, topological_order
+
+# Upper bound on the points of a single as-of query (one year of daily points)
+MAX_COST_HISTORY_POINTS = 366
+
+# Exact aggregates: quantity Numeric(10, 2) x price Numeric(12, 6) has 8 decimals
+_SUM_TYPE = Numeric(30, 12)
+
+
+def record_material_price(db: Session, material: Material, at: Optional[datetime] = None) -> MaterialPriceHistory:
+    """
+    Close the open price interval of a material and append its current price.
+    Runs inside the caller's transaction; the caller is responsible for committing.
+    """
+    at = at or datetime.utcnow()
+    if material.id is not None:
+        close_material_price_history(db, material.id, at)
+
+    entry = MaterialPriceHistory(
+        material=material,
+        user_id=material.user_id,
+        version=material.version or 1,
+        precio_base=material.precio_base,
+        unidad_base=material.unidad_base,
+        precio_unidad_pequena=material.precio_unidad_pequena,
+        valid_from=at
+    )
+    db.add(entry)
+    return entry
+
+
+def record_material_prices(db: Session, prices: Sequence[dict], at: Optional[datetime] = None) -> None:
+    """
+    record_material_price for many materials: one UPDATE closes their open
+    intervals and one multi-row INSERT appends the new prices. Each dict
+    holds material_id, user_id, version, precio_base, unidad_base and
+    precio_unidad_pequena. Runs inside the caller's transaction.
+    """
+    if not prices:
+        return
+    at = at or datetime.utcnow()
+    db.query(MaterialPriceHistory).filter(
+        MaterialPriceHistory.material_id.in_([price["material_id"] for price in prices]),
+        MaterialPriceHistory.valid_to.is_(None)
+    ).update({MaterialPriceHistory.valid_to: at}, synchronize_session=False)
+    db.execute(insert(MaterialPriceHistory), [dict(price, valid_from=at) for price in prices])
+
+
+def close_material_price_history(db: Session, material_id: int, at: datetime) -> None:
+    """End the open price interval of a material, e.g. when it is deleted"""
+    db.query(MaterialPriceHistory).filter(
+        MaterialPriceHistory.material_id == material_id,
+        MaterialPriceHistory.valid_to.is_(None)
+    ).update({MaterialPriceHistory.valid_to: at}, synchronize_session=False)
+
+
+def get_material_price_history(db: Session, material_id: int, user: User) -> List[MaterialPriceHistory]:
+    """Every price interval of a material, oldest first; deleted materials keep their history"""
+    owned = db.query(Material.id).filter(Material.id == material_id, Material.user_id == user.id).first()
+    if owned is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Material not found")
+
+    return db.query(MaterialPriceHistory).filter(
+        MaterialPriceHistory.material_id == material_id
+    ).order_by(MaterialPriceHistory.valid_from, MaterialPriceHistory.id).all()
+
+
+def date_series(desde: datetime, hasta: datetime, paso_dias: int = 1) -> List[datetime]:
+    """Points from desde to hasta (inclusive) every paso_dias days"""
+    if paso_dias < 1:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="paso_dias must be at least 1")
+    if hasta < desde:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="hasta must not be before desde")
+
+    puntos = (hasta - desde).days // paso_dias + 1
+    if puntos > MAX_COST_HISTORY_POINTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_COST_HISTORY_POINTS} points per query; increase paso_dias or shorten the range"
+        )
+    return [desde + timedelta(days=paso_dias * i) for i in range(puntos)]
+
+
+def _material_totals_as_of(
+    db: Session, user: User, fechas: Sequence[datetime], product_ids: Sequence[int]
+) -> Dict[datetime, Dict[int, Tuple[int, int]]]:
+    """
+    Material cost and weight of each recipe at every date, in one query: the
+    date series is joined against the price intervals in force at each date
+    and aggregated per (date, product).
+    """
+    puntos = union_all(*[select(literal(fecha, DateTime()).label("fecha")) for fecha in fechas]).subquery("puntos")
+
+    rows = db.query(
+        puntos.c.fecha,
+        ProductMaterial.product_id,
+        func.sum(ProductMaterial.cantidad * MaterialPriceHistory.precio_unidad_pequena, type_=_SUM_TYPE).label("costo"),
+        func.sum(ProductMaterial.cantidad, type_=_SUM_TYPE).label("peso")
+    ).select_from(ProductMaterial).join(
+        MaterialPriceHistory, MaterialPriceHistory.material_id == ProductMaterial.material_id
+    ).join(
+        puntos, and_(
+            MaterialPriceHistory.valid_from <= puntos.c.fecha,
+            or_(MaterialPriceHistory.valid_to.is_(None), MaterialPriceHistory.valid_to > puntos.c.fecha)
+        )
+    ).filter(
+        ProductMaterial.product_id.in_(product_ids),
+        MaterialPriceHistory.user_id == user.id
+    ).group_by(puntos.c.fecha, ProductMaterial.product_id).all()
+
+    # Dates come back in the driver's representation; map them onto the requested points
+    by_key = {fecha.replace(tzinfo=None): fecha for fecha in fechas}
+    totals: Dict[datetime, Dict[int, Tuple[int, int]]] = defaultdict(dict)
+    for row in rows:
+        fecha = row.fecha
+        if isinstance(fecha, str):
+            fecha = datetime.fromisoformat(fecha)
+        fecha = by_key.get(fecha.replace(tzinfo=None), fecha)
+        totals[fecha][row.product_id] = (to_micro_squared(row.costo), to_micro(row.peso))
+    return totals
+
+
+def get_product_costs_as_of(
+    db: Session, user: User, fechas: Sequence[datetime], product_ids: Optional[Sequence[int]] = None
+) -> CostHistoryResponse:
+    """
+    Reconstruct product costs and prices at each of the given dates from the
+    material price history. Recipes, intermediate products, additional costs
+    and margins are the current ones; only material prices are historical.
+    All dates are resolved by a single set-based query.
+    """
+    fechas = sorted(set(fechas))
+    if not fechas:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="At least one date is required")
+    if len(fechas) > MAX_COST_HISTORY_POINTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_COST_HISTORY_POINTS} points per query"
+        )
+
+    query = db.query(Product).filter(Product.user_id == user.id, Product.is_active == True)
+    if product_ids:
+        query = query.filter(Product.id.in_(product_ids))
+    products = query.order_by(Product.id).all()
+    if not products:
+        return CostHistoryResponse(fechas=fechas, productos=[])
+
+    # Intermediate products are priced at the same dates as the products that use them
+    graph = load_component_graph(db, user)
+    products_by_id = {product.id: product for product in products}
+    order = topological_order(products_by_id, graph)
+    missing = [product_id for product_id in order if product_id not in products_by_id]
+    if missing:
+        for product in db.query(Product).filter(Product.id.in_(missing)).all():
+            products_by_id[product.id] = product
+
+    totals = _material_totals_as_of(db, user, fechas, order)
+
+    series = {
+        product.id: ProductCostSeries(product_id=product.id, nombre=product.nombre, puntos=[])
+        for product in products
+    }
+    for fecha in fechas:
+        snapshots = rollup_products(products, totals.get(fecha, {}), graph, products_by_id)
+        for product in products:
+            snapshot = snapshots[product.id]
+            series[product.id].puntos.append(ProductCostPoint(
+                fecha=fecha,
+                costo_materiales=snapshot.costo_materiales,
+                costo_por_gramo=snapshot.costo_por_gramo,
+                costo_paquete=snapshot.costo_paquete,
+                precio_publico=snapshot.precio_publico,
+                precio_mayorista=snapshot.precio_mayorista,
+                precio_distribuidor=snapshot.precio_distribuidor
+            ))
+
+    return CostHistoryResponse(fechas=fechas, productos=list(series.values()))
@@ -0,0 +1,89 @@
+from decimal import Decimal
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from ..models.product import Product
+from ..models.user import User
+from ..schemas.price_simulation import PriceSimulationRequest, PriceSimulationResponse, ProductPriceDelta
+from ..utils.calculator import calcular_precio_unidad_pequena
+from ..utils.fixed_point import to_micro
+from .cost_snapshot_service import get_products_using_materials
+from .pricing_engine import (
+    active_price_vector, downstream_products, load_bill_of_materials, load_component_graph, load_price_vector,
+    price_products
+)
+
+
+def _margen_efectivo(precio_actual: Decimal, costo_simulado: Decimal) -> Decimal:
+    if precio_actual <= 0:
+        return Decimal('0')
+    return (precio_actual - costo_simulado) / precio_actual * 100
+
+
+def simulate_material_price_changes(db: Session, simulation: PriceSimulationRequest, user: User) -> PriceSimulationResponse:
+    """
+    Recompute the costs and tier prices of every product affected by a set of
+    hypothetical material price changes. Read-only: no persisted row is modified.
+    """
+    materials = load_price_vector(db, user)
+
+    precios_actuales = active_price_vector(materials)
+    precios_simulados = dict(precios_actuales)
+    for cambio in simulation.cambios:
+        material = materials.get(cambio.material_id)
+        if material is None or not material.is_active:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Material with id {cambio.material_id} not found"
+            )
+        precios_simulados[cambio.material_id] = to_micro(calcular_precio_unidad_pequena(
+            cambio.precio_base, material.unidad_base, material.densidad
+        ))
+
+    # Direct users of the changed materials plus every product built on top of them
+    graph = load_component_graph(db, user)
+    product_ids = downstream_products(
+        get_products_using_materials(db, user, [cambio.material_id for cambio in simulation.cambios]), graph
+    )
+    products = db.query(Product).filter(
+        Product.id.in_(product_ids),
+        Product.is_active == True
+    ).order_by(Product.id).all() if product_ids else []
+    bom = load_bill_of_materials(db, user, products, materials=materials, graph=graph)
+
+    actuales = price_products(products, bom.recipes, precios_actuales, bom.components, bom.products)
+    simulados = price_products(products, bom.recipes, precios_simulados, bom.components, bom.products)
+
+    productos = []
+    for product in products:
+        actual = actuales[product.id]
+        simulado = simulados[product.id]
+        delta = ProductPriceDelta(
+            product_id=product.id,
+            nombre=product.nombre,
+            costo_paquete_actual=actual.costo_paquete,
+            costo_paquete_simulado=simulado.costo_paquete,
+            delta_costo_paquete=simulado.costo_paquete - actual.costo_paquete,
+            precio_publico_actual=actual.precio_publico,
+            precio_publico_simulado=simulado.precio_publico,
+            delta_precio_publico=simulado.precio_publico - actual.precio_publico,
+            precio_mayorista_actual=actual.precio_mayorista,
+            precio_mayorista_simulado=simulado.precio_mayorista,
+            delta_precio_mayorista=simulado.precio_mayorista - actual.precio_mayorista,
+            precio_distribuidor_actual=actual.precio_distribuidor,
+            precio_distribuidor_simulado=simulado.precio_distribuidor,
+            delta_precio_distribuidor=simulado.precio_distribuidor - actual.precio_distribuidor,
+            margen_efectivo_publico=_margen_efectivo(actual.precio_publico, simulado.costo_paquete),
+            margen_efectivo_mayorista=_margen_efectivo(actual.precio_mayorista, simulado.costo_paquete),
+            margen_efectivo_distribuidor=_margen_efectivo(actual.precio_distribuidor, simulado.costo_paquete)
+        )
+        if simulation.margen_minimo is not None:
+            delta.bajo_margen_minimo = min(
+                delta.margen_efectivo_publico,
+                delta.margen_efectivo_mayorista,
+                delta.margen_efectivo_distribuidor
+            ) < simulation.margen_minimo
+        productos.append(delta)
+
+    return PriceSimulationResponse(productos=productos, total_productos=len(productos))
@@ -0,0 +1,289 @@
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..models.material import Material
+from ..models.product import Product, ProductMaterial, ProductComponent
+from ..models.user import User
+from ..utils.fixed_point import to_micro
+from ..utils.pricing import (
+    PricingSnapshot, RecipeCycleError, calcular_snapshot, costo_componente
+)
+
+
+class RecipeLine(NamedTuple):
+    id: int
+    product_id: int
+    material_id: int
+    cantidad: Decimal
+
+
+class ComponentLine(NamedTuple):
+    id: int
+    product_id: int
+    component_product_id: int
+    cantidad: Decimal
+
+
+class CatalogPricing(NamedTuple):
+    """Result of pricing a batch of products in one pass"""
+    snapshots: Dict[int, PricingSnapshot]
+    recipes: Dict[int, List[RecipeLine]]
+    materials: Dict[int, Material]
+    components: Dict[int, List[ComponentLine]]
+    products: Dict[int, Product]
+
+
+def load_price_vector(db: Session, user: User, material_ids: Optional[Iterable[int]] = None) -> Dict[int, Material]:
+    """Load the user's materials once, keyed by id: every one, or only `material_ids`"""
+    query = db.query(Material).filter(Material.user_id == user.id)
+    if material_ids is not None:
+        material_ids = set(material_ids)
+        if not material_ids:
+            return {}
+        query = query.filter(Material.id.in_(material_ids))
+    return {material.id: material for material in query.all()}
+
+
+def load_recipe_matrix(db: Session, product_ids: Sequence[int]) -> Dict[int, List[RecipeLine]]:
+    """Load the (product x material) quantity matrix as sparse rows grouped by product"""
+    recipes: Dict[int, List[RecipeLine]] = defaultdict(list)
+    if not product_ids:
+        return recipes
+
+    rows = db.query(
+        ProductMaterial.id,
+        ProductMaterial.product_id,
+        ProductMaterial.material_id,
+        ProductMaterial.cantidad
+    ).filter(
+        ProductMaterial.product_id.in_(product_ids)
+    ).order_by(ProductMaterial.product_id, ProductMaterial.id).all()
+
+    for row in rows:
+        recipes[row.product_id].append(RecipeLine(*row))
+    return recipes
+
+
+def load_component_graph(
+    db: Session, user: User, product_ids: Optional[Iterable[int]] = None
+) -> Dict[int, List[ComponentLine]]:
+    """
+    Load the product -> intermediate product edges of the user in one query:
+    all of them, or only those reachable from `product_ids` (one recursive
+    CTE walking the component_product_id index).
+    """
+    graph: Dict[int, List[ComponentLine]] = defaultdict(list)
+    columns = (
+        ProductComponent.id,
+        ProductComponent.product_id,
+        ProductComponent.component_product_id,
+        ProductComponent.cantidad
+    )
+    if product_ids is None:
+        rows = db.query(*columns).join(
+            Product, Product.id == ProductComponent.product_id
+        ).filter(
+            Product.user_id == user.id
+        ).order_by(ProductComponent.product_id, ProductComponent.id).all()
+    else:
+        product_ids = set(product_ids)
+        if not product_ids:
+            return graph
+        reachable = select(*columns).join(
+            Product, Product.id == ProductComponent.product_id
+        ).where(
+            ProductComponent.product_id.in_(product_ids),
+            Product.user_id == user.id
+        ).cte("reachable_components", recursive=True)
+        # UNION (not UNION ALL) drops repeated edges, so a cycle cannot recurse forever
+        reachable = reachable.union(
+            select(*columns).join(reachable, ProductComponent.product_id == reachable.c.component_product_id)
+        )
+        rows = db.execute(select(reachable).order_by(reachable.c.product_id, reachable.c.id)).all()
+
+    for row in rows:
+        graph[row.product_id].append(ComponentLine(*row))
+    return graph
+
+
+def topological_order(roots: Iterable[int], graph: Dict[int, List[ComponentLine]]) -> List[int]:
+    """
+    Every product reachable from roots, ingredients before the products that
+    use them. Raises RecipeCycleError if the recipe graph has a cycle.
+    """
+    order: List[int] = []
+    state: Dict[int, bool] = {}  # False while on the DFS stack, True once emitted
+
+    for root in roots:
+        if root in state:
+            continue
+        state[root] = False
+        stack = [(root, iter(graph.get(root, ())))]
+        while stack:
+            node, edges = stack[-1]
+            for edge in edges:
+                child = edge.component_product_id
+                visited = state.get(child)
+                if visited is None:
+                    state[child] = False
+                    stack.append((child, iter(graph.get(child, ()))))
+                    break
+                if visited is False:
+                    raise RecipeCycleError(f"Product {child} is an ingredient of itself")
+            else:
+                stack.pop()
+                state[node] = True
+                order.append(node)
+    return order
+
+
+def reverse_graph(graph: Dict[int, List[ComponentLine]]) -> Dict[int, List[int]]:
+    """Intermediate product -> products that use it"""
+    users: Dict[int, List[int]] = defaultdict(list)
+    for lines in graph.values():
+        for line in lines:
+            users[line.component_product_id].append(line.product_id)
+    return users
+
+
+def downstream_products(product_ids: Iterable[int], graph: Dict[int, List[ComponentLine]]) -> List[int]:
+    """The given products plus every product that uses them, directly or through other bases"""
+    users = reverse_graph(graph)
+    seen = list(dict.fromkeys(product_ids))
+    pending = list(seen)
+    found = set(seen)
+    while pending:
+        for parent in users.get(pending.pop(), ()):
+            if parent not in found:
+                found.add(parent)
+                seen.append(parent)
+                pending.append(parent)
+    return seen
+
+
+def active_price_vector(materials: Dict[int, Material]) -> Dict[int, int]:
+    """Price per gram/ml of every active material in micro-units; inactive materials do not contribute"""
+    return {
+        material_id: to_micro(material.precio_unidad_pequena)
+        for material_id, material in materials.items()
+        if material.is_active
+    }
+
+
+def load_bill_of_materials(
+    db: Session,
+    user: User,
+    products: List[Product],
+    materials: Optional[Dict[int, Material]] = None,
+    graph: Optional[Dict[int, List[ComponentLine]]] = None
+) -> CatalogPricing:
+    """
+    Expand a batch with every intermediate product it depends on and load its
+    recipe DAG (component edges reachable from the batch, recipe matrix, and
+    only the materials those recipes use) in at most four queries, whatever
+    the size of the catalog. Snapshots are left empty.
+    """
+    products_by_id = {product.id: product for product in products}
+    if graph is None:
+        graph = load_component_graph(db, user, products_by_id)
+
+    order = topological_order(products_by_id, graph)
+    missing = [product_id for product_id in order if product_id not in products_by_id]
+    if missing:
+        for product in db.query(Product).filter(Product.id.in_(missing)).all():
+            products_by_id[product.id] = product
+
+    recipes = load_recipe_matrix(db, order)
+    if materials is None:
+        materials = load_price_vector(
+            db, user, {line.material_id for lines in recipes.values() for line in lines}
+        )
+    return CatalogPricing(
+        snapshots={}, recipes=recipes, materials=materials, components=graph, products=products_by_id
+    )
+
+
+def price_products(
+    products: List[Product],
+    recipes: Dict[int, List[RecipeLine]],
+    precios: Dict[int, int],
+    components: Optional[Dict[int, List[ComponentLine]]] = None,
+    products_by_id: Optional[Dict[int, Product]] = None
+) -> Dict[int, PricingSnapshot]:
+    """
+    Single batched pass: recipe matrix x price vector, then margins and IVA per
+    product. Intermediate products are evaluated once each, in topological
+    order, and their cost per gram reused by every product that contains them.
+    """
+    material_totals: Dict[int, Tuple[int, int]] = {}
+    for product_id, lines in recipes.items():
+        costo_receta = 0
+        peso_receta = 0
+        for line in lines:
+            precio = precios.get(line.material_id)
+            if precio is not None:
+                cantidad = to_micro(line.cantidad)
+                costo_receta += precio * cantidad
+                peso_receta += cantidad
+        material_totals[product_id] = (costo_receta, peso_receta)
+
+    return rollup_products(products, material_totals, components, products_by_id)
+
+
+def rollup_products(
+    products: List[Product],
+    material_totals: Dict[int, Tuple[int, int]],
+    components: Optional[Dict[int, List[ComponentLine]]] = None,
+    products_by_id: Optional[Dict[int, Product]] = None
+) -> Dict[int, PricingSnapshot]:
+    """
+    Price products whose material cost is already aggregated, as
+    (costo_receta, peso_receta) in MICRO^2 / MICRO units per product, adding
+    intermediate products in topological order.
+    """
+    components = components or {}
+    products_by_id = dict(products_by_id or {})
+    products_by_id.update((product.id, product) for product in products)
+
+    snapshots: Dict[int, PricingSnapshot] = {}
+    for product_id in topological_order([product.id for product in products], components):
+        product = products_by_id.get(product_id)
+        if product is None:
+            continue
+
+        costo_receta, peso_receta = material_totals.get(product_id, (0, 0))
+        for line in components.get(product_id, ()):
+            base = snapshots.get(line.component_product_id)
+            if base is not None and products_by_id[line.component_product_id].is_active:
+                cantidad = to_micro(line.cantidad)
+                costo_receta += costo_componente(base.costo_por_gramo_exacto, cantidad)
+                peso_receta += cantidad
+
+        snapshots[product_id] = calcular_snapshot(
+            costo_receta=costo_receta,
+            peso_receta=peso_receta,
+            costo_adicionales=product.calcular_costo_adicionales_total(),
+            margen_publico=product.margen_publico,
+            margen_mayorista=product.margen_mayorista,
+            margen_distribuidor=product.margen_distribuidor,
+            iva_percentage=product.iva_percentage,
+            peso_final_producido=product.peso_final_producido,
+            peso_empaque=product.peso_empaque
+        )
+    return snapshots
+
+
+def price_catalog(db: Session, user: User, products: List[Product]) -> CatalogPricing:
+    """
+    Price a batch of products, and the intermediate products they use, from
+    the recipe DAG loaded in bulk, without loading the ORM recipe graph.
+    """
+    bom = load_bill_of_materials(db, user, products)
+    snapshots = price_products(
+        products, bom.recipes, active_price_vector(bom.materials), bom.components, bom.products
+    )
+    return bom._replace(snapshots=snapshots)
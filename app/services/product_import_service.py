@@ -0,0 +1,253 @@
+import csv
+import json
+from decimal import Decimal
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert, or_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from ..models.material import Material
+from ..models.product import Product, ProductMaterial
+from ..models.user import User
+from ..schemas.product_import import ProductImportError, ProductImportResult, ProductImportRow
+from .cost_snapshot_service import refresh_product_cost_snapshots
+
+DEFAULT_CHUNK_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
+
+# CSV columns describing the recipe line of a row; every other column is a product field
+RECIPE_COLUMNS = ("material_id", "material", "cantidad")
+
+# (first line of the product in the source, raw product record)
+ImportRecord = Tuple[int, dict]
+
+
+def _format_validation_error(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors()
+    )
+
+
+def read_ndjson(lines: Iterable[str]) -> Iterator[ImportRecord]:
+    """One product per line, as a JSON object with an optional product_materials list"""
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            record = {"__error__": f"Invalid JSON: {exc}"}
+        if not isinstance(record, dict):
+            record = {"__error__": "Each line must be a JSON object"}
+        yield number, record
+
+
+def read_csv(lines: Iterable[str]) -> Iterator[ImportRecord]:
+    """
+    One recipe line per row: product columns plus material_id or material
+    (name) and cantidad. Consecutive rows with the same nombre form one product.
+    """
+    reader = csv.DictReader(lines)
+    current: Optional[dict] = None
+    current_line = 0
+
+    for row in reader:
+        number = reader.line_num
+        values = {key.strip(): (value or "").strip() for key, value in row.items() if key}
+        nombre = values.get("nombre", "")
+
+        if current is None or nombre != current.get("nombre"):
+            if current is not None:
+                yield current_line, current
+            current = {
+                key: value for key, value in values.items()
+                if key not in RECIPE_COLUMNS and value != ""
+            }
+            current["nombre"] = nombre
+            current["product_materials"] = []
+            current_line = number
+
+        if values.get("material_id") or values.get("material") or values.get("cantidad"):
+            current["product_materials"].append({
+                key: values[key] for key in RECIPE_COLUMNS if values.get(key)
+            })
+
+    if current is not None:
+        yield current_line, current
+
+
+IMPORT_READERS = {"csv": read_csv, "ndjson": read_ndjson}
+
+
+def detect_format(filename: Optional[str], format: Optional[str] = None) -> str:
+    """Explicit format, or the one implied by the file extension (.csv, .ndjson, .jsonl)"""
+    if format is None and filename:
+        extension = filename.rsplit(".", 1)[-1].lower()
+        format = "ndjson" if extension in ("ndjson", "jsonl") else extension
+    if format not in IMPORT_READERS:
+        raise ValueError("Import format must be csv or ndjson")
+    return format
+
+
+def _resolve_recipe(
+    row: ProductImportRow, by_id: Dict[int, Material], by_name: Dict[str, Material]
+) -> Dict[int, Decimal]:
+    """Material id -> quantity, repeated materials merged by adding their quantities"""
+    recipe: Dict[int, Decimal] = {}
+    for line in row.product_materials:
+        if line.material_id is not None:
+            material = by_id.get(line.material_id)
+            reference = line.material_id
+        else:
+            material = by_name.get((line.material or "").strip())
+            reference = line.material
+        if reference is None or reference == "":
+            raise ValueError("Recipe line needs material_id or material")
+        if material is None:
+            raise ValueError(f"Material {reference!r} not found")
+        recipe[material.id] = recipe.get(material.id, Decimal("0")) + line.cantidad
+    return recipe
+
+
+def _insert_products(db: Session, rows: List[Tuple[int, dict, Dict[int, Decimal]]]) -> List[int]:
+    """Insert products and their recipe lines; ids in the order of `rows`"""
+    # RETURNING rows may come back in any order; names are unique within a chunk
+    inserted = {
+        row.nombre: row.id
+        for row in db.execute(insert(Product).returning(Product.id, Product.nombre), [values for _, values, _ in rows])
+    }
+    product_ids = [inserted[values["nombre"]] for _, values, _ in rows]
+    lines = [
+        {"product_id": product_id, "material_id": material_id, "cantidad": cantidad}
+        for product_id, (_, _, recipe) in zip(product_ids, rows)
+        for material_id, cantidad in recipe.items()
+    ]
+    if lines:
+        db.execute(insert(ProductMaterial), lines)
+    return product_ids
+
+
+def _import_chunk(
+    db: Session, user: User, chunk: List[ImportRecord], seen: set, result: ProductImportResult
+) -> None:
+    def fail(line: int, nombre: Optional[str], error: str) -> None:
+        result.failed += 1
+        if len(result.errors) < MAX_REPORTED_ERRORS:
+            result.errors.append(ProductImportError(line=line, nombre=nombre, error=error))
+
+    # 1. Schema validation, in memory
+    parsed: List[Tuple[int, ProductImportRow]] = []
+    for line, record in chunk:
+        if "__error__" in record:
+            fail(line, None, record["__error__"])
+            continue
+        try:
+            row = ProductImportRow.model_validate(record)
+        except ValidationError as exc:
+            fail(line, record.get("nombre"), _format_validation_error(exc))
+            continue
+        row.nombre = row.nombre.strip()
+        if not row.nombre:
+            fail(line, None, "Product name cannot be empty")
+            continue
+        parsed.append((line, row))
+    if not parsed:
+        return
+
+    # 2. Every material reference of the chunk in one IN query
+    material_ids = {pm.material_id for _, row in parsed for pm in row.product_materials if pm.material_id is not None}
+    material_names = {
+        pm.material.strip() for _, row in parsed for pm in row.product_materials
+        if pm.material_id is None and pm.material
+    }
+    by_id: Dict[int, Material] = {}
+    by_name: Dict[str, Material] = {}
+    if material_ids or material_names:
+        materials = db.query(Material).filter(
+            Material.user_id == user.id,
+            Material.is_active == True,
+            or_(Material.id.in_(material_ids), Material.nombre.in_(material_names))
+        ).all()
+        by_id = {material.id: material for material in materials}
+        by_name = {material.nombre: material for material in materials}
+
+    # 3. Name uniqueness against the catalog (one query) and within the file
+    existing = {
+        row.nombre for row in db.query(Product.nombre).filter(
+            Product.user_id == user.id,
+            Product.is_active == True,
+            Product.nombre.in_({row.nombre for _, row in parsed})
+        )
+    }
+
+    accepted: List[Tuple[int, dict, Dict[int, Decimal]]] = []
+    for line, row in parsed:
+        if row.nombre in existing or row.nombre in seen:
+            fail(line, row.nombre, "Product name already exists for this user")
+            continue
+        try:
+            recipe = _resolve_recipe(row, by_id, by_name)
+        except ValueError as exc:
+            fail(line, row.nombre, str(exc))
+            continue
+        seen.add(row.nombre)
+        values = {"user_id": user.id, **row.model_dump(exclude={"product_materials"}, warnings=False)}
+        accepted.append((line, values, recipe))
+    if not accepted:
+        return
+
+    # 4. One multi-row INSERT ... RETURNING for the products and one executemany for
+    # their recipes. If the chunk fails as a whole, its rows are retried one by one,
+    # each in its own savepoint, so only the rows the database rejects are reported.
+    try:
+        with db.begin_nested():
+            product_ids = _insert_products(db, accepted)
+    except SQLAlchemyError:
+        product_ids = []
+        for line, values, recipe in accepted:
+            try:
+                with db.begin_nested():
+                    product_ids.extend(_insert_products(db, [(line, values, recipe)]))
+            except SQLAlchemyError as exc:
+                seen.discard(values["nombre"])
+                fail(line, values["nombre"], f"Database error: {exc.__class__.__name__}")
+
+    try:
+        if product_ids:
+            refresh_product_cost_snapshots(db, user, product_ids)
+        db.commit()
+    except SQLAlchemyError as exc:
+        db.rollback()
+        for line, values, _ in accepted:
+            if values["nombre"] in seen:
+                seen.discard(values["nombre"])
+                fail(line, values["nombre"], f"Database error: {exc.__class__.__name__}")
+        return
+
+    result.created += len(product_ids)
+    result.product_ids.extend(product_ids)
+
+
+def import_products(
+    db: Session, user: User, records: Iterable[ImportRecord], chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> ProductImportResult:
+    """
+    Stream products with their recipes into the catalog, chunk by chunk.
+    Each chunk is validated with one material query and one name query,
+    inserted in bulk and committed; invalid rows are reported and skipped
+    without aborting the load.
+    """
+    result = ProductImportResult(created=0, failed=0, product_ids=[], errors=[])
+    seen: set = set()
+    chunk: List[ImportRecord] = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            _import_chunk(db, user, chunk, seen, result)
+            chunk = []
+    if chunk:
+        _import_chunk(db, user, chunk, seen, result)
+    return result
@@ -1,18 +1,37 @@
-from typing import List
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+from datetime import datetime
 from decimal import Decimal
 
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.orm import Session, joinedload, load_only, selectinload
 
-from ..models.product import Product, ProductMaterial
+from ..models.product import PRICING_COLUMNS, Product, ProductMaterial, ProductComponent
 from ..models.material import Material
+from ..models.product_cost_snapshot import ProductCostSnapshot
 from ..models.user import User
 from ..schemas.product import (
     ProductCreate, ProductUpdate, ProductResponse,
     ProductMaterialCreate, ProductMaterialResponse,
-    ProductSummaryResponse, CostosTotalesResponse
+    ProductComponentCreate, ProductComponentResponse,
+    ProductSummaryResponse, CostosTotalesResponse,
+    PriceMatrixRequest, PriceMatrixResponse, ProductBulkDuplicateRequest,
+    CostQuoteRequest, CostQuoteResponse, CostQuoteLineResponse
 )
 from ..schemas.material import MaterialResponse
+from ..utils.conditional import CollectionVersion, collection_version
+from ..utils.fieldsets import build_partial
+from ..utils.fixed_point import MICRO, from_micro, round_div, to_micro
+from ..utils.pagination import Page, keyset_page
+from ..utils.unit_converter import UnknownUnitError, factor_a_gramos
+from ..utils.pricing import (
+    DEFAULT_IVA_PERCENTAGE, PricingSnapshot, RecipeCycleError, calcular_costo_componente, calcular_matriz_precios,
+    calcular_variante
+)
+from .pricing_engine import (
+    CatalogPricing, ComponentLine, RecipeLine, load_component_graph, price_catalog, topological_order
+)
+from .cost_snapshot_service import refresh_product_cost_snapshots, store_product_cost_snapshots
 
 
 def create_product(db: Session, product: ProductCreate, user: User) -> ProductResponse:
@@ -42,6 +61,9 @@ def create_product(db: Session, product: ProductCreate, user: User) -> ProductRe
     #         detail="Product must have at least one material"
     #     )
 
+    # Validate every recipe line with one query before writing anything
+    recipe = _validate_recipe(db, product.product_materials, user)
+
     # Create product
     db_product = Product(
         user_id=user.id,
@@ -69,40 +91,9 @@ def create_product(db: Session, product: ProductCreate, user: User) -> ProductRe
     db.flush()  # Get the product ID
 
     # Add materials to product
-    if product.product_materials:
-        for pm_data in product.product_materials:
-            # Validate material exists and belongs to user
-            material = db.query(Material).filter(
-                Material.id == pm_data.material_id,
-                Material.user_id == user.id,
-                Material.is_active == True
-            ).first()
-            if not material:
-                db.rollback()
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"Material with id {pm_data.material_id} not found"
-                )
-
-            # Check for duplicate materials in the same product
-            existing_pm = db.query(ProductMaterial).filter(
-                ProductMaterial.product_id == db_product.id,
-                ProductMaterial.material_id == pm_data.material_id
-            ).first()
-            if existing_pm:
-                db.rollback()
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Material {material.nombre} is already added to this product"
-                )
-
-            db_pm = ProductMaterial(
-                product_id=db_product.id,
-                material_id=pm_data.material_id,
-                cantidad=pm_data.cantidad
-            )
-            db.add(db_pm)
+    _write_recipe(db, db_product.id, recipe, {})
 
+    refresh_product_cost_snapshots(db, user, [db_product.id])
     db.commit()
     db.refresh(db_product)
 
@@ -114,6 +105,73 @@ def create_product(db: Session, product: ProductCreate, user: User) -> ProductRe
     return _build_product_response(db_product)
 
 
+def _validate_recipe(db: Session, lines: List[ProductMaterialCreate], user: User) -> Dict[int, Decimal]:
+    """
+    Check every requested recipe line with a single material query and return
+    the recipe as material_id -> cantidad. Lines are reported in request order.
+    """
+    if not lines:
+        return {}
+
+    materials = dict(db.query(Material.id, Material.nombre).filter(
+        Material.id.in_({line.material_id for line in lines}),
+        Material.user_id == user.id,
+        Material.is_active == True
+    ).all())
+
+    recipe: Dict[int, Decimal] = {}
+    for line in lines:
+        if line.material_id not in materials:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Material with id {line.material_id} not found"
+            )
+        if line.material_id in recipe:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Material {materials[line.material_id]} is already added to this product"
+            )
+        recipe[line.material_id] = line.cantidad
+    return recipe
+
+
+def _touch(product: Product) -> None:
+    """
+    Move the product's updated_at after a recipe or component write. A deleted
+    line leaves no timestamp behind, so without this If-Modified-Since would
+    still match a collection whose prices changed.
+    """
+    product.updated_at = datetime.utcnow()
+
+
+def _write_recipe(db: Session, product_id: int, recipe: Dict[int, Decimal], existing: Dict[int, Any]) -> bool:
+    """
+    Bring the stored recipe of a product to `recipe` with at most one DELETE,
+    one bulk UPDATE and one bulk INSERT; unchanged lines are not touched.
+    `existing` maps material_id -> (id, material_id, cantidad) of the stored lines.
+    Returns whether any line was written.
+    """
+    removed = [line.id for material_id, line in existing.items() if material_id not in recipe]
+    changed = [
+        {"id": existing[material_id].id, "cantidad": cantidad}
+        for material_id, cantidad in recipe.items()
+        if material_id in existing and existing[material_id].cantidad != cantidad
+    ]
+    added = [
+        {"product_id": product_id, "material_id": material_id, "cantidad": cantidad}
+        for material_id, cantidad in recipe.items()
+        if material_id not in existing
+    ]
+
+    if removed:
+        db.execute(delete(ProductMaterial).where(ProductMaterial.id.in_(removed)))
+    if changed:
+        db.execute(update(ProductMaterial), changed)
+    if added:
+        db.execute(insert(ProductMaterial), added)
+    return bool(removed or changed or added)
+
+
 def get_product(db: Session, product_id: int, user: User) -> ProductResponse:
     product = db.query(Product).options(
         joinedload(Product.product_materials).joinedload(ProductMaterial.material)
@@ -132,15 +190,130 @@ def get_product(db: Session, product_id: int, user: User) -> ProductResponse:
     return _build_product_response(product)
 
 
-def get_products(db: Session, user: User, skip: int = 0, limit: int = 100) -> List[ProductResponse]:
-    products = db.query(Product).options(
-        joinedload(Product.product_materials).joinedload(ProductMaterial.material)
-    ).filter(
+def _snapshot_value(column: str):
+    """
+    SQL value of a stored cost snapshot column, which includes intermediate
+    products. Products without a snapshot fall back to the hybrid expression,
+    which only aggregates raw materials; snapshots are backfilled at deploy
+    and written on every change, so the fallback should not be reached.
+    """
+    return func.coalesce(getattr(ProductCostSnapshot, column), getattr(Product, column))
+
+
+def _precio_por_tipo_cliente(tipo_cliente: str):
+    """SQL expression of the price (IVA included) charged to a client type"""
+    price_mapping = {
+        'publico': 'precio_publico_con_iva',
+        'mayorista': 'precio_mayorista_con_iva',
+        'distribuidor': 'precio_distribuidor_con_iva'
+    }
+
+    precio = price_mapping.get(tipo_cliente)
+    if precio is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid tipo_cliente: {tipo_cliente}"
+        )
+    return _snapshot_value(precio)
+
+
+def _product_sort_column(sort_by: str, precio) -> Tuple[Any, bool]:
+    """(sort expression, descending) for a sort_by value"""
+    sort_mapping = {
+        'nombre': Product.nombre,
+        'precio': precio,
+        'costo_paquete': _snapshot_value('costo_paquete'),
+        'costo_por_gramo': _snapshot_value('costo_por_gramo'),
+        'created_at': Product.created_at
+    }
+
+    # A leading '-' sorts in descending order
+    campo = sort_by.lstrip('-')
+    column = sort_mapping.get(campo)
+    if column is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid sort_by: {sort_by}. Valid options: {', '.join(sort_mapping)}"
+        )
+    return column, sort_by.startswith('-')
+
+
+def get_products(
+    db: Session,
+    user: User,
+    skip: int = 0,
+    limit: int = 100,
+    min_price: Optional[Decimal] = None,
+    max_price: Optional[Decimal] = None,
+    sort_by: Optional[str] = None,
+    tipo_cliente: str = 'publico',
+    cursor: Optional[str] = None,
+    total: Optional[str] = None,
+    fields: Optional[FrozenSet[str]] = None
+) -> Page:
+    """
+    List products, filtering by price range and sorting in the database on
+    the stored cost snapshots. Prices are those charged to tipo_cliente, IVA
+    included.
+    Pages follow (sort key, id) with an opaque cursor; see utils.pagination.
+    With `fields`, only those columns are loaded and the page is priced
+    only if a price or recipe field is requested.
+    """
+    query = db.query(Product).filter(
         Product.user_id == user.id,
         Product.is_active == True
-    ).offset(skip).limit(limit).all()
+    )
+
+    priced = fields is None or bool(fields & (PRODUCT_PRICE_FIELDS | PRODUCT_RECIPE_FIELDS))
+    if fields is not None:
+        columns = {name for name in fields if name in Product.__table__.columns}
+        if priced:
+            columns.update(PRICING_COLUMNS + ('is_active',))
+        query = query.options(load_only(*(getattr(Product, name) for name in columns | {'id'})))
+
+    sort_column, descending = Product.id, False
+    if min_price is not None or max_price is not None or sort_by:
+        # Prices and costs are filtered and sorted on the stored snapshots
+        query = query.outerjoin(ProductCostSnapshot, ProductCostSnapshot.product_id == Product.id)
+        precio = _precio_por_tipo_cliente(tipo_cliente)
+        if min_price is not None:
+            query = query.filter(precio >= min_price)
+        if max_price is not None:
+            query = query.filter(precio <= max_price)
+        if sort_by:
+            sort_column, descending = _product_sort_column(sort_by, precio)
+
+    # The cursor is only valid for the same ordering (and client type when sorting by price)
+    key = f"products:{sort_by or 'id'}"
+    if sort_by and sort_by.lstrip('-') == 'precio':
+        key += f":{tipo_cliente}"
+    page = keyset_page(
+        db, query, key, sort_column, Product.id,
+        descending=descending, cursor=cursor, limit=limit, skip=skip, total=total
+    )
+
+    # Price the whole page in one batch instead of walking each ORM recipe
+    pricing = price_catalog(db, user, list(page)) if priced else None
+
+    if fields is not None:
+        return page.map(lambda product: _build_partial_product_response(product, fields, pricing))
+    return page.map(lambda product: _build_catalog_product_response(product, pricing))
+
 
-    return [_build_product_response(product) for product in products]
+def product_collection_sources(user: User) -> list:
+    """Tables a product listing is computed from: products, their recipes and the material prices"""
+    user_products = select(Product.id).where(Product.user_id == user.id)
+    return [
+        (Product, Product.user_id == user.id),
+        (ProductMaterial, ProductMaterial.product_id.in_(user_products)),
+        (ProductComponent, ProductComponent.product_id.in_(user_products)),
+        (Material, Material.user_id == user.id),
+    ]
+
+
+def get_products_version(db: Session, user: User) -> CollectionVersion:
+    """Collection validator of the user's products, from one aggregate query"""
+    return collection_version(db, f"products:{user.id}", product_collection_sources(user))
 
 
 def update_product(db: Session, product_id: int, product_update: ProductUpdate, user: User) -> ProductResponse:
@@ -226,43 +399,18 @@ def update_product(db: Session, product_id: int, product_update: ProductUpdate,
     if product_update.peso_empaque is not None:
         product.peso_empaque = product_update.peso_empaque
 
-    # Update materials if provided
+    # Update materials if provided: only the lines that changed are written
     if product_update.product_materials is not None:
-        # Remove existing materials
-        db.query(ProductMaterial).filter(ProductMaterial.product_id == product_id).delete()
-
-        # Add new materials
-        for pm_data in product_update.product_materials:
-            # Validate material exists and belongs to user
-            material = db.query(Material).filter(
-                Material.id == pm_data.material_id,
-                Material.user_id == user.id,
-                Material.is_active == True
-            ).first()
-            if not material:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"Material with id {pm_data.material_id} not found"
-                )
-
-            # Check for duplicate materials in the same product
-            existing_pm = db.query(ProductMaterial).filter(
-                ProductMaterial.product_id == product_id,
-                ProductMaterial.material_id == pm_data.material_id
-            ).first()
-            if existing_pm:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Material {material.nombre} is already added to this product"
-                )
-
-            db_pm = ProductMaterial(
-                product_id=product_id,
-                material_id=pm_data.material_id,
-                cantidad=pm_data.cantidad
-            )
-            db.add(db_pm)
-
+        recipe = _validate_recipe(db, product_update.product_materials, user)
+        existing = {
+            row.material_id: row for row in db.query(
+                ProductMaterial.id, ProductMaterial.material_id, ProductMaterial.cantidad
+            ).filter(ProductMaterial.product_id == product_id)
+        }
+        if _write_recipe(db, product_id, recipe, existing):
+            _touch(product)
+
+    refresh_product_cost_snapshots(db, user, [product_id])
     db.commit()
     db.refresh(product)
 
@@ -288,6 +436,8 @@ def delete_product(db: Session, product_id: int, user: User) -> bool:
 
     # Soft delete by setting is_active to False
     product.is_active = False
+    # Products that used it as an intermediate base lose its cost
+    refresh_product_cost_snapshots(db, user, [product_id])
     db.commit()
 
     return True
@@ -335,6 +485,8 @@ def add_material_to_product(db: Session, product_id: int, material_data: Product
         cantidad=material_data.cantidad
     )
     db.add(db_pm)
+    _touch(product)
+    refresh_product_cost_snapshots(db, user, [product_id])
     db.commit()
     db.refresh(db_pm)
 
@@ -353,6 +505,92 @@ def add_material_to_product(db: Session, product_id: int, material_data: Product
     )
 
 
+def add_component_to_product(
+    db: Session, product_id: int, component_data: ProductComponentCreate, user: User
+) -> ProductComponentResponse:
+    """Use another product (e.g. a soap base) as an ingredient of this product"""
+    product = db.query(Product).filter(
+        Product.id == product_id,
+        Product.user_id == user.id,
+        Product.is_active == True
+    ).first()
+    if not product:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Product not found"
+        )
+
+    component = db.query(Product).filter(
+        Product.id == component_data.component_product_id,
+        Product.user_id == user.id,
+        Product.is_active == True
+    ).first()
+    if not component:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Product with id {component_data.component_product_id} not found"
+        )
+
+    graph = load_component_graph(db, user)
+    if any(line.component_product_id == component.id for line in graph.get(product_id, ())):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Product {component.nombre} is already added to this product"
+        )
+
+    # Reject the edge if it would close a cycle in the recipe DAG
+    graph[product_id].append(ComponentLine(None, product_id, component.id, component_data.cantidad))
+    try:
+        topological_order([product_id], graph)
+    except RecipeCycleError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Product {component.nombre} already contains {product.nombre}"
+        )
+
+    db_pc = ProductComponent(
+        product_id=product_id,
+        component_product_id=component.id,
+        cantidad=component_data.cantidad
+    )
+    db.add(db_pc)
+    _touch(product)
+    refresh_product_cost_snapshots(db, user, [product_id])
+    db.commit()
+    db.refresh(db_pc)
+
+    return _build_component_response(db_pc)
+
+
+def remove_component_from_product(db: Session, product_id: int, component_product_id: int, user: User) -> bool:
+    product = db.query(Product).filter(
+        Product.id == product_id,
+        Product.user_id == user.id,
+        Product.is_active == True
+    ).first()
+    if not product:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Product not found"
+        )
+
+    pc = db.query(ProductComponent).filter(
+        ProductComponent.product_id == product_id,
+        ProductComponent.component_product_id == component_product_id
+    ).first()
+    if not pc:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Component not found in this product"
+        )
+
+    db.delete(pc)
+    _touch(product)
+    refresh_product_cost_snapshots(db, user, [product_id])
+    db.commit()
+    return True
+
+
 def remove_material_from_product(db: Session, product_id: int, material_id: int, user: User) -> bool:
     # Validate product exists and belongs to user
     product = db.query(Product).filter(
@@ -379,6 +617,8 @@ def remove_material_from_product(db: Session, product_id: int, material_id: int,
         )
 
     db.delete(pm)
+    _touch(product)
+    refresh_product_cost_snapshots(db, user, [product_id])
     db.commit()
 
     return True
@@ -387,7 +627,8 @@ def duplicate_product(db: Session, product_id: int, new_name: str, new_peso_empa
     """Duplicate existing product with new name and package weight"""
     # Get original product with all relationships
     original = db.query(Product).options(
-        joinedload(Product.product_materials).joinedload(ProductMaterial.material)
+        joinedload(Product.product_materials).joinedload(ProductMaterial.material),
+        selectinload(Product.components)
     ).filter(
         Product.id == product_id,
         Product.user_id == user.id,
@@ -441,6 +682,15 @@ def duplicate_product(db: Session, product_id: int, new_name: str, new_peso_empa
         )
         db.add(duplicate_pm)
 
+    # Intermediate bases are part of the recipe too
+    for original_pc in original.components:
+        db.add(ProductComponent(
+            product_id=duplicate.id,
+            component_product_id=original_pc.component_product_id,
+            cantidad=original_pc.cantidad
+        ))
+
+    refresh_product_cost_snapshots(db, user, [duplicate.id])
     db.commit()
     db.refresh(duplicate)
 
@@ -448,27 +698,265 @@ def duplicate_product(db: Session, product_id: int, new_name: str, new_peso_empa
     return _build_product_response(duplicate)
 
 
+# Columns a duplicate copies from its original; the package weight comes from the request
+DUPLICATED_COLUMNS = tuple(column for column in PRICING_COLUMNS if column != 'peso_empaque')
 
-def calculate_total_costs(db: Session, user: User) -> CostosTotalesResponse:
-    products = db.query(Product).options(
+
+def duplicate_product_bulk(
+    db: Session, product_id: int, request: ProductBulkDuplicateRequest, user: User
+) -> List[ProductResponse]:
+    """
+    Duplicate a product into several package sizes in one transaction: one
+    name check, bulk inserts of the products and their recipe and component
+    lines, and every copy priced from the original's cost per gram.
+    """
+    original = db.query(Product).filter(
+        Product.id == product_id,
+        Product.user_id == user.id,
+        Product.is_active == True
+    ).first()
+    if not original:
+        raise HTTPException(status_code=404, detail="Original product not found")
+
+    nombres = [item.nombre for item in request.variantes]
+    existing = [
+        row.nombre for row in db.query(Product.nombre).filter(
+            Product.user_id == user.id,
+            Product.is_active == True,
+            Product.nombre.in_(nombres)
+        )
+    ]
+    if existing:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Product names already exist: {', '.join(sorted(existing))}"
+        )
+
+    # The shared recipe is evaluated once; each copy only changes the package weight
+    pricing = price_catalog(db, user, [original])
+    base = pricing.snapshots[original.id]
+
+    # One multi-row INSERT ... RETURNING; rows may come back in any order
+    inserted = {
+        product.nombre: product for product in db.scalars(insert(Product).returning(Product), [
+            dict(
+                user_id=user.id,
+                nombre=item.nombre,
+                peso_empaque=item.peso_empaque,
+                **{column: getattr(original, column) for column in DUPLICATED_COLUMNS}
+            )
+            for item in request.variantes
+        ])
+    }
+    duplicates = [inserted[nombre] for nombre in nombres]
+
+    recipes: Dict[int, List[RecipeLine]] = {}
+    lines = [
+        {"product_id": duplicate.id, "material_id": line.material_id, "cantidad": line.cantidad}
+        for duplicate in duplicates
+        for line in pricing.recipes.get(original.id, ())
+    ]
+    if lines:
+        rows = db.execute(insert(ProductMaterial).returning(
+            ProductMaterial.id, ProductMaterial.product_id, ProductMaterial.material_id, ProductMaterial.cantidad
+        ), lines)
+        for row in rows:
+            recipes.setdefault(row.product_id, []).append(RecipeLine(*row))
+
+    components: Dict[int, List[ComponentLine]] = dict(pricing.components)
+    component_lines = [
+        {"product_id": duplicate.id, "component_product_id": line.component_product_id, "cantidad": line.cantidad}
+        for duplicate in duplicates
+        for line in pricing.components.get(original.id, ())
+    ]
+    if component_lines:
+        rows = db.execute(insert(ProductComponent).returning(
+            ProductComponent.id, ProductComponent.product_id,
+            ProductComponent.component_product_id, ProductComponent.cantidad
+        ), component_lines)
+        for row in rows:
+            components.setdefault(row.product_id, []).append(ComponentLine(*row))
+
+    snapshots = dict(pricing.snapshots)
+    for duplicate in duplicates:
+        snapshots[duplicate.id] = calcular_variante(
+            base, duplicate.peso_empaque, None, duplicate.margen_publico,
+            duplicate.margen_mayorista, duplicate.margen_distribuidor, duplicate.iva_percentage
+        )
+    store_product_cost_snapshots(db, user, {duplicate.id: snapshots[duplicate.id] for duplicate in duplicates})
+
+    # Built before committing so the new rows are not reloaded one by one
+    family = pricing._replace(snapshots=snapshots, recipes=recipes, components=components)
+    responses = [_build_catalog_product_response(duplicate, family) for duplicate in duplicates]
+    db.commit()
+    return responses
+
+
+
+def calculate_price_matrix(db: Session, product_id: int, request: PriceMatrixRequest, user: User) -> PriceMatrixResponse:
+    """Evaluate a package weight x margin x IVA price grid from one recipe evaluation"""
+    product = db.query(Product).options(
         joinedload(Product.product_materials).joinedload(ProductMaterial.material)
     ).filter(
+        Product.id == product_id,
         Product.user_id == user.id,
         Product.is_active == True
-    ).all()
+    ).first()
+
+    if not product:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Product not found"
+        )
+
+    precios = product.pricing_snapshot()
+    iva_percentages = request.iva_percentages or [Decimal(str(product.iva_percentage or DEFAULT_IVA_PERCENTAGE))]
+    matriz = calcular_matriz_precios(
+        precios,
+        request.pesos_empaque,
+        request.margenes,
+        iva_percentages
+    )
+
+    return PriceMatrixResponse(
+        product_id=product.id,
+        costo_por_gramo=precios.costo_por_gramo,
+        costo_adicionales=precios.costo_adicionales,
+        pesos_empaque=request.pesos_empaque,
+        margenes=request.margenes,
+        iva_percentages=iva_percentages,
+        **matriz
+    )
+
+
+def calculate_cost_quote(db: Session, request: CostQuoteRequest, user: User) -> CostQuoteResponse:
+    """
+    Price a list of (product or material, quantity, unit) lines in one pass:
+    the products and their recipe DAG are loaded in bulk, each product is
+    evaluated once and its exact cost per gram reused by every line that
+    references it. Material lines convert with the material's own units and
+    density; product lines with the standard factors.
+    """
+    product_ids = {line.product_id for line in request.lines if line.product_id is not None}
+    products = db.query(Product).filter(
+        Product.id.in_(product_ids),
+        Product.user_id == user.id,
+        Product.is_active == True
+    ).all() if product_ids else []
+    missing = product_ids - {product.id for product in products}
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Products not found: {sorted(missing)}"
+        )
+
+    material_ids = {line.material_id for line in request.lines if line.material_id is not None}
+    materials = {
+        material.id: material
+        for material in db.query(Material).options(joinedload(Material.unidades)).filter(
+            Material.id.in_(material_ids),
+            Material.user_id == user.id,
+            Material.is_active == True
+        )
+    } if material_ids else {}
+    missing = material_ids - materials.keys()
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Materials not found: {sorted(missing)}"
+        )
+
+    factores = {}
+    for index, line in enumerate(request.lines):
+        key = (line.material_id, line.unit)
+        if key not in factores:
+            try:
+                if line.material_id is not None:
+                    factores[key] = materials[line.material_id].factor_a_gramos(line.unit)
+                else:
+                    factores[key] = factor_a_gramos(line.unit)
+            except UnknownUnitError as exc:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Line {index}: {exc}"
+                )
+
+    pricing = price_catalog(db, user, products) if products else None
+
+    lines = []
+    total = Decimal('0')
+    for line in request.lines:
+        gramos = line.quantity * factores[(line.material_id, line.unit)]
+        if line.material_id is not None:
+            material = materials[line.material_id]
+            nombre = material.nombre
+            costo_por_gramo = material.precio_unidad_pequena
+            costo = from_micro(round_div(to_micro(costo_por_gramo) * to_micro(gramos), MICRO))
+        else:
+            snapshot = pricing.snapshots[line.product_id]
+            nombre = pricing.products[line.product_id].nombre
+            costo_por_gramo = snapshot.costo_por_gramo
+            costo = calcular_costo_componente(snapshot, gramos)
+        total += costo
+        lines.append(CostQuoteLineResponse(
+            product_id=line.product_id,
+            material_id=line.material_id,
+            nombre=nombre,
+            quantity=line.quantity,
+            unit=line.unit,
+            gramos=gramos,
+            costo_por_gramo=costo_por_gramo,
+            costo_total=costo
+        ))
+
+    return CostQuoteResponse(lines=lines, costo_total=total)
+
+
+def calculate_total_costs(db: Session, user: User) -> CostosTotalesResponse:
+    # Aggregate recipe costs in SQL; only active materials contribute to the cost
+    costo_linea = case(
+        (Material.is_active == True, ProductMaterial.cantidad * Material.precio_unidad_pequena),
+        else_=0
+    )
+    rows = db.query(
+        Product.id,
+        Product.nombre,
+        func.coalesce(func.sum(costo_linea), 0).label('costo_total'),
+        func.count(ProductMaterial.id).label('materiales_count')
+    ).outerjoin(
+        ProductMaterial, ProductMaterial.product_id == Product.id
+    ).outerjoin(
+        Material, Material.id == ProductMaterial.material_id
+    ).filter(
+        Product.user_id == user.id,
+        Product.is_active == True
+    ).group_by(Product.id, Product.nombre).order_by(Product.id).all()
+
+    # Products built on intermediate products need the recipe DAG rollup
+    graph = load_component_graph(db, user)
+    compuestos = [row.id for row in rows if graph.get(row.id)]
+    costos_compuestos = {}
+    if compuestos:
+        pricing = price_catalog(db, user, db.query(Product).filter(Product.id.in_(compuestos)).all())
+        costos_compuestos = {
+            product_id: pricing.snapshots[product_id].costo_materiales for product_id in compuestos
+        }
 
     product_summaries = []
     total_general = Decimal('0')
 
-    for product in products:
-        costo_total = product.calcular_costo_total()
+    for row in rows:
+        costo_total = costos_compuestos.get(row.id)
+        if costo_total is None:
+            # Same micro-unit rounding as the pricing core, whatever numeric type the driver returns
+            costo_total = from_micro(to_micro(row.costo_total))
         total_general += costo_total
 
         product_summaries.append(ProductSummaryResponse(
-            id=product.id,
-            nombre=product.nombre,
+            id=row.id,
+            nombre=row.nombre,
             costo_total=costo_total,
-            materiales_count=len(product.product_materials)
+            materiales_count=row.materiales_count
         ))
 
     return CostosTotalesResponse(
@@ -478,74 +966,188 @@ def calculate_total_costs(db: Session, user: User) -> CostosTotalesResponse:
     )
 
 
-def _build_product_response(product: Product) -> ProductResponse:
-    """Helper function to build ProductResponse with calculated costs"""
+# ProductResponse fields derived from the pricing snapshot, and those made of recipe lines;
+# every other field is a product column
+PRODUCT_PRICE_FIELDS = frozenset({
+    'costo_total', 'iva_publico', 'iva_mayorista', 'iva_distribuidor',
+    'precio_publico', 'precio_mayorista', 'precio_distribuidor',
+    'precio_publico_con_iva', 'precio_mayorista_con_iva', 'precio_distribuidor_con_iva',
+    'costo_paquete', 'precio_publico_paquete', 'precio_mayorista_paquete', 'precio_distribuidor_paquete',
+    'precio_publico_con_iva_paquete', 'precio_mayorista_con_iva_paquete',
+    'precio_distribuidor_con_iva_paquete', 'costo_por_gramo'
+})
+PRODUCT_RECIPE_FIELDS = frozenset({'product_materials', 'product_components'})
+
+# Named projections for ?view=; None is the full representation
+PRODUCT_VIEWS = {
+    'summary': (
+        'nombre', 'costo_total', 'precio_publico_con_iva', 'precio_mayorista_con_iva',
+        'precio_distribuidor_con_iva', 'is_active'
+    ),
+    'full': None
+}
+
+
+def _build_catalog_recipe_responses(product: Product, pricing: CatalogPricing):
+    """Recipe and component lines of a product priced by the bulk pricing engine"""
     product_materials = []
-    for pm in product.product_materials:
-        if pm.material and pm.material.is_active:
-            # Convert SQLAlchemy material to Pydantic MaterialResponse
-            material_response = MaterialResponse(
-                id=pm.material.id,
-                nombre=pm.material.nombre,
-                precio_base=pm.material.precio_base,
-                unidad_base=pm.material.unidad_base,
-                precio_unidad_pequena=pm.material.precio_unidad_pequena,
-                is_active=pm.material.is_active
-            )
-
+    for line in pricing.recipes.get(product.id, ()):
+        material = pricing.materials.get(line.material_id)
+        if material and material.is_active:
             product_materials.append(ProductMaterialResponse(
-                id=pm.id,
-                product_id=pm.product_id,
-                material_id=pm.material_id,
-                cantidad=pm.cantidad,
-                costo=pm.calcular_costo(),
-                material=material_response
+                id=line.id,
+                product_id=line.product_id,
+                material_id=line.material_id,
+                cantidad=line.cantidad,
+                costo=material.calcular_precio_cantidad(line.cantidad),
+                material=_build_material_response(material)
+            ))
+
+    product_components = []
+    for line in pricing.components.get(product.id, ()):
+        component = pricing.products.get(line.component_product_id)
+        if component and component.is_active:
+            product_components.append(ProductComponentResponse(
+                id=line.id,
+                product_id=line.product_id,
+                component_product_id=line.component_product_id,
+                nombre=component.nombre,
+                cantidad=line.cantidad,
+                costo=calcular_costo_componente(pricing.snapshots[component.id], line.cantidad)
             ))
 
-    # Calculate package prices
-    precios_empaque = product.calcular_precios_por_empaque()
+    return product_materials, product_components
+
+
+def _build_catalog_product_response(product: Product, pricing: CatalogPricing) -> ProductResponse:
+    """Build ProductResponse from a batch priced by the bulk pricing engine"""
+    product_materials, product_components = _build_catalog_recipe_responses(product, pricing)
+    return _build_product_response(product, pricing.snapshots[product.id], product_materials, product_components)
+
+
+def _build_partial_product_response(product: Product, fields: FrozenSet[str], pricing: Optional[CatalogPricing]):
+    """Only the requested ProductResponse fields; prices and recipes are built only when asked for"""
+    values = _product_column_values(product, fields)
+    if pricing is not None and fields & PRODUCT_PRICE_FIELDS:
+        values.update(_product_price_values(pricing.snapshots[product.id]))
+    if pricing is not None and fields & PRODUCT_RECIPE_FIELDS:
+        values['product_materials'], values['product_components'] = _build_catalog_recipe_responses(product, pricing)
+    return build_partial(ProductResponse, fields, values)
+
+
+def _build_material_response(material: Material) -> MaterialResponse:
+    """Convert SQLAlchemy material to Pydantic MaterialResponse"""
+    return MaterialResponse(
+        id=material.id,
+        nombre=material.nombre,
+        precio_base=material.precio_base,
+        unidad_base=material.unidad_base,
+        precio_unidad_pequena=material.precio_unidad_pequena,
+        is_active=material.is_active
+    )
+
+
+def _product_column_values(product: Product, fields: Optional[FrozenSet[str]] = None) -> Dict[str, Any]:
+    """ProductResponse fields read from product columns, all of them or only `fields`"""
+    getters = {
+        'id': lambda: product.id,
+        'nombre': lambda: product.nombre,
+        'costo_etiqueta': lambda: product.costo_etiqueta or Decimal('0'),
+        'costo_envase': lambda: product.costo_envase or Decimal('0'),
+        'costo_caja': lambda: product.costo_caja or Decimal('0'),
+        'costo_transporte': lambda: product.costo_transporte,
+        'costo_mano_obra': lambda: product.costo_mano_obra or Decimal('0'),
+        'costo_energia': lambda: product.costo_energia or Decimal('0'),
+        'costo_depreciacion': lambda: product.costo_depreciacion or Decimal('0'),
+        'costo_mantenimiento': lambda: product.costo_mantenimiento or Decimal('0'),
+        'costo_administrativo': lambda: product.costo_administrativo or Decimal('0'),
+        'costo_comercializacion': lambda: product.costo_comercializacion or Decimal('0'),
+        'costo_financiero': lambda: product.costo_financiero or Decimal('0'),
+        'iva_percentage': lambda: product.iva_percentage or 21.0,
+        'margen_publico': lambda: product.margen_publico,
+        'margen_mayorista': lambda: product.margen_mayorista,
+        'margen_distribuidor': lambda: product.margen_distribuidor,
+        'peso_ingredientes_base': lambda: product.peso_ingredientes_base,
+        'peso_final_producido': lambda: product.peso_final_producido,
+        'peso_empaque': lambda: product.peso_empaque,
+        'is_active': lambda: product.is_active,
+        'created_at': lambda: product.created_at,
+        'updated_at': lambda: product.updated_at,
+    }
+    return {
+        name: getter() for name, getter in getters.items()
+        if fields is None or name in fields
+    }
+
+
+def _product_price_values(precios: PricingSnapshot) -> Dict[str, Any]:
+    """ProductResponse fields derived from a pricing snapshot"""
+    return dict(
+        costo_total=precios.costo_materiales,
+        iva_publico=precios.iva_publico,
+        iva_mayorista=precios.iva_mayorista,
+        iva_distribuidor=precios.iva_distribuidor,
+        precio_publico=precios.precio_publico,
+        precio_mayorista=precios.precio_mayorista,
+        precio_distribuidor=precios.precio_distribuidor,
+        precio_publico_con_iva=precios.precio_publico_con_iva,
+        precio_mayorista_con_iva=precios.precio_mayorista_con_iva,
+        precio_distribuidor_con_iva=precios.precio_distribuidor_con_iva,
+        costo_paquete=precios.costo_paquete,
+        precio_publico_paquete=precios.precio_publico,
+        precio_mayorista_paquete=precios.precio_mayorista,
+        precio_distribuidor_paquete=precios.precio_distribuidor,
+        precio_publico_con_iva_paquete=precios.precio_publico_con_iva,
+        precio_mayorista_con_iva_paquete=precios.precio_mayorista_con_iva,
+        precio_distribuidor_con_iva_paquete=precios.precio_distribuidor_con_iva,
+        costo_por_gramo=precios.costo_por_gramo
+    )
+
+
+def _build_product_response(
+    product: Product,
+    precios: Optional[PricingSnapshot] = None,
+    product_materials: Optional[List[ProductMaterialResponse]] = None,
+    product_components: Optional[List[ProductComponentResponse]] = None
+) -> ProductResponse:
+    """Helper function to build ProductResponse with calculated costs"""
+    if product_materials is None:
+        product_materials = []
+        for pm in product.product_materials:
+            if pm.material and pm.material.is_active:
+                product_materials.append(ProductMaterialResponse(
+                    id=pm.id,
+                    product_id=pm.product_id,
+                    material_id=pm.material_id,
+                    cantidad=pm.cantidad,
+                    costo=pm.calcular_costo(),
+                    material=_build_material_response(pm.material)
+                ))
+
+    if product_components is None:
+        product_components = [
+            _build_component_response(pc) for pc in product.components
+            if pc.component and pc.component.is_active
+        ]
+
+    # Calculate every price from a single pricing snapshot
+    if precios is None:
+        precios = product.pricing_snapshot()
 
     return ProductResponse(
-        id=product.id,
-        nombre=product.nombre,
-        costo_total=product.calcular_costo_total(),
-        costo_etiqueta=product.costo_etiqueta or Decimal('0'),
-        costo_envase=product.costo_envase or Decimal('0'),
-        costo_caja=product.costo_caja or Decimal('0'),
-        costo_transporte=product.costo_transporte,
-        costo_mano_obra=product.costo_mano_obra or Decimal('0'),
-        costo_energia=product.costo_energia or Decimal('0'),
-        costo_depreciacion=product.costo_depreciacion or Decimal('0'),
-        costo_mantenimiento=product.costo_mantenimiento or Decimal('0'),
-        costo_administrativo=product.costo_administrativo or Decimal('0'),
-        costo_comercializacion=product.costo_comercializacion or Decimal('0'),
-        costo_financiero=product.costo_financiero or Decimal('0'),
-        iva_percentage=product.iva_percentage or 21.0,
-        iva_publico=product.iva_publico,
-        iva_mayorista=product.iva_mayorista,
-        iva_distribuidor=product.iva_distribuidor,
-        margen_publico=product.margen_publico,
-        margen_mayorista=product.margen_mayorista,
-        margen_distribuidor=product.margen_distribuidor,
-        precio_publico=product.precio_publico,
-        precio_mayorista=product.precio_mayorista,
-        precio_distribuidor=product.precio_distribuidor,
-        precio_publico_con_iva=product.precio_publico_con_iva,
-        precio_mayorista_con_iva=product.precio_mayorista_con_iva,
-        precio_distribuidor_con_iva=product.precio_distribuidor_con_iva,
-        peso_ingredientes_base=product.peso_ingredientes_base,
-        peso_final_producido=product.peso_final_producido,
-        peso_empaque=product.peso_empaque,
-        costo_paquete=precios_empaque['costo_paquete'],
-        precio_publico_paquete=precios_empaque['precio_publico_paquete'],
-        precio_mayorista_paquete=precios_empaque['precio_mayorista_paquete'],
-        precio_distribuidor_paquete=precios_empaque['precio_distribuidor_paquete'],
-        precio_publico_con_iva_paquete=precios_empaque['precio_publico_con_iva_paquete'],
-        precio_mayorista_con_iva_paquete=precios_empaque['precio_mayorista_con_iva_paquete'],
-        precio_distribuidor_con_iva_paquete=precios_empaque['precio_distribuidor_con_iva_paquete'],
-        costo_por_gramo=product.calcular_costo_por_gramo_ajustado(),
-        is_active=product.is_active,
-        created_at=product.created_at,
-        updated_at=product.updated_at,
-        product_materials=product_materials
+        **_product_column_values(product),
+        **_product_price_values(precios),
+        product_materials=product_materials,
+        product_components=product_components
+    )
+
+
+def _build_component_response(pc: ProductComponent) -> ProductComponentResponse:
+    return ProductComponentResponse(
+        id=pc.id,
+        product_id=pc.product_id,
+        component_product_id=pc.component_product_id,
+        nombre=pc.component.nombre,
+        cantidad=pc.cantidad,
+        costo=pc.calcular_costo()
     )
\ No newline at end of file
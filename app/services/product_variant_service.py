@@ -0,0 +1,150 @@
+from typing import List
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session, joinedload
+
+from ..models.product import Product, ProductMaterial
+from ..models.product_variant import ProductVariant
+from ..models.user import User
+from ..schemas.product_variant import (
+    ProductVariantCreate, ProductVariantUpdate, ProductVariantResponse, ProductFamilyResponse
+)
+from ..utils.pricing import PricingSnapshot, calcular_variante
+
+
+def _get_product(db: Session, product_id: int, user: User) -> Product:
+    product = db.query(Product).options(
+        joinedload(Product.product_materials).joinedload(ProductMaterial.material)
+    ).filter(
+        Product.id == product_id,
+        Product.user_id == user.id,
+        Product.is_active == True
+    ).first()
+
+    if not product:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Product not found"
+        )
+    return product
+
+
+def _get_variant(db: Session, product_id: int, variant_id: int, user: User) -> ProductVariant:
+    variant = db.query(ProductVariant).filter(
+        ProductVariant.id == variant_id,
+        ProductVariant.product_id == product_id,
+        ProductVariant.user_id == user.id,
+        ProductVariant.is_active == True
+    ).first()
+
+    if not variant:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Variant not found"
+        )
+    return variant
+
+
+def _price_variant(product: Product, base: PricingSnapshot, variant: ProductVariant) -> PricingSnapshot:
+    """Price a variant from the recipe already evaluated in the product snapshot"""
+    return calcular_variante(
+        base,
+        variant.peso_empaque,
+        variant.costo_extra,
+        product.margen_publico,
+        product.margen_mayorista,
+        product.margen_distribuidor,
+        product.iva_percentage
+    )
+
+
+def _build_variant_response(variant: ProductVariant, precios: PricingSnapshot) -> ProductVariantResponse:
+    return ProductVariantResponse(
+        id=variant.id,
+        product_id=variant.product_id,
+        nombre=variant.nombre,
+        peso_empaque=variant.peso_empaque,
+        costo_extra=variant.costo_extra or 0,
+        costo_paquete=precios.costo_paquete,
+        precio_publico=precios.precio_publico,
+        precio_mayorista=precios.precio_mayorista,
+        precio_distribuidor=precios.precio_distribuidor,
+        precio_publico_con_iva=precios.precio_publico_con_iva,
+        precio_mayorista_con_iva=precios.precio_mayorista_con_iva,
+        precio_distribuidor_con_iva=precios.precio_distribuidor_con_iva,
+        is_active=variant.is_active,
+        created_at=variant.created_at,
+        updated_at=variant.updated_at
+    )
+
+
+def create_variant(db: Session, product_id: int, variant_data: ProductVariantCreate, user: User) -> ProductVariantResponse:
+    """Add a package size to a product without copying its recipe"""
+    product = _get_product(db, product_id, user)
+
+    variant = ProductVariant(
+        product_id=product.id,
+        user_id=user.id,
+        nombre=variant_data.nombre.strip() if variant_data.nombre else None,
+        peso_empaque=variant_data.peso_empaque,
+        costo_extra=variant_data.costo_extra or 0
+    )
+    db.add(variant)
+    precios = _price_variant(product, product.pricing_snapshot(), variant)
+    db.commit()
+    db.refresh(variant)
+
+    return _build_variant_response(variant, precios)
+
+
+def get_product_family(db: Session, product_id: int, user: User) -> ProductFamilyResponse:
+    """List every package size of a product, evaluating the shared recipe once"""
+    product = _get_product(db, product_id, user)
+    variants = db.query(ProductVariant).filter(
+        ProductVariant.product_id == product.id,
+        ProductVariant.user_id == user.id,
+        ProductVariant.is_active == True
+    ).order_by(ProductVariant.peso_empaque, ProductVariant.id).all()
+
+    base = product.pricing_snapshot()
+    variantes: List[ProductVariantResponse] = [
+        _build_variant_response(variant, _price_variant(product, base, variant))
+        for variant in variants
+    ]
+
+    return ProductFamilyResponse(
+        product_id=product.id,
+        nombre=product.nombre,
+        costo_materiales=base.costo_materiales,
+        costo_por_gramo=base.costo_por_gramo,
+        variantes=variantes,
+        total_variantes=len(variantes)
+    )
+
+
+def update_variant(
+    db: Session, product_id: int, variant_id: int, variant_update: ProductVariantUpdate, user: User
+) -> ProductVariantResponse:
+    product = _get_product(db, product_id, user)
+    variant = _get_variant(db, product.id, variant_id, user)
+
+    if variant_update.nombre is not None:
+        variant.nombre = variant_update.nombre.strip() or None
+    if variant_update.peso_empaque is not None:
+        variant.peso_empaque = variant_update.peso_empaque
+    if variant_update.costo_extra is not None:
+        variant.costo_extra = variant_update.costo_extra
+
+    precios = _price_variant(product, product.pricing_snapshot(), variant)
+    db.commit()
+    db.refresh(variant)
+
+    return _build_variant_response(variant, precios)
+
+
+def delete_variant(db: Session, product_id: int, variant_id: int, user: User) -> bool:
+    """Soft delete a package size"""
+    variant = _get_variant(db, product_id, variant_id, user)
+    variant.is_active = False
+    db.commit()
+    return True
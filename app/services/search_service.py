@@ -0,0 +1,262 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, case, func, literal, null, or_, select, union_all
+from sqlalchemy.orm import Session
+
+from ..models.inventory import Inventory
+from ..models.material import Material
+from ..models.product import Product
+from ..models.user import User
+from ..schemas.search import SearchResult
+from ..utils.conditional import collection_version
+
+SEARCH_TYPES = ("producto", "material", "lote")
+
+# Rank of a match; lower is better
+RANK_EXACT, RANK_PREFIX, RANK_WORD, RANK_SUBSTRING = 0, 1, 2, 3
+
+# Seconds an in-memory index is served before its collection version is checked again
+INDEX_REVALIDATE_SECONDS = 5.0
+INDEX_MAX_USERS = 64
+
+_LIKE_ESCAPE = "/"
+
+
+class _Entry(NamedTuple):
+    tipo: str
+    id: int
+    nombre: str
+    detalle: Optional[str]
+    key: str  # Lower-cased nombre
+    tokens: Tuple[str, ...]
+
+
+def _tokens(text: str) -> Tuple[str, ...]:
+    return tuple(text.lower().split())
+
+
+def parse_search_types(tipos: Optional[str]) -> Tuple[str, ...]:
+    """Requested result types (comma separated), every type when omitted"""
+    if not tipos:
+        return SEARCH_TYPES
+    requested = [tipo.strip() for tipo in tipos.split(",") if tipo.strip()]
+    invalid = [tipo for tipo in requested if tipo not in SEARCH_TYPES]
+    if invalid:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid tipos: {', '.join(invalid)}. Valid options: {', '.join(SEARCH_TYPES)}"
+        )
+    return tuple(tipo for tipo in SEARCH_TYPES if tipo in requested)
+
+
+def _order_key(result: SearchResult) -> tuple:
+    return (result.rank, result.nombre.lower(), SEARCH_TYPES.index(result.tipo), result.id)
+
+
+class PrefixIndex:
+    """
+    Sorted arrays over one result type: whole lower-cased names, and every
+    word after the first. Name prefixes are a bisection plus at most `limit`
+    entries; word prefixes scan the range of the most selective term.
+    """
+
+    def __init__(self, entries: Iterable[_Entry]):
+        self.entries = sorted(entries, key=lambda entry: (entry.key, entry.id))
+        self._names = [entry.key for entry in self.entries]
+        words = sorted(
+            (token, position)
+            for position, entry in enumerate(self.entries)
+            for token in set(entry.tokens[1:])
+        )
+        self._words = [token for token, _ in words]
+        self._word_positions = [position for _, position in words]
+
+    @staticmethod
+    def _range(keys: List[str], prefix: str) -> Tuple[int, int]:
+        return bisect_left(keys, prefix), bisect_left(keys, prefix + "\U0010ffff")
+
+    def search(self, query: str, limit: int) -> List[SearchResult]:
+        text = " ".join(_tokens(query))
+        terms = _tokens(query)
+        results: List[SearchResult] = []
+        seen = set()
+
+        # Names starting with the query; an exact name sorts first in its range
+        start, end = self._range(self._names, text)
+        for position in range(start, min(end, start + limit)):
+            entry = self.entries[position]
+            seen.add(position)
+            results.append(self._result(entry, RANK_EXACT if entry.key == text else RANK_PREFIX))
+
+        if len(results) >= limit:
+            return results
+
+        # Names where every term starts a word, scanned from the most selective term
+        term_ranges = []
+        for term in terms:
+            first = self._range(self._names, term)
+            later = self._range(self._words, term)
+            term_ranges.append((first[1] - first[0] + later[1] - later[0], term, first, later))
+        _, driver, first, later = min(term_ranges)
+        others = [term for term in terms if term != driver]
+
+        candidates = list(range(*first)) + [self._word_positions[i] for i in range(*later)]
+        candidates.sort()
+        for position in candidates:
+            if position in seen:
+                continue
+            seen.add(position)
+            entry = self.entries[position]
+            if all(any(token.startswith(term) for token in entry.tokens) for term in others):
+                results.append(self._result(entry, RANK_WORD))
+                if len(results) >= limit:
+                    break
+        return results
+
+    @staticmethod
+    def _result(entry: _Entry, rank: int) -> SearchResult:
+        return SearchResult(tipo=entry.tipo, id=entry.id, nombre=entry.nombre, detalle=entry.detalle, rank=rank)
+
+
+def _search_sources(user: User) -> list:
+    return [
+        (Product, Product.user_id == user.id),
+        (Material, Material.user_id == user.id),
+        (Inventory, Inventory.user_id == user.id),
+    ]
+
+
+def _type_rows(tipo: str, user: User):
+    """(id, nombre, detalle) of the searchable rows of one type"""
+    if tipo == "producto":
+        return select(Product.id, Product.nombre, null().label("detalle")).where(
+            Product.user_id == user.id, Product.is_active == True
+        )
+    if tipo == "material":
+        return select(Material.id, Material.nombre, Material.unidad_base.label("detalle")).where(
+            Material.user_id == user.id, Material.is_active == True
+        )
+    return select(Inventory.id, Inventory.lote.label("nombre"), Product.nombre.label("detalle")).join(
+        Product, Inventory.product_id == Product.id
+    ).where(Inventory.user_id == user.id, Inventory.is_active == True, Inventory.lote.isnot(None))
+
+
+class _CachedIndex(NamedTuple):
+    state: str
+    checked_at: float
+    indexes: Dict[str, PrefixIndex]
+
+
+_index_cache: "OrderedDict[int, _CachedIndex]" = OrderedDict()
+_index_lock = threading.Lock()
+
+
+def _user_indexes(db: Session, user: User) -> Dict[str, PrefixIndex]:
+    """
+    The user's prefix indexes, rebuilt when their products, materials or
+    lots change. The collection version is checked at most once every
+    INDEX_REVALIDATE_SECONDS, so typing bursts are answered from memory.
+    """
+    now = time.monotonic()
+    with _index_lock:
+        cached = _index_cache.get(user.id)
+        if cached is not None:
+            _index_cache.move_to_end(user.id)
+            if now - cached.checked_at < INDEX_REVALIDATE_SECONDS:
+                return cached.indexes
+
+    state = collection_version(db, f"search:{user.id}", _search_sources(user)).state
+    if cached is not None and cached.state == state:
+        indexes = cached.indexes
+    else:
+        indexes = {}
+        for tipo in SEARCH_TYPES:
+            rows = db.execute(_type_rows(tipo, user)).all()
+            indexes[tipo] = PrefixIndex(
+                _Entry(tipo, row.id, row.nombre, row.detalle, row.nombre.lower(), _tokens(row.nombre))
+                for row in rows if row.nombre
+            )
+
+    with _index_lock:
+        _index_cache[user.id] = _CachedIndex(state, now, indexes)
+        _index_cache.move_to_end(user.id)
+        while len(_index_cache) > INDEX_MAX_USERS:
+            _index_cache.popitem(last=False)
+    return indexes
+
+
+def clear_search_indexes() -> None:
+    with _index_lock:
+        _index_cache.clear()
+
+
+def _escape_like(text: str) -> str:
+    for special in (_LIKE_ESCAPE, "%", "_"):
+        text = text.replace(special, _LIKE_ESCAPE + special)
+    return text
+
+
+def search_statement(user: User, query: str, tipos: Sequence[str], limit: int):
+    """
+    One UNION ALL statement over the requested types. Every term must occur
+    in the name, which the pg_trgm GIN indexes on lower(nombre) and
+    lower(lote) answer; prefixes use the text_pattern_ops indexes.
+    """
+    text = " ".join(_tokens(query))
+    escaped = _escape_like(text)
+    selects = []
+    for tipo in tipos:
+        rows = _type_rows(tipo, user).subquery()
+        key = func.lower(rows.c.nombre)
+        rank = case(
+            (key == text, RANK_EXACT),
+            (key.like(f"{escaped}%", escape=_LIKE_ESCAPE), RANK_PREFIX),
+            (and_(*[
+                or_(key.like(f"{_escape_like(term)}%", escape=_LIKE_ESCAPE),
+                    key.like(f"% {_escape_like(term)}%", escape=_LIKE_ESCAPE))
+                for term in _tokens(query)
+            ]), RANK_WORD),
+            else_=RANK_SUBSTRING
+        )
+        selects.append(
+            select(literal(tipo).label("tipo"), rows.c.id, rows.c.nombre, rows.c.detalle, rank.label("rank"))
+            .where(*[key.like(f"%{_escape_like(term)}%", escape=_LIKE_ESCAPE) for term in _tokens(query)])
+            .order_by(rank, key, rows.c.id)
+            .limit(limit)
+            .subquery()
+            .select()
+        )
+
+    return union_all(*selects)
+
+
+def _search_sql(db: Session, user: User, query: str, tipos: Sequence[str], limit: int) -> List[SearchResult]:
+    rows = db.execute(search_statement(user, query, tipos, limit)).all()
+    results = [SearchResult(tipo=row.tipo, id=row.id, nombre=row.nombre, detalle=row.detalle, rank=row.rank)
+               for row in rows]
+    return sorted(results, key=_order_key)[:limit]
+
+
+def search(db: Session, user: User, query: str, tipos: Sequence[str] = SEARCH_TYPES,
+           limit: int = 10) -> List[SearchResult]:
+    """
+    Ranked autocomplete over product names, material names and lot codes:
+    exact names, then names starting with the query, then names where every
+    query word starts a word. PostgreSQL also returns substring matches
+    last; other databases are answered from a per-user in-memory index.
+    """
+    if not _tokens(query):
+        return []
+    if db.get_bind().dialect.name == "postgresql":
+        return _search_sql(db, user, query, tipos, limit)
+
+    indexes = _user_indexes(db, user)
+    results = []
+    for tipo in tipos:
+        results.extend(indexes[tipo].search(query, limit))
+    return sorted(results, key=_order_key)[:limit]
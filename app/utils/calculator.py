@@ -1,6 +1,9 @@
 from decimal import Decimal
+from typing import Optional
 
-def calcular_precio_unidad_pequena(precio_base: Decimal, unidad_base: str) -> Decimal:
-    # Assuming precio_base is per kg or litros, small unit is gram or ml
-    # 1 kg = 1000 grams, 1 litro = 1000 ml
-    return precio_base / Decimal('1000')
\ No newline at end of file
+from .unit_converter import factor_a_gramos
+
+def calcular_precio_unidad_pequena(precio_base: Decimal, unidad_base: str, densidad: Optional[Decimal] = None) -> Decimal:
+    # precio_base is per kg or litro; the small unit is the gram.
+    # Litres are converted to grams through the material density (1 g/ml by default).
+    return precio_base / factor_a_gramos(unidad_base, densidad)
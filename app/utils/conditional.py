@@ -0,0 +1,103 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, NamedTuple, Optional, Sequence, Tuple
+
+from fastapi import Request, Response, status
+from sqlalchemy import func, literal, select, union_all
+from sqlalchemy.orm import Session
+
+# (model, SQL condition selecting the rows of the collection)
+CollectionSource = Tuple[Any, Any]
+
+
+class CollectionVersion(NamedTuple):
+    """Validator of a whole collection: a digest of its aggregates and its latest change"""
+    state: str
+    last_modified: Optional[datetime]
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Naive timestamps are written in UTC (utcnow or the database clock)
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def collection_version(db: Session, scope: str, sources: Sequence[CollectionSource]) -> CollectionVersion:
+    """
+    Count, highest id, latest created/updated timestamp and version sum of
+    every source table, in a single aggregate query. Inserts, deletes and
+    updates all change at least one of them.
+    """
+    aggregates = []
+    for index, (model, condition) in enumerate(sources):
+        version = func.coalesce(func.sum(model.version), 0) if hasattr(model, "version") else literal(0)
+        aggregates.append(select(
+            literal(index).label("source"),
+            func.count(model.id).label("rows"),
+            func.max(model.id).label("last_id"),
+            func.max(func.coalesce(model.updated_at, model.created_at)).label("changed_at"),
+            version.label("version")
+        ).where(condition))
+
+    rows = sorted(db.execute(union_all(*aggregates)).all(), key=lambda row: row.source)
+
+    digest = hashlib.sha1(scope.encode())
+    last_modified = None
+    for row in rows:
+        digest.update(repr((row.source, row.rows, row.last_id, str(row.changed_at), row.version)).encode())
+        changed_at = row.changed_at
+        if isinstance(changed_at, str):
+            changed_at = datetime.fromisoformat(changed_at)
+        changed_at = _as_utc(changed_at)
+        if changed_at is not None and (last_modified is None or changed_at > last_modified):
+            last_modified = changed_at
+    return CollectionVersion(digest.hexdigest(), last_modified)
+
+
+def entity_tag(request: Request, version: CollectionVersion) -> str:
+    """Weak ETag of the representation: the collection state plus the path and query that shape it"""
+    digest = hashlib.sha1(version.state.encode())
+    digest.update(request.url.path.encode())
+    digest.update(str(sorted(request.query_params.multi_items())).encode())
+    return f'W/"{digest.hexdigest()[:32]}"'
+
+
+def validator_headers(request: Request, version: CollectionVersion) -> dict:
+    headers = {"ETag": entity_tag(request, version), "Cache-Control": "private, no-cache"}
+    if version.last_modified is not None:
+        headers["Last-Modified"] = format_datetime(version.last_modified, usegmt=True)
+    return headers
+
+
+def not_modified(request: Request, version: CollectionVersion) -> Optional[Response]:
+    """
+    A 304 response when the client's If-None-Match or If-Modified-Since
+    still matches the collection, else None. If-None-Match takes precedence.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        etag = entity_tag(request, version)
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        matches = "*" in tags or etag.removeprefix("W/") in tags
+    else:
+        matches = False
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since and version.last_modified is not None:
+            try:
+                since = _as_utc(parsedate_to_datetime(if_modified_since))
+            except (TypeError, ValueError):
+                since = None
+            # HTTP dates have one-second resolution
+            matches = since is not None and version.last_modified.replace(microsecond=0) <= since
+
+    if not matches:
+        return None
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validator_headers(request, version))
+
+
+def set_validator_headers(response: Response, request: Request, version: CollectionVersion) -> None:
+    response.headers.update(validator_headers(request, version))
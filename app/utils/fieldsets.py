@@ -0,0 +1,68 @@
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple, Type
+
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, create_model
+
+from .pagination import Page, set_page_headers
+
+# Fields always returned so clients can address the item
+REQUIRED_FIELDS = ("id",)
+
+
+def parse_fieldset(
+    model: Type[BaseModel],
+    fields: Optional[str],
+    view: Optional[str],
+    views: Dict[str, Optional[Tuple[str, ...]]]
+) -> Optional[FrozenSet[str]]:
+    """
+    Response fields requested through `fields` (comma separated) or a named
+    `view`, or None for the full representation. `fields` wins over `view`.
+    """
+    if fields:
+        requested = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = [name for name in requested if name not in model.model_fields]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {', '.join(unknown)}. Valid options: {', '.join(model.model_fields)}"
+            )
+        return frozenset(requested).union(REQUIRED_FIELDS)
+
+    if view is None:
+        return None
+    if view not in views:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid view: {view}. Valid options: {', '.join(views)}"
+        )
+    preset = views[view]
+    return None if preset is None else frozenset(preset).union(REQUIRED_FIELDS)
+
+
+@lru_cache(maxsize=128)
+def partial_model(model: Type[BaseModel], fields: FrozenSet[str]) -> Type[BaseModel]:
+    """`model` restricted to `fields`, with the same types and serialization"""
+    return create_model(
+        f"{model.__name__}Fields",
+        **{name: (info.annotation, info) for name, info in model.model_fields.items() if name in fields}
+    )
+
+
+def build_partial(model: Type[BaseModel], fields: FrozenSet[str], values: dict) -> BaseModel:
+    """Validate only the requested fields out of `values`"""
+    return partial_model(model, fields).model_validate({name: values[name] for name in fields})
+
+
+def sparse_response(items: Iterable[BaseModel]) -> JSONResponse:
+    """
+    Serialize partial items directly; they bypass the route's full
+    response_model, which would reject the missing fields.
+    """
+    content: List[dict] = [item.model_dump(mode="json") for item in items]
+    response = JSONResponse(content=content)
+    if isinstance(items, Page):
+        set_page_headers(response, items)
+    return response
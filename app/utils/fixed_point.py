@@ -0,0 +1,57 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+# Pricing works on integers scaled to micro-units (1e-6), the same precision
+# as Material.precio_unidad_pequena. Every reported amount is the exact value
+# rounded once, half away from zero, to micro-units.
+MICRO = 1000000
+_MICRO_DECIMAL = Decimal(MICRO)
+_MICRO_STEP = Decimal('0.000001')
+
+# Prices, quantities and margins repeat heavily across a catalog, so
+# conversions are memoized; the cache is simply dropped when it grows too big.
+_MICRO_CACHE_LIMIT = 8192
+_micro_cache = {}
+
+
+def _convert(value) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, int):
+        return value * MICRO
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return int((value * _MICRO_DECIMAL).to_integral_value(ROUND_HALF_UP))
+
+
+def to_micro(value) -> int:
+    """Convert an amount to integer micro-units"""
+    units = _micro_cache.get(value)
+    if units is None:
+        units = _convert(value)
+        if len(_micro_cache) >= _MICRO_CACHE_LIMIT:
+            _micro_cache.clear()
+        _micro_cache[value] = units
+    return units
+
+
+def to_micro_squared(value) -> int:
+    """Convert an amount to integer units of MICRO^2, the scale of a recipe cost (quantity x price)"""
+    if value is None:
+        return 0
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return int((value * _MICRO_DECIMAL * _MICRO_DECIMAL).to_integral_value(ROUND_HALF_UP))
+
+
+def from_micro(units: int) -> Decimal:
+    """Convert integer micro-units back to a Decimal with six decimals"""
+    return Decimal(units) * _MICRO_STEP
+
+
+def round_div(numerator: int, denominator: int) -> int:
+    """Divide two integers rounding half away from zero"""
+    if denominator < 0:
+        numerator, denominator = -numerator, -denominator
+    if numerator >= 0:
+        return (2 * numerator + denominator) // (2 * denominator)
+    return -((-2 * numerator + denominator) // (2 * denominator))
@@ -0,0 +1,172 @@
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, List, Optional
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import DateTime, and_, func, or_
+from sqlalchemy.orm import Query, Session
+
+# Values of `total`: None skips counting, 'exact' runs COUNT(*), 'estimated' uses
+# the planner row estimate where the database offers one (PostgreSQL)
+TOTAL_MODES = ("exact", "estimated")
+
+
+class Page(list):
+    """
+    One page of a list endpoint. Behaves as the plain list of items and also
+    carries the opaque cursor of the next page and the optional total.
+    """
+
+    def __init__(self, items=(), next_cursor: Optional[str] = None,
+                 total: Optional[int] = None, total_estimated: bool = False):
+        super().__init__(items)
+        self.next_cursor = next_cursor
+        self.total = total
+        self.total_estimated = total_estimated
+
+    def map(self, function) -> "Page":
+        """Same page with every item transformed, e.g. entities into responses"""
+        return Page(
+            [function(item) for item in self], next_cursor=self.next_cursor,
+            total=self.total, total_estimated=self.total_estimated
+        )
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return {"d": str(value)}
+    if isinstance(value, datetime):
+        return {"t": value.isoformat()}
+    if isinstance(value, date):
+        return {"dt": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "d" in value:
+            return Decimal(value["d"])
+        if "t" in value:
+            return datetime.fromisoformat(value["t"])
+        if "dt" in value:
+            return date.fromisoformat(value["dt"])
+    return value
+
+
+def encode_cursor(key: str, sort_value: Any, last_id: int) -> str:
+    payload = json.dumps([key, _encode_value(sort_value), last_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, key: str):
+    """(sort value, id) of the last row of the previous page; the cursor must come from the same ordering"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_key, sort_value, last_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if cursor_key != key or not isinstance(last_id, int):
+            raise ValueError(cursor_key)
+        return _decode_value(sort_value), last_id
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor for this listing and sort order"
+        )
+
+
+def count_rows(db: Session, query: Query, mode: Optional[str]):
+    """(total, estimated) of a filtered query, or (None, False) when mode is None"""
+    if mode is None:
+        return None, False
+    if mode not in TOTAL_MODES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid total: {mode}. Valid options: {', '.join(TOTAL_MODES)}"
+        )
+
+    query = query.order_by(None)
+    bind = db.get_bind()
+    if mode == "estimated" and bind.dialect.name == "postgresql":
+        compiled = query.statement.compile(dialect=bind.dialect)
+        plan = db.connection().exec_driver_sql(
+            "EXPLAIN (FORMAT JSON) " + str(compiled), compiled.params
+        ).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"]), True
+    return query.count(), False
+
+
+def _comparable(db: Session, expression):
+    """
+    SQLite keeps DateTime as text: server defaults store 'YYYY-MM-DD HH:MM:SS' while
+    bound datetimes carry microseconds, so both forms go through the same strftime
+    before being compared or ordered. Other databases compare the values as they are.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        return func.strftime("%Y-%m-%d %H:%M:%f", expression)
+    return expression
+
+
+def keyset_page(
+    db: Session,
+    query: Query,
+    key: str,
+    sort_column,
+    id_column,
+    descending: bool = False,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    skip: int = 0,
+    total: Optional[str] = None
+) -> Page:
+    """
+    Page `query` ordered by (sort_column, id_column) with a keyset condition
+    instead of OFFSET, so every page costs the same as the first one.
+    `key` names the ordering and is embedded in the cursor. `skip` is kept
+    for offset-based callers and ignored when a cursor is given.
+    Items are the query's entities; sort keys must not be NULL.
+    """
+    count, estimated = count_rows(db, query, total)
+    is_datetime = isinstance(sort_column.type, DateTime)
+    sort_key = _comparable(db, sort_column) if is_datetime else sort_column
+
+    if cursor:
+        sort_value, last_id = decode_cursor(cursor, key)
+        if is_datetime:
+            sort_value = _comparable(db, sort_value)
+        if descending:
+            after = or_(sort_key < sort_value, and_(sort_key == sort_value, id_column < last_id))
+        else:
+            after = or_(sort_key > sort_value, and_(sort_key == sort_value, id_column > last_id))
+        query = query.filter(after)
+
+    if descending:
+        query = query.order_by(sort_key.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_key.asc(), id_column.asc())
+    if skip and not cursor:
+        query = query.offset(skip)
+
+    rows = query.add_columns(
+        sort_column.label("_keyset_sort"), id_column.label("_keyset_id")
+    ).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(key, rows[-1]._keyset_sort, rows[-1]._keyset_id)
+
+    items: List[Any] = [row[0] for row in rows]
+    return Page(items, next_cursor=next_cursor, total=count, total_estimated=estimated)
+
+
+def set_page_headers(response: Response, page: Page) -> None:
+    """Expose the pagination metadata of a Page as response headers"""
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    if page.total is not None:
+        response.headers["X-Total-Count"] = str(page.total)
+        if page.total_estimated:
+            response.headers["X-Total-Count-Estimated"] = "true"
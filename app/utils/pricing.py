@@ -0,0 +1,225 @@
+from decimal import Decimal
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from .fixed_point import MICRO, from_micro, round_div, to_micro
+
+DEFAULT_IVA_PERCENTAGE = Decimal('21.0')
+
+_CIEN = 100 * MICRO  # 100% in micro-units
+_IVA_DEFAULT = to_micro(DEFAULT_IVA_PERCENTAGE)
+
+
+class PricingSnapshot(NamedTuple):
+    """Every derived cost and price of a product, computed in a single pass"""
+    costo_materiales: Decimal
+    costo_por_gramo: Decimal
+    costo_adicionales: Decimal
+    costo_paquete: Decimal
+    precio_publico: Decimal
+    precio_mayorista: Decimal
+    precio_distribuidor: Decimal
+    iva_publico: Decimal
+    iva_mayorista: Decimal
+    iva_distribuidor: Decimal
+    precio_publico_con_iva: Decimal
+    precio_mayorista_con_iva: Decimal
+    precio_distribuidor_con_iva: Decimal
+    # Unrounded cost per gram as (numerator, denominator) in micro-units, for derived grids
+    costo_por_gramo_exacto: Tuple[int, int] = (0, 1)
+
+    def precios_por_empaque(self) -> dict:
+        """Package prices in the shape returned by Product.calcular_precios_por_empaque"""
+        return {
+            'costo_paquete': self.costo_paquete,
+            'precio_publico_paquete': self.precio_publico,
+            'precio_mayorista_paquete': self.precio_mayorista,
+            'precio_distribuidor_paquete': self.precio_distribuidor,
+            'precio_publico_con_iva_paquete': self.precio_publico_con_iva,
+            'precio_mayorista_con_iva_paquete': self.precio_mayorista_con_iva,
+            'precio_distribuidor_con_iva_paquete': self.precio_distribuidor_con_iva
+        }
+
+
+class PricingCacheStats:
+    """Hit/miss counters for the per-product pricing snapshot cache"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def reset(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+
+pricing_stats = PricingCacheStats()
+
+
+def _precio_con_margen(num: int, den: int, margen: int) -> Tuple[int, int]:
+    # cost / (1 - margin / 100), kept as an exact fraction
+    divisor = _CIEN - margen
+    if divisor <= 0:
+        return 0, 1
+    return num * _CIEN, den * divisor
+
+
+class RecipeCycleError(ValueError):
+    """A product ends up, directly or indirectly, as an ingredient of itself"""
+
+
+def costo_por_gramo_exacto(costo_receta: int, peso_receta: int, peso_final_producido=None) -> Tuple[int, int]:
+    """
+    Adjusted cost per gram as an exact (numerator, denominator) fraction in
+    micro-units, based on final production weight and falling back to the
+    weight of the recipe.
+    """
+    peso_base = to_micro(peso_final_producido)
+    if peso_base <= 0:
+        peso_base = peso_receta
+    if peso_base > 0:
+        return costo_receta, peso_base
+    return 0, 1
+
+
+def costo_componente(costo_por_gramo: Tuple[int, int], cantidad: int) -> int:
+    """Cost of a quantity (in micro-units) of an intermediate product, scaled like costo_receta"""
+    num, den = costo_por_gramo
+    # Rounded to 1e-12, far below the micro-unit precision of reported amounts
+    return round_div(num * cantidad, den)
+
+
+def calcular_costo_componente(base: PricingSnapshot, cantidad) -> Decimal:
+    """Cost of a quantity of an intermediate product priced by `base`, in micro-units"""
+    return from_micro(round_div(costo_componente(base.costo_por_gramo_exacto, to_micro(cantidad)), MICRO))
+
+
+def calcular_snapshot(
+    costo_receta: int,
+    peso_receta: int,
+    costo_adicionales: Decimal,
+    margen_publico,
+    margen_mayorista,
+    margen_distribuidor,
+    iva_percentage=None,
+    peso_final_producido: Optional[Decimal] = None,
+    peso_empaque: Optional[Decimal] = None
+) -> PricingSnapshot:
+    """
+    Build a PricingSnapshot from the aggregated recipe of a product.
+
+    costo_receta is the sum of precio_unidad_pequena * cantidad over active
+    materials (plus the cost of intermediate products) scaled by MICRO**2;
+    peso_receta is the sum of cantidad in micro-units.
+    """
+    adicionales = to_micro(costo_adicionales)
+    cpg_num, cpg_den = costo_por_gramo_exacto(costo_receta, peso_receta, peso_final_producido)
+
+    return _snapshot_empaque(
+        from_micro(round_div(costo_receta, MICRO)), cpg_num, cpg_den, adicionales, to_micro(peso_empaque),
+        margen_publico, margen_mayorista, margen_distribuidor, iva_percentage
+    )
+
+
+def calcular_variante(
+    base: PricingSnapshot,
+    peso_empaque: Decimal,
+    costo_extra: Optional[Decimal],
+    margen_publico,
+    margen_mayorista,
+    margen_distribuidor,
+    iva_percentage=None
+) -> PricingSnapshot:
+    """
+    Price a package-size variant from the snapshot of its product without
+    re-evaluating the recipe: reuses the exact cost per gram and adds the
+    variant's extra cost to the product's additional costs.
+    """
+    cpg_num, cpg_den = base.costo_por_gramo_exacto
+    adicionales = to_micro(base.costo_adicionales) + to_micro(costo_extra)
+    return _snapshot_empaque(
+        base.costo_materiales, cpg_num, cpg_den, adicionales, to_micro(peso_empaque),
+        margen_publico, margen_mayorista, margen_distribuidor, iva_percentage
+    )
+
+
+def _snapshot_empaque(
+    costo_materiales: Decimal,
+    cpg_num: int,
+    cpg_den: int,
+    adicionales: int,
+    empaque: int,
+    margen_publico,
+    margen_mayorista,
+    margen_distribuidor,
+    iva_percentage
+) -> PricingSnapshot:
+    # Package cost as an exact fraction scaled by MICRO**2
+    if empaque:
+        paquete_num, paquete_den = cpg_num * empaque + adicionales * MICRO * cpg_den, cpg_den
+    else:
+        # Fallback: assume 1 unit package with additional costs
+        paquete_num, paquete_den = adicionales * MICRO, 1
+
+    iva = to_micro(iva_percentage) or _IVA_DEFAULT
+    precios = []
+    ivas = []
+    con_iva = []
+    for margen in (margen_publico, margen_mayorista, margen_distribuidor):
+        num, den = _precio_con_margen(paquete_num, paquete_den, to_micro(margen))
+        # num/den is scaled by MICRO**2; one more MICRO in the denominator yields micro-units
+        den *= MICRO
+        num_iva = num * iva
+        den_iva = den * _CIEN
+        precios.append(from_micro(round_div(num, den)))
+        ivas.append(from_micro(round_div(num_iva, den_iva)))
+        con_iva.append(from_micro(round_div(num * _CIEN + num_iva, den_iva)))
+
+    return PricingSnapshot(
+        costo_materiales,
+        from_micro(round_div(cpg_num, cpg_den)),
+        from_micro(adicionales),
+        from_micro(round_div(paquete_num, paquete_den * MICRO)),
+        *precios, *ivas, *con_iva,
+        (cpg_num, cpg_den)
+    )
+
+
+def calcular_matriz_precios(
+    snapshot: PricingSnapshot,
+    pesos_empaque: Sequence[Decimal],
+    margenes: Sequence[Decimal],
+    iva_percentages: Sequence[Decimal]
+) -> dict:
+    """
+    Evaluate package costs and prices over a package weight x margin x IVA grid
+    from the exact cost per gram of a snapshot. Uses the same formulas and
+    rounding as calcular_snapshot.
+    """
+    cpg_num, cpg_den = snapshot.costo_por_gramo_exacto
+    adicionales = to_micro(snapshot.costo_adicionales)
+    margenes = [to_micro(margen) for margen in margenes]
+    ivas = [to_micro(iva) for iva in iva_percentages]
+
+    costos_paquete: List[Decimal] = []
+    precios: List[List[Decimal]] = []
+    precios_con_iva: List[List[List[Decimal]]] = []
+    for peso in pesos_empaque:
+        paquete_num = cpg_num * to_micro(peso) + adicionales * MICRO * cpg_den
+        costos_paquete.append(from_micro(round_div(paquete_num, cpg_den * MICRO)))
+
+        fila = []
+        fila_con_iva = []
+        for margen in margenes:
+            num, den = _precio_con_margen(paquete_num, cpg_den, margen)
+            fila.append(from_micro(round_div(num, den * MICRO)))
+            fila_con_iva.append([
+                from_micro(round_div(num * (_CIEN + iva), den * MICRO * _CIEN)) for iva in ivas
+            ])
+        precios.append(fila)
+        precios_con_iva.append(fila_con_iva)
+
+    return {
+        'costos_paquete': costos_paquete,
+        'precios': precios,
+        'precios_con_iva': precios_con_iva
+    }
@@ -1,20 +1,67 @@
 from decimal import Decimal
+from functools import lru_cache
+from typing import Dict, NamedTuple, Optional, Tuple
 
-# Conversion factors to grams
-UNIT_CONVERSIONS = {
-    'g': 1,
-    'kg': 1000,
-    'l': 1000,  # assuming 1L ≈ 1000g for liquids
-    'ml': 1,
-    'galon': 3785,  # 1 gallon ≈ 3785g
-    'caneca_20l': 20000  # 20L caneca
+
+class UnknownUnitError(ValueError):
+    """Raised for a unit that is neither standard nor defined for the material"""
+
+
+class Unidad(NamedTuple):
+    cantidad: Decimal  # Grams (mass units) or millilitres (volume units) in one unit
+    volumen: bool
+
+
+# Standard units. Volume units become grams through the material density (g/ml);
+# without a density a millilitre weighs one gram, as for water.
+UNIDADES: Dict[str, Unidad] = {
+    'g': Unidad(Decimal('1'), False),
+    'kg': Unidad(Decimal('1000'), False),
+    'ml': Unidad(Decimal('1'), True),
+    'l': Unidad(Decimal('1000'), True),
+    'litro': Unidad(Decimal('1000'), True),
+    'litros': Unidad(Decimal('1000'), True),
+    'galon': Unidad(Decimal('3785.411784'), True),  # US gallon
+    'caneca_20l': Unidad(Decimal('20000'), True),
 }
 
-def convert_to_grams(quantity: float, unit: str) -> float:
+DENSIDAD_AGUA = Decimal('1')
+
+
+def es_unidad_estandar(unidad: str) -> bool:
+    return unidad in UNIDADES
+
+
+@lru_cache(maxsize=4096)
+def _factor(unidad: str, densidad: Decimal, definicion: Optional[Tuple[Decimal, str]]) -> Decimal:
+    if definicion is not None:
+        cantidad, unidad_estandar = definicion
+        return cantidad * _factor(unidad_estandar, densidad, None)
+    try:
+        cantidad, volumen = UNIDADES[unidad]
+    except KeyError:
+        raise UnknownUnitError(f"Unknown unit '{unidad}'")
+    return cantidad * densidad if volumen else cantidad
+
+
+def factor_a_gramos(
+    unidad: str,
+    densidad: Optional[Decimal] = None,
+    definicion: Optional[Tuple[Decimal, str]] = None
+) -> Decimal:
+    """
+    Exact grams in one `unidad`. `definicion` is a material-specific unit given
+    as (cantidad, standard unit), e.g. (20, 'l') for a 20 litre drum.
+    Factors are cached per (unit, density, definition).
+    """
+    return _factor(unidad, densidad or DENSIDAD_AGUA, definicion)
+
+
+def convert_to_grams(quantity, unit: str, densidad: Optional[Decimal] = None) -> Decimal:
     """Convert quantity in specified unit to grams"""
-    return quantity * UNIT_CONVERSIONS.get(unit, 1)
+    return Decimal(str(quantity)) * factor_a_gramos(unit, densidad)
+
 
-def calculate_cost_for_quantity(cost_per_gram: Decimal, quantity: float, unit: str) -> Decimal:
+def calculate_cost_for_quantity(cost_per_gram: Decimal, quantity, unit: str, densidad: Optional[Decimal] = None) -> Decimal:
     """Calculate cost for specific quantity and unit"""
-    grams = convert_to_grams(quantity, unit)
-    return cost_per_gram * Decimal(str(grams))
\ No newline at end of file
+    return cost_per_gram * convert_to_grams(quantity, unit, densidad)
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Write the cost snapshot of every active product that has none yet.
+
+Deploy runs it once after `alembic upgrade head`; it is idempotent, so running
+it again only prices products that are still missing a snapshot.
+
+Usage: python backfill_cost_snapshots.py [--batch-size 500]
+"""
+import argparse
+import sys
+
+sys.path.append('.')
+
+from app.database import SessionLocal
+from app.services.cost_snapshot_service import backfill_product_cost_snapshots
+import app.main  # noqa: F401  (registers every model)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill missing product cost snapshots')
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        written = backfill_product_cost_snapshots(db, args.batch_size)
+
+    print(f'Wrote {written} cost snapshots')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
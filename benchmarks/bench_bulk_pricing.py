@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Compare the bulk pricing engine against the per-object ORM pricing path.
+
+Usage: DATABASE_URL=sqlite:// python benchmarks/bench_bulk_pricing.py [products] [lines_per_product]
+"""
+import sys
+import time
+from decimal import Decimal
+
+sys.path.append('.')
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, joinedload
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models.user import User
+from app.models.material import Material
+from app.models.product import Product, ProductMaterial
+from app.services.product_service import get_products, _build_product_response
+import app.main  # noqa: F401  (registers every model)
+
+
+def seed(db, products: int, lines: int) -> User:
+    user = User(username='bench', email='bench@example.com', hashed_password='x')
+    db.add(user)
+    db.flush()
+
+    materials = [
+        Material(user_id=user.id, nombre=f'Material {i}', precio_base=Decimal('2.50') + i,
+                 precio_unidad_pequena=(Decimal('2.50') + i) / 1000)
+        for i in range(200)
+    ]
+    db.add_all(materials)
+    db.flush()
+
+    for i in range(products):
+        product = Product(
+            user_id=user.id, nombre=f'Producto {i}', iva_percentage=Decimal('12'),
+            margen_publico=Decimal('45'), margen_mayorista=Decimal('30'), margen_distribuidor=Decimal('15'),
+            costo_transporte=Decimal('0.35'), peso_final_producido=Decimal('950'), peso_empaque=Decimal('250')
+        )
+        for j in range(lines):
+            material = materials[(i * 7 + j * 13) % len(materials)]
+            product.product_materials.append(ProductMaterial(material_id=material.id, cantidad=Decimal(50 + j)))
+        db.add(product)
+    db.commit()
+    return user
+
+
+def per_object_path(db, user):
+    products = db.query(Product).options(
+        joinedload(Product.product_materials).joinedload(ProductMaterial.material)
+    ).filter(Product.user_id == user.id, Product.is_active == True).all()
+    return [_build_product_response(product) for product in products]
+
+
+def bulk_path(db, user, limit):
+    return get_products(db, user, 0, limit)
+
+
+def timed(label, fn, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f'{label:<14} {best * 1000:10.1f} ms')
+    return best
+
+
+def main():
+    products = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    lines = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+    engine = create_engine('sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    with Session() as db:
+        user = seed(db, products, lines)
+        user_id = user.id
+
+    print(f'{products} products x {lines} recipe lines')
+
+    def run(path):
+        def go():
+            # Fresh session per run so neither path benefits from the identity map
+            with Session() as db:
+                path(db, db.get(User, user_id))
+        return go
+
+    slow = timed('per-object', run(per_object_path))
+    fast = timed('bulk engine', run(lambda db, user: bulk_path(db, user, products)))
+    print(f'speedup        {slow / fast:10.2f}x')
+
+
+if __name__ == '__main__':
+    main()
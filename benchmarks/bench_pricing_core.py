@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Compare the fixed-point pricing core against the legacy float/Decimal accessors
+and the single-pass Decimal snapshot it replaces.
+
+Usage: DATABASE_URL=sqlite:// python benchmarks/bench_pricing_core.py [iterations]
+"""
+import sys
+import time
+from decimal import Decimal
+
+sys.path.append('.')
+
+from app.utils.fixed_point import to_micro
+from app.utils.pricing import calcular_snapshot
+
+# (precio_unidad_pequena, cantidad) of a typical recipe
+RECIPE = [
+    (Decimal('0.003450'), Decimal('600')),
+    (Decimal('0.002100'), Decimal('400')),
+    (Decimal('0.004567'), Decimal('123.45')),
+    (Decimal('0.000890'), Decimal('876.55')),
+    (Decimal('0.007777'), Decimal('12.34')),
+    (Decimal('0.001111'), Decimal('666.67')),
+]
+ADICIONALES = Decimal('0.75')
+MARGENES = (Decimal('42.5'), Decimal('31.75'), Decimal('22.2'))
+IVA = Decimal('21')
+PESO_FINAL = Decimal('2500')
+PESO_EMPAQUE = Decimal('333')
+
+
+class LegacyProduct:
+    """The float/Decimal accessors of Product before the pricing snapshot, as read by a product response"""
+
+    def __init__(self, iva_percentage=None):
+        self.iva_percentage = iva_percentage
+        self.margen_publico, self.margen_mayorista, self.margen_distribuidor = MARGENES
+        self.peso_final_producido = PESO_FINAL
+        self.peso_empaque = PESO_EMPAQUE
+
+    def calcular_costo_total(self):
+        return sum((precio * cantidad for precio, cantidad in RECIPE), Decimal('0'))
+
+    def calcular_costo_por_gramo_ajustado(self):
+        costo_total = self.calcular_costo_total()
+        if self.peso_final_producido and self.peso_final_producido > 0:
+            return costo_total / self.peso_final_producido
+        peso = sum(cantidad for _, cantidad in RECIPE)
+        return costo_total / peso if peso > 0 else Decimal('0')
+
+    def calcular_precios_por_empaque(self):
+        costo_base_paquete = self.calcular_costo_por_gramo_ajustado() * self.peso_empaque + ADICIONALES
+        precio_publico = costo_base_paquete / (1 - self.margen_publico / 100) if self.margen_publico < 100 else Decimal('0')
+        precio_mayorista = costo_base_paquete / (1 - self.margen_mayorista / 100) if self.margen_mayorista < 100 else Decimal('0')
+        precio_distribuidor = costo_base_paquete / (1 - self.margen_distribuidor / 100) if self.margen_distribuidor < 100 else Decimal('0')
+        iva_factor = Decimal((self.iva_percentage or 21.0) / 100)
+        return {
+            'costo_paquete': costo_base_paquete,
+            'precio_publico_paquete': precio_publico,
+            'precio_mayorista_paquete': precio_mayorista,
+            'precio_distribuidor_paquete': precio_distribuidor,
+            'precio_publico_con_iva_paquete': precio_publico + precio_publico * iva_factor,
+            'precio_mayorista_con_iva_paquete': precio_mayorista + precio_mayorista * iva_factor,
+            'precio_distribuidor_con_iva_paquete': precio_distribuidor + precio_distribuidor * iva_factor
+        }
+
+    def precio(self, tier):
+        return self.calcular_precios_por_empaque()[f'precio_{tier}_paquete']
+
+    def iva(self, tier):
+        return self.precio(tier) * Decimal((self.iva_percentage or 21.0) / 100)
+
+
+def legacy_accessors():
+    product = LegacyProduct()
+    values = [product.calcular_costo_total(), product.calcular_precios_por_empaque()]
+    for tier in ('publico', 'mayorista', 'distribuidor'):
+        values += [product.precio(tier), product.iva(tier), product.precio(tier) + product.iva(tier)]
+    return values
+
+
+def decimal_snapshot():
+    """Single Decimal pass, as the memoized snapshot computed it before the fixed-point core"""
+    costo = sum((precio * cantidad for precio, cantidad in RECIPE), Decimal('0'))
+    peso = sum((cantidad for _, cantidad in RECIPE), Decimal('0'))
+    costo_por_gramo = costo / PESO_FINAL if PESO_FINAL > 0 else costo / peso
+    costo_paquete = costo_por_gramo * PESO_EMPAQUE + ADICIONALES
+    iva = IVA / 100
+    precios = []
+    for margen in MARGENES:
+        precio = costo_paquete / (1 - margen / 100) if margen < 100 else Decimal('0')
+        precios.append((precio, precio * iva, precio + precio * iva))
+    return precios
+
+
+def fixed_point():
+    costo = 0
+    peso = 0
+    for precio, cantidad in RECIPE:
+        cantidad = to_micro(cantidad)
+        costo += to_micro(precio) * cantidad
+        peso += cantidad
+    return calcular_snapshot(costo, peso, ADICIONALES, *MARGENES, iva_percentage=IVA,
+                             peso_final_producido=PESO_FINAL, peso_empaque=PESO_EMPAQUE)
+
+
+def timed(label, fn, iterations):
+    best = None
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f'{label:<14} {best / iterations * 1e6:8.2f} us/product')
+    return best
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(f'{len(RECIPE)} recipe lines, {iterations} iterations')
+    legacy = timed('legacy', legacy_accessors, iterations)
+    timed('decimal', decimal_snapshot, iterations)
+    fixed = timed('fixed-point', fixed_point, iterations)
+    print(f'speedup        {legacy / fixed:8.2f}x vs legacy accessors')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Latency percentiles of catalog autocomplete over the in-memory prefix index.
+
+Usage: DATABASE_URL=sqlite:// python benchmarks/bench_search.py [rows] [queries]
+"""
+import random
+import sys
+import time
+from datetime import datetime
+from decimal import Decimal
+
+sys.path.append('.')
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models.user import User
+from app.models.material import Material
+from app.models.product import Product
+from app.models.inventory import Inventory
+from app.services.search_service import search
+import app.main  # noqa: F401  (registers every model)
+
+WORDS = ['jabon', 'coco', 'aceite', 'lavanda', 'glicerina', 'avena', 'miel', 'menta', 'rosa', 'carbon',
+         'arcilla', 'limon', 'naranja', 'karite', 'cacao', 'sabila', 'te', 'verde', 'negro', 'blanco']
+
+
+def _name(rng, i):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).capitalize() + f' {i}'
+
+
+def seed(db, rows: int) -> User:
+    """`rows` products, a tenth as many materials and one lot per product"""
+    rng = random.Random(7)
+    user = User(username='bench', email='bench@example.com', hashed_password='x')
+    db.add(user)
+    db.flush()
+    db.execute(insert(Material), [
+        {'user_id': user.id, 'nombre': _name(rng, i), 'precio_base': Decimal('2.50'),
+         'precio_unidad_pequena': Decimal('0.0025'), 'is_active': True}
+        for i in range(rows // 10)
+    ])
+    db.execute(insert(Product), [
+        {'user_id': user.id, 'nombre': _name(rng, i), 'margen_publico': 45, 'margen_mayorista': 30,
+         'margen_distribuidor': 15, 'costo_transporte': 0, 'is_active': True}
+        for i in range(rows)
+    ])
+    db.execute(insert(Inventory), [
+        {'user_id': user.id, 'product_id': i + 1, 'lote': f'L{2026000 + i}', 'fecha_produccion': datetime(2026, 1, 1),
+         'cantidad_producida': 1, 'costo_unitario': 1, 'costo_total': 1, 'stock_actual': 1, 'is_active': True}
+        for i in range(rows)
+    ])
+    db.commit()
+    return user
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+    engine = create_engine('sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    with Session() as db:
+        user = seed(db, rows)
+
+        start = time.perf_counter()
+        search(db, user, 'warm up')
+        print(f'{rows} products, materials and lots; index build {(time.perf_counter() - start) * 1000:.1f} ms')
+
+        # Keystroke prefixes of one to three words
+        rng = random.Random(11)
+        queries = []
+        for _ in range(count):
+            words = [rng.choice(WORDS) for _ in range(rng.randint(1, 3))]
+            words[-1] = words[-1][:rng.randint(1, len(words[-1]))]
+            queries.append(' '.join(words))
+        queries += [f'L20260{rng.randint(0, 99)}' for _ in range(count // 10)]
+
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            search(db, user, query)
+            timings.append(time.perf_counter() - start)
+
+    timings.sort()
+    for label, quantile in (('p50', 0.50), ('p95', 0.95), ('p99', 0.99), ('max', 1.0)):
+        value = timings[min(len(timings) - 1, int(quantile * len(timings)))]
+        print(f'{label:<6} {value * 1000:8.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
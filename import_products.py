@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Bulk import products and recipes from a CSV or NDJSON file.
+
+Usage: python import_products.py catalog.csv --user <username> [--format csv|ndjson] [--chunk-size 500]
+"""
+import argparse
+import sys
+
+sys.path.append('.')
+
+from app.database import SessionLocal
+from app.models.user import User
+from app.services.product_import_service import DEFAULT_CHUNK_SIZE, IMPORT_READERS, detect_format, import_products
+import app.main  # noqa: F401  (registers every model)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk import products and recipes')
+    parser.add_argument('path')
+    parser.add_argument('--user', required=True, help='username that will own the products')
+    parser.add_argument('--format', choices=sorted(IMPORT_READERS), default=None)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    try:
+        format = detect_format(args.path, args.format)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    with SessionLocal() as db:
+        user = db.query(User).filter(User.username == args.user).first()
+        if not user:
+            parser.error(f'User {args.user!r} not found')
+
+        with open(args.path, encoding='utf-8-sig', newline='') as stream:
+            result = import_products(db, user, IMPORT_READERS[format](stream), args.chunk_size)
+
+    print(f'Created {result.created} products, {result.failed} rows failed')
+    for error in result.errors:
+        print(f'  line {error.line} ({error.nombre or "-"}): {error.error}')
+    return 1 if result.failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
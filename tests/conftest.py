@@ -7,6 +7,8 @@ from fastapi.testclient import TestClient
 
 # Set test database URL before any imports
 os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+# Tests share one in-memory connection; audit events are written inline on commit
+os.environ["AUDIT_WRITE_BEHIND"] = "false"
 
 # Import all models to ensure they're registered with Base.metadata
 from app.models.base import BaseEntity
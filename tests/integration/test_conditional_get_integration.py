@@ -0,0 +1,96 @@
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import event, update
+
+from app.models.material import Material
+from app.models.product import Product, ProductMaterial
+from app.models.user import User
+
+
+def _catalog(session):
+    user = User(username="etag", email="etag@example.com", hashed_password="x")
+    session.add(user)
+    session.flush()
+    material = Material(user_id=user.id, nombre="Aceite", precio_base=Decimal("6"),
+                        precio_unidad_pequena=Decimal("0.006"))
+    session.add(material)
+    session.flush()
+    for i in range(3):
+        product = Product(user_id=user.id, nombre=f"Jabon {i}", margen_publico=Decimal("40"),
+                          margen_mayorista=Decimal("30"), margen_distribuidor=Decimal("20"),
+                          costo_transporte=Decimal("0.5"))
+        product.product_materials.append(ProductMaterial(material_id=material.id, cantidad=Decimal("100")))
+        session.add(product)
+    session.commit()
+    return material
+
+
+def test_product_list_revalidates_with_etag(client, session):
+    material = _catalog(session)
+
+    first = client.get("/api/products/")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert "Last-Modified" in first.headers
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(session.get_bind(), "before_cursor_execute", record)
+    try:
+        cached = client.get("/api/products/", headers={"If-None-Match": etag})
+    finally:
+        event.remove(session.get_bind(), "before_cursor_execute", record)
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag and cached.content == b""
+    # The user lookup and the aggregate; no product is loaded or priced
+    assert len(statements) == 2
+
+    # Another page or projection is another representation
+    assert client.get("/api/products/?limit=1").headers["ETag"] != etag
+
+    # A material price change invalidates the product list
+    material.precio_unidad_pequena = Decimal("0.007")
+    material.version = 2
+    session.commit()
+    changed = client.get("/api/products/", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_material_list_honours_if_modified_since(client, session):
+    _catalog(session)
+
+    first = client.get("/api/materials/")
+    assert first.status_code == 200
+    last_modified = first.headers["Last-Modified"]
+
+    assert client.get("/api/materials/", headers={"If-Modified-Since": last_modified}).status_code == 304
+    past = "Thu, 01 Jan 2015 00:00:00 GMT"
+    assert client.get("/api/materials/", headers={"If-Modified-Since": past}).status_code == 200
+    # If-None-Match wins over If-Modified-Since
+    stale = client.get("/api/materials/", headers={"If-None-Match": 'W/"stale"', "If-Modified-Since": last_modified})
+    assert stale.status_code == 200
+
+
+def test_deleted_recipe_line_invalidates_if_modified_since(client, session):
+    material = _catalog(session)
+    # Everything was last written well before the request, so a change is a later second
+    before = datetime(2026, 1, 1)
+    for model in (Product, ProductMaterial, Material):
+        session.execute(update(model).values(created_at=before, updated_at=before))
+    session.commit()
+
+    first = client.get("/api/products/")
+    last_modified = first.headers["Last-Modified"]
+    assert client.get("/api/products/", headers={"If-Modified-Since": last_modified}).status_code == 304
+
+    product = session.query(Product).first()
+    assert client.delete(f"/api/products/{product.id}/materials/{material.id}").status_code == 200
+
+    changed = client.get("/api/products/", headers={"If-Modified-Since": last_modified})
+    assert changed.status_code == 200
+    assert changed.headers["Last-Modified"] != last_modified
@@ -0,0 +1,31 @@
+from decimal import Decimal
+
+
+def _auth_headers(client):
+    client.post("/auth/register", json={"username": "priceuser", "email": "priceuser@example.com", "password": "pricepass"})
+    login_response = client.post("/auth/login", json={"username": "priceuser", "password": "pricepass"})
+    return {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+
+
+def test_price_list_upload_reports_product_deltas(client, session):
+    headers = _auth_headers(client)
+    material = client.post("/api/materials/", json={"nombre": "Glicerina", "precio_base": "4.00", "unidad_base": "kg"},
+                           headers=headers).json()
+    product = client.post("/api/products/", json={
+        "nombre": "Jabon glicerina", "margen_publico": 40, "margen_mayorista": 30, "margen_distribuidor": 20,
+        "costo_transporte": "0.5", "peso_empaque": 100, "product_materials": [{"material_id": material["id"], "cantidad": 500}]
+    }, headers=headers).json()
+
+    response = client.post(
+        "/api/materials/price-list",
+        files={"file": ("proveedor.csv", b"material,precio_base\nGlicerina,5.00\nCera,3.00\n", "text/csv")},
+        headers=headers
+    )
+
+    assert response.status_code == 200
+    result = response.json()
+    assert result["updated"] == 1 and result["failed"] == 1
+    assert [item["product_id"] for item in result["productos"]] == [product["id"]]
+    # A 100 g package at 0.001 more per gram
+    assert Decimal(result["productos"][0]["delta_costo_paquete"]) == Decimal("0.1")
+    assert Decimal(client.get(f"/api/materials/{material['id']}", headers=headers).json()["precio_base"]) == Decimal("5")
@@ -1,5 +1,6 @@
 import pytest
 from decimal import Decimal
+from sqlalchemy import event
 from app.schemas.material import MaterialCreate, MaterialUpdate, CantidadQuery
 
 
@@ -210,6 +211,111 @@ def test_calculate_costs(client, session):
     costs = response.json()
     assert costs["material"]["id"] == material_id
     assert costs["costos"]["1000"] == "10.000000"
+
+def test_cost_matrix(client, session):
+    client.post("/auth/register", json={"username": "matrixuser", "email": "matrix@example.com", "password": "matrixpass"})
+    login_response = client.post("/auth/login", json={"username": "matrixuser", "password": "matrixpass"})
+    headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+
+    aceite = client.post("/api/materials/", json={
+        "nombre": "Aceite", "precio_base": "9.20", "unidad_base": "litros", "densidad": "0.92"
+    }, headers=headers).json()
+    soda = client.post("/api/materials/", json={"nombre": "Soda", "precio_base": "2.00"}, headers=headers).json()
+    client.post(f"/api/materials/{aceite['id']}/units", json={"nombre": "caneca", "cantidad": "20", "unidad": "l"}, headers=headers)
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(session.get_bind(), "before_cursor_execute", record)
+    try:
+        response = client.post("/api/materials/cost-matrix", json={
+            "material_ids": [soda["id"], 99999, aceite["id"]], "cantidades": [1, "0.5", 2], "unidad": "kg"
+        }, headers=headers)
+    finally:
+        event.remove(session.get_bind(), "before_cursor_execute", record)
+    assert response.status_code == 200
+    assert len([statement for statement in statements if "FROM materials" in statement]) == 1
+
+    matrix = response.json()
+    assert matrix["material_ids"] == [soda["id"], aceite["id"]]
+    assert matrix["nombres"] == ["Soda", "Aceite"]
+    assert matrix["no_encontrados"] == [99999]
+    assert [[Decimal(costo) for costo in fila] for fila in matrix["costos"]] == [
+        [Decimal("2"), Decimal("1"), Decimal("4")],
+        [Decimal("10"), Decimal("5"), Decimal("20")],
+    ]
+    # Same values as the per-material endpoint
+    costos = client.post(f"/api/materials/{aceite['id']}/costos", json={"cantidades": [2], "unidad": "kg"}, headers=headers).json()
+    assert Decimal(costos["costos"]["2"]) == Decimal(matrix["costos"][1][2])
+
+    # Material-specific units are resolved per material
+    response = client.post("/api/materials/cost-matrix", json={
+        "material_ids": [aceite["id"]], "cantidades": [2], "unidad": "caneca"
+    }, headers=headers)
+    assert Decimal(response.json()["costos"][0][0]) == Decimal("368")
+    response = client.post("/api/materials/cost-matrix", json={
+        "material_ids": [aceite["id"], soda["id"]], "cantidades": [2], "unidad": "caneca"
+    }, headers=headers)
+    assert response.status_code == 400
+def test_material_units_and_density(client, session):
+    client.post("/auth/register", json={"username": "unituser", "email": "unit@example.com", "password": "unitpass"})
+    login_response = client.post("/auth/login", json={"username": "unituser", "password": "unitpass"})
+    headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+
+    material_data = {
+        "nombre": "Aceite",
+        "precio_base": "9.20",
+        "unidad_base": "litros",
+        "densidad": "0.92"
+    }
+    material = client.post("/api/materials/", json=material_data, headers=headers).json()
+    assert material["precio_unidad_pequena"] == "0.010000"
+
+    response = client.post(
+        f"/api/materials/{material['id']}/units",
+        json={"nombre": "caneca", "cantidad": "20", "unidad": "l"},
+        headers=headers
+    )
+    assert response.status_code == 200
+    assert Decimal(response.json()["gramos"]) == Decimal("18400")
+
+    response = client.post(
+        f"/api/materials/{material['id']}/costos",
+        json={"cantidades": [1, 2], "unidad": "caneca"},
+        headers=headers
+    )
+    assert response.status_code == 200
+    assert Decimal(response.json()["costos"]["2"]) == Decimal("368")
+
+    response = client.post(
+        f"/api/materials/{material['id']}/costos",
+        json={"cantidades": [1], "unidad": "barril"},
+        headers=headers
+    )
+    assert response.status_code == 400
+
+
+def test_update_material_clears_density(client, session):
+    client.post("/auth/register", json={"username": "densuser", "email": "dens@example.com", "password": "denspass"})
+    login_response = client.post("/auth/login", json={"username": "densuser", "password": "denspass"})
+    headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+    material = client.post("/api/materials/", json={
+        "nombre": "Alcohol", "precio_base": "9.20", "unidad_base": "litros", "densidad": "0.92"
+    }, headers=headers).json()
+    assert material["precio_unidad_pequena"] == "0.010000"
+
+    # Omitting densidad keeps it
+    response = client.put(f"/api/materials/{material['id']}", json={"nombre": "Alcohol 96"}, headers=headers)
+    assert Decimal(response.json()["densidad"]) == Decimal("0.92")
+
+    # An explicit null clears it and re-prices with the density of water
+    response = client.put(f"/api/materials/{material['id']}", json={"densidad": None}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["densidad"] is None
+    assert Decimal(response.json()["precio_unidad_pequena"]) == Decimal("0.0092")
+
 def test_delete_material_used_in_product(client, session):
     # Register, login, create material and product, test deletion rules
     user_data = {
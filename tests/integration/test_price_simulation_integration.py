@@ -0,0 +1,62 @@
+import pytest
+from decimal import Decimal
+
+
+@pytest.fixture
+def headers(client):
+    client.post("/auth/register", json={"username": "simuser", "email": "sim@example.com", "password": "simpass"})
+    token = client.post("/auth/login", json={"username": "simuser", "password": "simpass"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _create_product(client, headers, nombre, materials):
+    product_data = {
+        "nombre": nombre,
+        "iva_percentage": 12.0,
+        "margen_publico": 50,
+        "margen_mayorista": 25,
+        "margen_distribuidor": 20,
+        "costo_transporte": "1.00",
+        "peso_empaque": 100,
+        "product_materials": [{"material_id": m, "cantidad": c} for m, c in materials]
+    }
+    response = client.post("/api/products/", json=product_data, headers=headers)
+    assert response.status_code == 201
+    return response.json()
+
+
+def test_price_simulation_returns_deltas_without_persisting(client, headers):
+    glicerina = client.post("/api/materials/", json={"nombre": "Glicerina", "precio_base": "4.00", "unidad_base": "kg"}, headers=headers).json()
+    soda = client.post("/api/materials/", json={"nombre": "Soda", "precio_base": "2.00", "unidad_base": "kg"}, headers=headers).json()
+    jabon = _create_product(client, headers, "Jabon", [(glicerina["id"], "500"), (soda["id"], "500")])
+    _create_product(client, headers, "Vela", [(soda["id"], "1000")])
+
+    response = client.post(
+        "/api/materials/price-simulation",
+        json={"cambios": [{"material_id": glicerina["id"], "precio_base": "6.00"}], "margen_minimo": "45"},
+        headers=headers
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total_productos"] == 1
+    delta = data["productos"][0]
+    assert delta["product_id"] == jabon["id"]
+    # cost per gram goes from 0.003 to 0.004 -> package cost 1.3 -> 1.4
+    assert Decimal(delta["costo_paquete_actual"]) == Decimal("1.3")
+    assert Decimal(delta["costo_paquete_simulado"]) == Decimal("1.4")
+    assert Decimal(delta["delta_precio_publico"]) == Decimal("0.2")
+    assert delta["bajo_margen_minimo"] is True
+
+    # Nothing was written
+    material = client.get(f"/api/materials/{glicerina['id']}", headers=headers).json()
+    assert material["precio_base"] == "4.00"
+
+
+def test_price_simulation_unknown_material(client, headers):
+    response = client.post(
+        "/api/materials/price-simulation",
+        json={"cambios": [{"material_id": 999, "precio_base": "6.00"}]},
+        headers=headers
+    )
+    assert response.status_code == 404
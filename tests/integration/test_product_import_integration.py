@@ -0,0 +1,41 @@
+from decimal import Decimal
+
+
+def _auth_headers(client):
+    client.post("/auth/register", json={"username": "importuser", "email": "importuser@example.com", "password": "importpass"})
+    login_response = client.post("/auth/login", json={"username": "importuser", "password": "importpass"})
+    return {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+
+
+def test_import_products_from_csv_upload(client, session):
+    headers = _auth_headers(client)
+    client.post("/api/materials/", json={"nombre": "Glicerina", "precio_base": "4.00", "unidad_base": "kg"}, headers=headers)
+
+    csv_file = (
+        "nombre,margen_publico,margen_mayorista,margen_distribuidor,costo_transporte,material,cantidad\n"
+        "Jabon glicerina,40,30,20,0.5,Glicerina,500\n"
+        "Jabon roto,40,30,20,0.5,Cera,500\n"
+    )
+    response = client.post(
+        "/api/products/import",
+        files={"file": ("catalogo.csv", csv_file.encode(), "text/csv")},
+        headers=headers
+    )
+
+    assert response.status_code == 200
+    result = response.json()
+    assert result["created"] == 1 and result["failed"] == 1
+    assert result["errors"][0]["line"] == 3
+
+    product = client.get(f"/api/products/{result['product_ids'][0]}").json()
+    assert Decimal(product["costo_total"]) == Decimal("2")
+
+
+def test_import_rejects_unknown_format(client, session):
+    headers = _auth_headers(client)
+    response = client.post(
+        "/api/products/import",
+        files={"file": ("catalogo.xlsx", b"...", "application/octet-stream")},
+        headers=headers
+    )
+    assert response.status_code == 400
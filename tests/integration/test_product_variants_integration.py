@@ -0,0 +1,77 @@
+import pytest
+from decimal import Decimal
+
+from app.utils.pricing import pricing_stats
+
+
+@pytest.fixture
+def headers(client):
+    client.post("/auth/register", json={"username": "varuser", "email": "var@example.com", "password": "varpass"})
+    token = client.post("/auth/login", json={"username": "varuser", "password": "varpass"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def product(client, headers):
+    material = client.post("/api/materials/", json={"nombre": "Cera", "precio_base": "5.00", "unidad_base": "kg"}, headers=headers).json()
+    product_data = {
+        "nombre": "Crema",
+        "iva_percentage": 12.0,
+        "margen_publico": 50,
+        "margen_mayorista": 25,
+        "margen_distribuidor": 20,
+        "costo_transporte": "1.00",
+        "peso_final_producido": 1000,
+        "peso_empaque": 250,
+        "product_materials": [{"material_id": material["id"], "cantidad": "1000"}]
+    }
+    response = client.post("/api/products/", json=product_data, headers=headers)
+    assert response.status_code == 201
+    return response.json()
+
+
+def test_variants_share_the_product_recipe(client, headers, product):
+    same_size = client.post(f"/api/products/{product['id']}/variants", json={"peso_empaque": "250"}, headers=headers)
+    assert same_size.status_code == 201
+    assert Decimal(same_size.json()["precio_publico"]) == Decimal(str(product["precio_publico"]))
+
+    galon = client.post(
+        f"/api/products/{product['id']}/variants",
+        json={"nombre": "Galon", "peso_empaque": "1000", "costo_extra": "0.50"},
+        headers=headers
+    ).json()
+    # 1000g * 0.005 + 1.00 transport + 0.50 extra
+    assert Decimal(galon["costo_paquete"]) == Decimal("6.5")
+    assert Decimal(galon["precio_publico"]) == Decimal("13")
+
+    pricing_stats.reset()
+    family = client.get(f"/api/products/{product['id']}/variants", headers=headers).json()
+
+    assert pricing_stats.misses == 1
+    assert family["total_variantes"] == 2
+    assert [v["nombre"] for v in family["variantes"]] == [None, "Galon"]
+    assert Decimal(family["costo_por_gramo"]) == Decimal("0.005")
+
+
+def test_update_and_delete_variant(client, headers, product):
+    variant = client.post(f"/api/products/{product['id']}/variants", json={"peso_empaque": "500"}, headers=headers).json()
+
+    response = client.put(
+        f"/api/products/{product['id']}/variants/{variant['id']}",
+        json={"costo_extra": "1.00"},
+        headers=headers
+    )
+    assert response.status_code == 200
+    # 500g * 0.005 + 1.00 transport + 1.00 extra
+    assert Decimal(response.json()["costo_paquete"]) == Decimal("4.5")
+
+    assert client.delete(f"/api/products/{product['id']}/variants/{variant['id']}", headers=headers).status_code == 200
+    assert client.get(f"/api/products/{product['id']}/variants", headers=headers).json()["total_variantes"] == 0
+    assert client.put(
+        f"/api/products/{product['id']}/variants/{variant['id']}", json={"nombre": "x"}, headers=headers
+    ).status_code == 404
+
+
+def test_variant_requires_positive_weight(client, headers, product):
+    response = client.post(f"/api/products/{product['id']}/variants", json={"peso_empaque": "0"}, headers=headers)
+    assert response.status_code == 422
@@ -0,0 +1,87 @@
+import pytest
+from datetime import date, datetime
+from fastapi import HTTPException
+from sqlalchemy import insert, text
+
+from app.models.audit_log import AuditLog, AuditLogArchive
+from app.models.user import Role, User
+from app.services.audit_service import apply_audit_retention, get_audit_logs
+
+
+@pytest.fixture
+def history(session):
+    admin = User(username="admin", email="admin@example.com", hashed_password="x", role=Role.ADMIN)
+    ana = User(username="ana", email="ana@example.com", hashed_password="x")
+    luis = User(username="luis", email="luis@example.com", hashed_password="x")
+    session.add_all([admin, ana, luis])
+    session.flush()
+    rows = []
+    for month in range(1, 13):
+        for user, action in ((ana, "update_material"), (ana, "create_material"), (luis, "update_material")):
+            rows.append({"user_id": user.id, "material_id": month, "action": action,
+                         "description": f"{action} {month}", "created_at": datetime(2025, month, 15)})
+    session.execute(insert(AuditLog), rows)
+    session.commit()
+    for user in (admin, ana, luis):
+        session.refresh(user)
+    return admin, ana, luis
+
+
+def test_filters_and_keyset_walk(session, history):
+    admin, ana, luis = history
+
+    page = get_audit_logs(session, ana, action="update_material", desde=datetime(2025, 3, 1),
+                          hasta=datetime(2025, 7, 1), total="exact")
+    assert page.total == 4
+    assert [(log.user_id, log.created_at.month) for log in page] == [(ana.id, m) for m in (6, 5, 4, 3)]
+
+    seen, cursor = [], None
+    while True:
+        page = get_audit_logs(session, admin, cursor=cursor, limit=10)
+        seen.extend(log.id for log in page)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    assert len(seen) == len(set(seen)) == 36
+
+    assert [log.material_id for log in get_audit_logs(session, admin, user_id=luis.id, material_id=2)] == [2]
+
+
+def test_users_only_read_their_own_entries(session, history):
+    admin, ana, luis = history
+    assert {log.user_id for log in get_audit_logs(session, luis, limit=100)} == {luis.id}
+    with pytest.raises(HTTPException) as exc:
+        get_audit_logs(session, luis, user_id=ana.id)
+    assert exc.value.status_code == 403
+
+
+def test_queries_use_the_composite_indexes(session, history):
+    admin, ana, _ = history
+    plan = session.execute(text(
+        "EXPLAIN QUERY PLAN SELECT id FROM audit_logs WHERE user_id = :user_id AND action = :action "
+        "ORDER BY created_at DESC, id DESC LIMIT 20"
+    ), {"user_id": ana.id, "action": "update_material"}).all()
+    detail = " ".join(row[-1] for row in plan)
+    assert "ix_audit_logs_user_action_created" in detail and "TEMP B-TREE" not in detail
+
+
+def test_retention_archives_expired_entries(session, history):
+    result = apply_audit_retention(session, months=6, today=date(2025, 12, 20), batch_size=7)
+
+    assert result.corte == datetime(2025, 6, 1)
+    assert result.archivados == 15
+    assert session.query(AuditLogArchive).count() == 15
+    assert session.query(AuditLog).filter(AuditLog.created_at < datetime(2025, 6, 1)).count() == 0
+    assert session.query(AuditLog).count() == 21
+
+
+def test_endpoint_requires_admin_for_retention(client):
+    client.post("/auth/register", json={"username": "auditado", "email": "auditado@example.com", "password": "pass"})
+    token = client.post("/auth/login", json={"username": "auditado", "password": "pass"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    client.post("/api/materials/", json={"nombre": "Glicerina", "precio_base": "5.00"}, headers=headers)
+
+    response = client.get("/api/audit-logs/?action=create_material", headers=headers)
+    assert response.status_code == 200
+    assert [log["action"] for log in response.json()] == ["create_material"]
+    assert client.post("/api/audit-logs/retention", headers=headers).status_code == 403
@@ -0,0 +1,157 @@
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import create_engine, event, func, select
+
+from app.database import Base
+from app.models.audit_log import AuditLog
+from app.models.material import Material
+from app.models.user import User
+from app.schemas.material import MaterialCreate
+from app.services import audit_service
+from app.services.audit_service import AuditEvent, AuditWriter, record_audit
+from app.services.material_service import create_material
+
+
+def _user(session):
+    user = User(username="auditor", email="auditor@example.com", hashed_password="x")
+    session.add(user)
+    session.commit()
+    session.refresh(user)
+    return user
+
+
+def test_create_material_audits_the_real_id_without_fix_up(session):
+    user = _user(session)
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(session.get_bind(), "before_cursor_execute", record)
+    try:
+        material = create_material(session, MaterialCreate(nombre="Glicerina", precio_base=Decimal("4")), user)
+    finally:
+        event.remove(session.get_bind(), "before_cursor_execute", record)
+
+    logs = session.query(AuditLog).all()
+    assert [(log.material_id, log.action) for log in logs] == [(material.id, "create_material")]
+    assert not any(statement.startswith("UPDATE audit_logs") for statement in statements)
+
+
+def test_rolled_back_events_are_dropped(session):
+    user = _user(session)
+    material = Material(user_id=user.id, nombre="Soda", precio_base=Decimal("2"), precio_unidad_pequena=Decimal("0.002"))
+    session.add(material)
+    record_audit(session, user.id, "create_material", "Created material 'Soda'", material=material)
+    session.flush()
+    session.rollback()
+
+    session.commit()
+    assert session.query(AuditLog).count() == 0
+
+
+def test_writer_batches_queued_events(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'audit.db'}")
+    Base.metadata.create_all(bind=engine)
+    inserts = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT INTO audit_logs"):
+            inserts.append(len(parameters) if executemany else 1)
+
+    event.listen(engine, "before_cursor_execute", record)
+    writer = AuditWriter(maxsize=1000, batch_size=50, interval=0.05)
+    writer.start()
+    try:
+        writer.submit(engine, [AuditEvent(1, i, "update_material", f"Event {i}", datetime.utcnow()) for i in range(120)])
+        writer.flush()
+        assert sum(inserts) == 120 and len(inserts) < 120
+
+        # Events still queued at shutdown are written before stop returns
+        writer.submit(engine, [AuditEvent(1, None, "delete_material", "Last", datetime.utcnow())])
+    finally:
+        writer.stop()
+
+    with engine.connect() as connection:
+        assert connection.execute(select(func.count()).select_from(AuditLog)).scalar() == 121
+    assert not writer.running
+
+
+def _count(engine):
+    with engine.connect() as connection:
+        return connection.execute(select(func.count()).select_from(AuditLog)).scalar()
+
+
+def test_failed_write_is_retried(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'audit.db'}")
+    Base.metadata.create_all(bind=engine)
+    write_events = audit_service._write_events
+    attempts = []
+
+    def flaky(bind, events):
+        attempts.append(len(events))
+        if len(attempts) == 1:
+            raise OSError("connection reset")
+        write_events(bind, events)
+
+    monkeypatch.setattr(audit_service, "_write_events", flaky)
+    writer = AuditWriter(maxsize=100, batch_size=50, interval=0.05, retries=3, backoff=0,
+                         fallback_path=str(tmp_path / "fallback.ndjson"))
+    writer.start()
+    try:
+        writer.submit(engine, [AuditEvent(1, i, "update_material", f"Event {i}", datetime.utcnow()) for i in range(10)])
+        writer.flush()
+    finally:
+        writer.stop()
+
+    assert attempts[:2] == [10, 10]
+    assert _count(engine) == 10
+    assert not (tmp_path / "fallback.ndjson").exists()
+
+
+def test_exhausted_retries_go_to_the_fallback_file_and_are_replayed(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'audit.db'}")
+    Base.metadata.create_all(bind=engine)
+    write_events = audit_service._write_events
+    down = [True]
+
+    def outage(bind, events):
+        if down[0]:
+            raise OSError("database unavailable")
+        write_events(bind, events)
+
+    monkeypatch.setattr(audit_service, "_write_events", outage)
+    fallback = tmp_path / "fallback.ndjson"
+    writer = AuditWriter(maxsize=100, batch_size=50, interval=0.05, retries=2, backoff=0, fallback_path=str(fallback))
+
+    writer.submit(engine, [AuditEvent(1, i, "update_material", f"Event {i}", datetime.utcnow()) for i in range(3)])
+    assert len(fallback.read_text().splitlines()) == 3
+
+    # The next successful write also replays the saved events
+    down[0] = False
+    writer.submit(engine, [AuditEvent(1, None, "delete_material", "After the outage", datetime.utcnow())])
+    assert _count(engine) == 4
+    assert not fallback.exists()
+
+
+def test_inline_write_tries_once_and_does_not_wait(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'audit.db'}")
+    Base.metadata.create_all(bind=engine)
+    attempts = []
+
+    def outage(bind, events):
+        attempts.append(len(events))
+        raise OSError("database unavailable")
+
+    monkeypatch.setattr(audit_service, "_write_events", outage)
+    waits = []
+    monkeypatch.setattr(audit_service.time, "sleep", waits.append)
+    fallback = tmp_path / "audit" / "fallback.ndjson"
+    writer = AuditWriter(maxsize=100, batch_size=50, interval=0.05, retries=4, backoff=5, fallback_path=str(fallback))
+
+    # No worker: the request thread writes inline, once, then straight to the fallback file
+    writer.submit(engine, [AuditEvent(1, i, "update_material", f"Event {i}", datetime.utcnow()) for i in range(2)])
+
+    assert attempts == [2] and waits == []
+    assert len(fallback.read_text().splitlines()) == 2
@@ -0,0 +1,176 @@
+import pytest
+from decimal import Decimal
+from fastapi import HTTPException
+
+from app.models.material import Material
+from app.models.product import Product, ProductMaterial, ProductComponent
+from app.models.product_cost_snapshot import ProductCostSnapshot
+from app.models.user import User
+from app.schemas.material import MaterialUpdate
+from app.schemas.product import ProductComponentCreate
+from app.services.cost_snapshot_service import get_products_using_materials, refresh_product_cost_snapshots
+from app.services.material_service import update_material
+from app.services.pricing_engine import (
+    ComponentLine, downstream_products, load_component_graph, price_catalog, topological_order
+)
+from app.services.product_service import add_component_to_product, calculate_total_costs, get_products
+from app.utils.pricing import RecipeCycleError, pricing_stats
+
+
+def _product(session, user, nombre, materials=(), components=(), peso_final=None):
+    product = Product(
+        user_id=user.id, nombre=nombre, iva_percentage=Decimal("12"),
+        margen_publico=Decimal("50"), margen_mayorista=Decimal("25"), margen_distribuidor=Decimal("20"),
+        costo_transporte=Decimal("1"), peso_final_producido=peso_final, peso_empaque=Decimal("100")
+    )
+    for material, cantidad in materials:
+        product.product_materials.append(ProductMaterial(material_id=material.id, cantidad=Decimal(cantidad)))
+    for component, cantidad in components:
+        product.components.append(ProductComponent(component_product_id=component.id, cantidad=Decimal(cantidad)))
+    session.add(product)
+    session.flush()
+    return product
+
+
+@pytest.fixture
+def bom(session):
+    user = User(username="bom", email="bom@example.com", hashed_password="x")
+    session.add(user)
+    session.flush()
+
+    aceite = Material(user_id=user.id, nombre="Aceite", precio_base=Decimal("6"), precio_unidad_pequena=Decimal("0.006"))
+    soda = Material(user_id=user.id, nombre="Soda", precio_base=Decimal("2"), precio_unidad_pequena=Decimal("0.002"))
+    aroma = Material(user_id=user.id, nombre="Aroma", precio_base=Decimal("20"), precio_unidad_pequena=Decimal("0.02"))
+    session.add_all([aceite, soda, aroma])
+    session.flush()
+
+    # 800g oil + 200g soda -> 1000g of base at 0.0052/g
+    base = _product(session, user, "Base jabon", [(aceite, "800"), (soda, "200")], peso_final=Decimal("1000"))
+    lavanda = _product(session, user, "Jabon lavanda", [(aroma, "10")], [(base, "90")])
+    rosa = _product(session, user, "Jabon rosa", [(aroma, "5")], [(base, "95")])
+    vela = _product(session, user, "Vela", [(aceite, "100")])
+    session.commit()
+    return user, dict(aceite=aceite, soda=soda, aroma=aroma), dict(base=base, lavanda=lavanda, rosa=rosa, vela=vela)
+
+
+def test_intermediate_product_cost_rolls_up(session, bom):
+    user, materials, products = bom
+
+    # 10g * 0.02 + 90g * 0.0052
+    assert products["lavanda"].calcular_costo_total() == Decimal("0.668")
+    assert products["lavanda"].calcular_costo_por_gramo_ajustado() == Decimal("0.00668")
+    assert products["lavanda"].components[0].calcular_costo() == Decimal("0.468")
+
+
+def test_shared_base_is_evaluated_once(session, bom):
+    user, materials, products = bom
+    session.expire_all()
+    pricing_stats.reset()
+
+    for product in session.query(Product).filter(Product.id.in_([products["lavanda"].id, products["rosa"].id])):
+        product.precio_publico
+
+    # lavanda, rosa and the base they share
+    assert pricing_stats.misses == 3
+
+
+def test_engine_matches_orm_rollup(session, bom):
+    user, materials, products = bom
+    pricing = price_catalog(session, user, [products["lavanda"], products["rosa"]])
+
+    assert set(pricing.snapshots) == {products["base"].id, products["lavanda"].id, products["rosa"].id}
+    for key in ("base", "lavanda", "rosa"):
+        assert pricing.snapshots[products[key].id] == products[key].pricing_snapshot()
+
+    totals = {p.id: p.costo_total for p in calculate_total_costs(session, user).productos}
+    assert totals[products["rosa"].id] == products["rosa"].calcular_costo_total()
+
+
+def test_page_loads_only_its_own_recipe_dag(session, bom):
+    user, materials, products = bom
+    # Unrelated part of the catalog: another base and a product built on it
+    cera = Material(user_id=user.id, nombre="Cera", precio_base=Decimal("10"), precio_unidad_pequena=Decimal("0.01"))
+    session.add(cera)
+    session.flush()
+    base_vela = _product(session, user, "Base vela", [(cera, "1000")])
+    _product(session, user, "Vela aromatica", [(materials["aroma"], "5")], [(base_vela, "95")])
+    session.commit()
+
+    pricing = price_catalog(session, user, [products["lavanda"]])
+
+    assert set(pricing.materials) == {materials["aceite"].id, materials["soda"].id, materials["aroma"].id}
+    assert {line.product_id for lines in pricing.components.values() for line in lines} == {products["lavanda"].id}
+    assert set(pricing.snapshots) == {products["base"].id, products["lavanda"].id}
+    assert pricing.snapshots[products["lavanda"].id] == products["lavanda"].pricing_snapshot()
+
+    # A leaf page touches no component edge and only its own materials
+    pricing = price_catalog(session, user, [products["vela"]])
+    assert set(pricing.materials) == {materials["aceite"].id}
+    assert not any(pricing.components.values())
+
+    # Edges are followed through every level
+    regalo = _product(session, user, "Regalo", components=[(products["lavanda"], "100")])
+    session.commit()
+    reachable = load_component_graph(session, user, [regalo.id])
+    assert sorted(reachable) == sorted([regalo.id, products["lavanda"].id])
+    assert price_catalog(session, user, [regalo]).snapshots[regalo.id] == regalo.pricing_snapshot()
+
+
+def test_listing_filters_and_sorts_on_prices_that_include_components(session, bom):
+    user, materials, products = bom
+    refresh_product_cost_snapshots(session, user, [product.id for product in products.values()])
+    session.commit()
+    precios = {
+        product_id: snapshot.precio_publico_con_iva
+        for product_id, snapshot in price_catalog(session, user, list(products.values())).snapshots.items()
+    }
+    lavanda = products["lavanda"].id
+    # The raw-material SQL expression leaves the base out of the scented soap and misprices it
+    sin_base = session.query(Product.precio_publico_con_iva).filter(Product.id == lavanda).scalar()
+    assert abs(Decimal(str(sin_base)) - precios[lavanda]) > 1
+
+    listed = get_products(session, user, min_price=precios[lavanda], max_price=precios[lavanda])
+    assert [product.id for product in listed] == [lavanda]
+
+    ordered = get_products(session, user, sort_by="-precio")
+    assert [product.id for product in ordered] == sorted(precios, key=lambda product_id: (-precios[product_id], -product_id))
+    assert [product.precio_publico_con_iva for product in ordered] == sorted(precios.values(), reverse=True)
+
+    # Cursor pages follow the same order
+    first = get_products(session, user, sort_by="-precio", limit=2)
+    rest = get_products(session, user, sort_by="-precio", limit=10, cursor=first.next_cursor)
+    assert [product.id for product in first] + [product.id for product in rest] == [product.id for product in ordered]
+
+
+def test_cycles_are_rejected(session, bom):
+    user, materials, products = bom
+
+    graph = {1: [ComponentLine(1, 1, 2, Decimal("1"))], 2: [ComponentLine(2, 2, 1, Decimal("1"))]}
+    with pytest.raises(RecipeCycleError):
+        topological_order([1], graph)
+
+    with pytest.raises(HTTPException) as exc:
+        add_component_to_product(
+            session, products["base"].id,
+            ProductComponentCreate(component_product_id=products["lavanda"].id, cantidad=Decimal("10")), user
+        )
+    assert exc.value.status_code == 400
+
+
+def test_leaf_price_change_refreshes_only_downstream(session, bom):
+    user, materials, products = bom
+    refresh_product_cost_snapshots(session, user, [p.id for p in products.values()])
+    session.commit()
+
+    affected = downstream_products(
+        get_products_using_materials(session, user, [materials["soda"].id]), load_component_graph(session, user)
+    )
+    assert sorted(affected) == sorted([products["base"].id, products["lavanda"].id, products["rosa"].id])
+
+    update_material(session, materials["soda"].id, MaterialUpdate(precio_base=Decimal("4")), user)
+
+    snapshots = {s.product_id: s for s in session.query(ProductCostSnapshot).all()}
+    # Base now 0.0056/g; lavanda = 10g * 0.02 + 90g * 0.0056
+    assert snapshots[products["base"].id].costo_por_gramo == Decimal("0.0056")
+    assert snapshots[products["lavanda"].id].costo_materiales == Decimal("0.704")
+    assert snapshots[products["vela"].id].costo_materiales == Decimal("0.6")
@@ -1,7 +1,10 @@
 import pytest
 from decimal import Decimal
 
+from app.models.material import Material
+from app.models.material_unit import MaterialUnit
 from app.utils.calculator import calcular_precio_unidad_pequena
+from app.utils.unit_converter import UnknownUnitError, calculate_cost_for_quantity, factor_a_gramos
 
 
 def test_calcular_precio_unidad_pequena_happy_path():
@@ -19,4 +22,37 @@ def test_calcular_precio_unidad_pequena_zero():
 def test_calcular_precio_unidad_pequena_negative():
     precio = Decimal('-5.00')
     result = calcular_precio_unidad_pequena(precio, 'kg')
-    assert result == Decimal('-0.005')
\ No newline at end of file
+    assert result == Decimal('-0.005')
+
+
+def test_calcular_precio_unidad_pequena_uses_density():
+    # 9.20 per litre of oil at 0.92 g/ml is 0.01 per gram
+    result = calcular_precio_unidad_pequena(Decimal('9.20'), 'litros', Decimal('0.92'))
+    assert result == Decimal('0.01')
+    # Density does not affect mass units
+    assert calcular_precio_unidad_pequena(Decimal('10'), 'kg', Decimal('0.92')) == Decimal('0.01')
+
+
+def test_factor_a_gramos_is_exact():
+    assert factor_a_gramos('galon') == Decimal('3785.411784')
+    assert factor_a_gramos('caneca_20l', Decimal('1.2')) == Decimal('24000')
+    assert factor_a_gramos('saco', None, (Decimal('25'), 'kg')) == Decimal('25000')
+    assert calculate_cost_for_quantity(Decimal('0.002'), 1.5, 'kg') == Decimal('3.000')
+
+
+def test_unknown_unit_is_rejected():
+    with pytest.raises(UnknownUnitError):
+        factor_a_gramos('barril')
+    with pytest.raises(UnknownUnitError):
+        factor_a_gramos('caneca', None, (Decimal('20'), 'barril'))
+
+
+def test_material_specific_units():
+    material = Material(nombre='Aceite', precio_base=Decimal('9.20'), unidad_base='litros',
+                        densidad=Decimal('0.92'), precio_unidad_pequena=Decimal('0.01'))
+    material.unidades.append(MaterialUnit(nombre='caneca', cantidad=Decimal('20'), unidad='l'))
+
+    assert material.factor_a_gramos('caneca') == Decimal('18400')
+    assert material.factor_a_gramos('galon') == Decimal('3482.57884128')
+    with pytest.raises(UnknownUnitError):
+        material.factor_a_gramos('saco')
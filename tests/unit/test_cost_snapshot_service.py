@@ -0,0 +1,98 @@
+import pytest
+from decimal import Decimal
+
+from app.models.material import Material
+from app.models.product import Product, ProductMaterial
+from app.models.product_cost_snapshot import ProductCostSnapshot
+from app.models.user import User
+from app.schemas.material import MaterialUpdate
+from app.services.cost_snapshot_service import (
+    backfill_product_cost_snapshots, get_product_cost_snapshot, get_products_using_materials,
+    refresh_product_cost_snapshots
+)
+from app.services.material_service import update_material
+
+
+@pytest.fixture
+def user(session):
+    user = User(username="snap", email="snap@example.com", hashed_password="x")
+    session.add(user)
+    session.commit()
+    return user
+
+
+def _product(session, user, nombre, materials):
+    product = Product(
+        user_id=user.id, nombre=nombre, iva_percentage=Decimal("12"),
+        margen_publico=Decimal("50"), margen_mayorista=Decimal("25"), margen_distribuidor=Decimal("20"),
+        costo_transporte=Decimal("1"), peso_empaque=Decimal("100")
+    )
+    for material, cantidad in materials:
+        product.product_materials.append(ProductMaterial(material_id=material.id, cantidad=Decimal(cantidad)))
+    session.add(product)
+    session.flush()
+    return product
+
+
+def test_material_price_change_updates_only_affected_products(session, user):
+    glicerina = Material(user_id=user.id, nombre="Glicerina", precio_base=Decimal("4"), precio_unidad_pequena=Decimal("0.004"))
+    soda = Material(user_id=user.id, nombre="Soda", precio_base=Decimal("2"), precio_unidad_pequena=Decimal("0.002"))
+    session.add_all([glicerina, soda])
+    session.flush()
+
+    jabon = _product(session, user, "Jabon", [(glicerina, "500"), (soda, "500")])
+    vela = _product(session, user, "Vela", [(soda, "1000")])
+    refresh_product_cost_snapshots(session, user, [jabon.id, vela.id])
+    session.commit()
+
+    assert get_products_using_materials(session, user, [glicerina.id]) == [jabon.id]
+
+    update_material(session, glicerina.id, MaterialUpdate(precio_base=Decimal("6")), user)
+
+    jabon_snapshot = get_product_cost_snapshot(session, jabon, user)
+    assert jabon_snapshot.costo_materiales == Decimal("4")
+    assert jabon_snapshot.costo_por_gramo == Decimal("0.004")
+    # 100g * 0.004 + 1 transport, 50% margin, 12% IVA
+    assert jabon_snapshot.precio_publico == Decimal("2.8")
+    assert jabon_snapshot.precio_publico_con_iva == Decimal("3.136")
+
+    assert get_product_cost_snapshot(session, vela, user).costo_materiales == Decimal("2")
+    assert session.query(ProductCostSnapshot).count() == 2
+
+
+def test_snapshot_is_backfilled_on_read(session, user):
+    soda = Material(user_id=user.id, nombre="Soda", precio_base=Decimal("2"), precio_unidad_pequena=Decimal("0.002"))
+    session.add(soda)
+    session.flush()
+    vela = _product(session, user, "Vela", [(soda, "1000")])
+    session.commit()
+
+    snapshot = get_product_cost_snapshot(session, vela, user)
+
+    assert snapshot.costo_paquete == Decimal("1.2")
+    assert snapshot.precio_mayorista == Decimal("1.6")
+
+
+def test_backfill_writes_missing_snapshots_for_every_user(session, user):
+    otro = User(username="otro", email="otro@example.com", hashed_password="x")
+    session.add(otro)
+    session.flush()
+    glicerina = Material(user_id=user.id, nombre="Glicerina", precio_base=Decimal("4"), precio_unidad_pequena=Decimal("0.004"))
+    cera = Material(user_id=otro.id, nombre="Cera", precio_base=Decimal("10"), precio_unidad_pequena=Decimal("0.01"))
+    session.add_all([glicerina, cera])
+    session.flush()
+    jabones = [_product(session, user, f"Jabon {i}", [(glicerina, str(100 + i))]) for i in range(5)]
+    vela = _product(session, otro, "Vela", [(cera, "500")])
+    retirado = _product(session, user, "Retirado", [(glicerina, "100")])
+    retirado.is_active = False
+    refresh_product_cost_snapshots(session, user, [jabones[0].id])
+    session.commit()
+
+    assert backfill_product_cost_snapshots(session, batch_size=2) == 5
+    snapshots = {snapshot.product_id: snapshot for snapshot in session.query(ProductCostSnapshot)}
+    assert set(snapshots) == {product.id for product in jabones} | {vela.id}
+    for product in jabones + [vela]:
+        assert snapshots[product.id].costo_paquete == product.pricing_snapshot().costo_paquete
+    assert snapshots[vela.id].user_id == otro.id
+
+    assert backfill_product_cost_snapshots(session) == 0
@@ -0,0 +1,115 @@
+import pytest
+from datetime import datetime
+from decimal import Decimal
+from fastapi import HTTPException
+from sqlalchemy import event
+
+from app.models.inventory import Inventory, InventoryMovement
+from app.models.material import Material
+from app.models.product import Product, ProductMaterial
+from app.models.user import User
+from app.schemas.product import ProductResponse
+from app.services.inventory_service import get_inventories
+from app.services.product_service import PRODUCT_VIEWS, get_products
+from app.utils.fieldsets import parse_fieldset
+
+
+@pytest.fixture
+def catalog(session):
+    user = User(username="sparse", email="sparse@example.com", hashed_password="x")
+    session.add(user)
+    session.flush()
+    material = Material(user_id=user.id, nombre="Aceite", precio_base=Decimal("6"),
+                        precio_unidad_pequena=Decimal("0.006"))
+    session.add(material)
+    session.flush()
+    for i in range(3):
+        product = Product(user_id=user.id, nombre=f"Jabon {i}", margen_publico=Decimal("40"),
+                          margen_mayorista=Decimal("30"), margen_distribuidor=Decimal("20"),
+                          costo_transporte=Decimal("0.5"), peso_empaque=Decimal("100"))
+        product.product_materials.append(ProductMaterial(material_id=material.id, cantidad=Decimal(100 + i)))
+        session.add(product)
+        session.flush()
+        inventory = Inventory(user_id=user.id, product_id=product.id, lote=f"L{i}",
+                              fecha_produccion=datetime(2026, 1, 1), cantidad_producida=Decimal("10"),
+                              costo_unitario=Decimal("1"), costo_total=Decimal("10"),
+                              stock_actual=Decimal("10"), stock_minimo=Decimal("20"))
+        inventory.inventory_movements.append(InventoryMovement(
+            user_id=user.id, tipo_movimiento="entrada", cantidad=Decimal("10"), motivo="Produccion",
+            stock_anterior=Decimal("0"), stock_posterior=Decimal("10"), usuario_responsable="sparse"
+        ))
+        session.add(inventory)
+    session.commit()
+    session.refresh(user)
+    return user
+
+
+def _statements(session, run):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(session.get_bind(), "before_cursor_execute", record)
+    try:
+        result = run()
+    finally:
+        event.remove(session.get_bind(), "before_cursor_execute", record)
+    return result, statements
+
+
+def test_summary_view_matches_full_prices(session, catalog):
+    fields = parse_fieldset(ProductResponse, None, "summary", PRODUCT_VIEWS)
+    full = get_products(session, catalog)
+    summary = get_products(session, catalog, fields=fields)
+
+    assert [item.model_dump(mode="json") for item in summary] == [
+        item.model_dump(mode="json", include=set(fields)) for item in full
+    ]
+
+
+def test_column_fields_skip_pricing_and_recipes(session, catalog):
+    fields = parse_fieldset(ProductResponse, "nombre,margen_publico", None, PRODUCT_VIEWS)
+
+    products, statements = _statements(session, lambda: get_products(session, catalog, fields=fields))
+
+    assert [product.model_dump() for product in products] == [
+        {"id": product.id, "nombre": product.nombre, "margen_publico": 40.0} for product in products
+    ]
+    assert len(statements) == 1
+    assert "product_materials" not in statements[0]
+    # Only the requested columns are selected
+    assert "costo_transporte" not in statements[0]
+
+
+def test_inventory_fields_skip_related_rows(session, catalog):
+    fields = frozenset({"id", "lote", "stock_status"})
+
+    inventories, statements = _statements(session, lambda: get_inventories(session, catalog, fields=fields))
+
+    assert [item.model_dump() for item in inventories] == [
+        {"id": item.id, "lote": f"L{i}", "stock_status": "low"} for i, item in enumerate(inventories)
+    ]
+    assert len(statements) == 1
+    assert "inventory_movements" not in statements[0] and "products" not in statements[0]
+
+
+def test_invalid_fieldsets_are_rejected():
+    with pytest.raises(HTTPException) as exc:
+        parse_fieldset(ProductResponse, "nombre,color", None, PRODUCT_VIEWS)
+    assert exc.value.status_code == 400 and "color" in exc.value.detail
+
+    with pytest.raises(HTTPException) as exc:
+        parse_fieldset(ProductResponse, None, "compact", PRODUCT_VIEWS)
+    assert exc.value.status_code == 400
+
+    assert parse_fieldset(ProductResponse, None, "full", PRODUCT_VIEWS) is None
+
+
+def test_sparse_endpoint_returns_only_requested_fields(client, session, catalog):
+    response = client.get("/api/products/?fields=nombre,precio_publico_con_iva&limit=2&total=exact")
+
+    assert response.status_code == 200
+    assert [set(item) for item in response.json()] == [{"id", "nombre", "precio_publico_con_iva"}] * 2
+    assert response.headers["X-Total-Count"] == "3"
+    assert "X-Next-Cursor" in response.headers
@@ -0,0 +1,139 @@
+import pytest
+from decimal import Decimal
+from sqlalchemy import event
+
+from app.models.audit_log import AuditLog
+from app.models.material import Material
+from app.models.material_price_history import MaterialPriceHistory
+from app.models.product import Product, ProductComponent, ProductMaterial
+from app.models.product_cost_snapshot import ProductCostSnapshot
+from app.models.user import User
+from app.services.cost_snapshot_service import refresh_product_cost_snapshots
+from app.services.material_price_import_service import import_material_prices, read_price_list_csv
+from app.services.product_import_service import read_ndjson
+
+
+def _product(session, user, nombre, materials=(), components=()):
+    product = Product(
+        user_id=user.id, nombre=nombre, iva_percentage=Decimal("12"),
+        margen_publico=Decimal("50"), margen_mayorista=Decimal("25"), margen_distribuidor=Decimal("20"),
+        costo_transporte=Decimal("1"), peso_empaque=Decimal("100")
+    )
+    for material, cantidad in materials:
+        product.product_materials.append(ProductMaterial(material_id=material.id, cantidad=Decimal(cantidad)))
+    for component, cantidad in components:
+        product.components.append(ProductComponent(component_product_id=component.id, cantidad=Decimal(cantidad)))
+    session.add(product)
+    session.flush()
+    return product
+
+
+@pytest.fixture
+def catalog(session):
+    user = User(username="supplier", email="supplier@example.com", hashed_password="x")
+    session.add(user)
+    session.flush()
+    materials = {
+        nombre: Material(user_id=user.id, nombre=nombre, precio_base=Decimal(precio),
+                         precio_unidad_pequena=Decimal(precio) / 1000)
+        for nombre, precio in (("Glicerina", "4"), ("Soda", "2"), ("Cera", "10"), ("Aroma", "30"))
+    }
+    session.add_all(materials.values())
+    session.flush()
+    base = _product(session, user, "Base glicerina", [(materials["Glicerina"], "500")])
+    jabon = _product(session, user, "Jabon", [(materials["Soda"], "500")], [(base, "100")])
+    vela = _product(session, user, "Vela", [(materials["Cera"], "1000")])
+    refresh_product_cost_snapshots(session, user, [base.id, jabon.id, vela.id])
+    session.commit()
+    session.refresh(user)
+    return user, materials, (base, jabon, vela)
+
+
+def _snapshot_prices(session, product_ids):
+    return {
+        snapshot.product_id: (snapshot.costo_paquete, snapshot.precio_publico, snapshot.precio_distribuidor_con_iva)
+        for snapshot in session.query(ProductCostSnapshot).filter(ProductCostSnapshot.product_id.in_(product_ids))
+    }
+
+
+def test_price_list_updates_materials_and_cascades(session, catalog):
+    user, materials, (base, jabon, vela) = catalog
+    antes = _snapshot_prices(session, [base.id, jabon.id, vela.id])
+
+    result = import_material_prices(session, user, read_price_list_csv([
+        "material_id,material,precio_base\n",
+        ",Glicerina,6\n",
+        f"{materials['Soda'].id},,2\n",
+        ",Parafina,3\n",
+        f"{materials['Glicerina'].id},,7\n",
+        ",Soda,-1\n",
+    ]))
+
+    assert (result.updated, result.unchanged, result.failed) == (1, 1, 3)
+    assert sorted(error.line for error in result.errors) == [4, 5, 6]
+    assert [(m.nombre, m.precio_base_anterior, m.precio_base_nuevo) for m in result.materiales] == [
+        ("Glicerina", Decimal("4"), Decimal("6"))
+    ]
+
+    session.expire_all()
+    glicerina = session.get(Material, materials["Glicerina"].id)
+    assert glicerina.precio_unidad_pequena == Decimal("0.006") and glicerina.version == 2
+    history = session.query(MaterialPriceHistory).filter(MaterialPriceHistory.material_id == glicerina.id).all()
+    assert [(entry.precio_base, entry.valid_to) for entry in history] == [(Decimal("6"), None)]
+    assert session.query(AuditLog).filter(AuditLog.material_id == glicerina.id).count() == 1
+
+    # The base and the product built on it are re-priced; the candle is untouched
+    assert [delta.product_id for delta in result.productos] == [base.id, jabon.id]
+    despues = _snapshot_prices(session, [base.id, jabon.id, vela.id])
+    assert despues[vela.id] == antes[vela.id]
+    for delta in result.productos:
+        assert delta.costo_paquete_anterior == antes[delta.product_id][0]
+        assert delta.costo_paquete_nuevo == despues[delta.product_id][0]
+        assert delta.delta_precio_publico == despues[delta.product_id][1] - antes[delta.product_id][1]
+        assert delta.delta_costo_paquete > 0
+
+    # The stored snapshots are the ones a full recomputation produces
+    refresh_product_cost_snapshots(session, user, [base.id, jabon.id])
+    session.flush()
+    assert _snapshot_prices(session, [base.id, jabon.id]) == {k: despues[k] for k in (base.id, jabon.id)}
+
+
+def test_statement_count_does_not_grow_with_the_price_list(session, catalog):
+    user, materials, _ = catalog
+
+    def run(lines):
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(session.get_bind(), "before_cursor_execute", record)
+        try:
+            import_material_prices(session, user, read_ndjson(lines))
+        finally:
+            event.remove(session.get_bind(), "before_cursor_execute", record)
+        session.refresh(user)
+        return len(statements)
+
+    one = run(['{"material": "Glicerina", "precio_base": "5"}'])
+    four = run([
+        f'{{"material_id": {material.id}, "precio_base": "{material.precio_base + 1}"}}'
+        for material in materials.values()
+    ])
+    assert one == four
+
+
+def test_duplicate_after_an_unchanged_row_is_rejected(session, catalog):
+    user, materials, _ = catalog
+    soda_id = materials["Soda"].id
+
+    result = import_material_prices(session, user, read_price_list_csv([
+        "material,precio_base\n",
+        "Soda,2\n",
+        "Soda,3\n",
+    ]))
+
+    assert (result.updated, result.unchanged, result.failed) == (0, 1, 1)
+    assert [(error.line, error.error) for error in result.errors] == [(3, "Material listed more than once")]
+    session.expire_all()
+    assert session.get(Material, soda_id).precio_base == Decimal("2")
@@ -0,0 +1,91 @@
+import pytest
+from decimal import Decimal
+from sqlalchemy import event
+
+from app.models.material import Material
+from app.models.product import Product, ProductComponent, ProductMaterial
+from app.models.user import User
+from app.services.cost_snapshot_service import refresh_product_cost_snapshots
+from app.services.material_usage_service import get_where_used
+
+
+def _product(session, user, nombre, materials=(), components=(), is_active=True):
+    product = Product(
+        user_id=user.id, nombre=nombre, margen_publico=Decimal("50"), margen_mayorista=Decimal("25"),
+        margen_distribuidor=Decimal("20"), costo_transporte=Decimal("0"), is_active=is_active
+    )
+    for material, cantidad in materials:
+        product.product_materials.append(ProductMaterial(material_id=material.id, cantidad=Decimal(cantidad)))
+    for component, cantidad in components:
+        product.components.append(ProductComponent(component_product_id=component.id, cantidad=Decimal(cantidad)))
+    session.add(product)
+    session.flush()
+    return product
+
+
+@pytest.fixture
+def catalog(session):
+    user = User(username="formulador", email="formulador@example.com", hashed_password="x")
+    session.add(user)
+    session.flush()
+    materials = {
+        nombre: Material(user_id=user.id, nombre=nombre, precio_base=Decimal(precio),
+                         precio_unidad_pequena=Decimal(precio) / 1000)
+        for nombre, precio in (("Glicerina", "4"), ("Soda", "2"), ("Cera", "10"))
+    }
+    session.add_all(materials.values())
+    session.flush()
+    base = _product(session, user, "Base", [(materials["Glicerina"], "500"), (materials["Soda"], "500")])
+    jabon = _product(session, user, "Jabon", [(materials["Glicerina"], "100")], [(base, "400")])
+    _product(session, user, "Retirado", [(materials["Glicerina"], "900")], is_active=False)
+    refresh_product_cost_snapshots(session, user, [base.id, jabon.id])
+    session.commit()
+    session.refresh(user)
+    return user, materials, base, jabon
+
+
+def test_where_used_reports_quantity_cost_and_share(session, catalog):
+    user, materials, base, jabon = catalog
+    glicerina, soda, cera = (materials[nombre].id for nombre in ("Glicerina", "Soda", "Cera"))
+    base_id = base.id
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(session.get_bind(), "before_cursor_execute", record)
+    try:
+        usages = get_where_used(session, user, [cera, glicerina, 99999, soda])
+    finally:
+        event.remove(session.get_bind(), "before_cursor_execute", record)
+    assert len(statements) == 1
+
+    assert [usage.material_id for usage in usages] == [cera, glicerina, soda]
+    assert (usages[0].total_productos, usages[0].productos) == (0, [])
+
+    glicerina_usage = usages[1]
+    # Base: 2 of its 3 recipe cost; Jabon: 0.4 of 0.4 + 400 g of base at 0.003/g
+    assert [(p.nombre, p.cantidad, p.costo, p.porcentaje_costo) for p in glicerina_usage.productos] == [
+        ("Base", Decimal("500"), Decimal("2"), Decimal("66.67")),
+        ("Jabon", Decimal("100"), Decimal("0.4"), Decimal("25")),
+    ]
+    assert glicerina_usage.total_productos == 2
+    assert glicerina_usage.costo_total == Decimal("2.4")
+    assert [p.product_id for p in usages[2].productos] == [base_id]
+
+
+def test_where_used_endpoints(client):
+    client.post("/auth/register", json={"username": "usos", "email": "usos@example.com", "password": "pass"})
+    token = client.post("/auth/login", json={"username": "usos", "password": "pass"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    material = client.post("/api/materials/", json={"nombre": "Glicerina", "precio_base": "5.00"}, headers=headers).json()
+
+    response = client.get(f"/api/materials/{material['id']}/where-used", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["productos"] == []
+    assert client.get("/api/materials/99999/where-used", headers=headers).status_code == 404
+
+    response = client.post("/api/materials/where-used", json={"material_ids": [material["id"], 99999]}, headers=headers)
+    assert [usage["material_id"] for usage in response.json()] == [material["id"]]
+    assert client.post("/api/materials/where-used", json={"material_ids": []}, headers=headers).status_code == 422
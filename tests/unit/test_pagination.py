@@ -0,0 +1,146 @@
+import pytest
+from datetime import datetime, timedelta
+from decimal import Decimal
+from fastapi import HTTPException
+
+from app.models.inventory import Inventory, InventoryMovement
+from app.models.material import Material
+from app.models.product import Product, ProductMaterial
+from app.models.user import User
+from app.schemas.inventory import InventoryMovementCreate
+from app.services.inventory_service import get_inventory_movements, register_stock_movement
+from app.services.material_service import get_materials
+from app.services.product_service import get_products
+from app.utils.pagination import decode_cursor, encode_cursor
+
+
+@pytest.fixture
+def catalog(session):
+    user = User(username="pager", email="pager@example.com", hashed_password="x")
+    session.add(user)
+    session.flush()
+
+    materials = [
+        Material(user_id=user.id, nombre=f"Material {i:02d}", precio_base=Decimal("2"),
+                 precio_unidad_pequena=Decimal("0.002"))
+        for i in range(12)
+    ]
+    session.add_all(materials)
+    session.flush()
+
+    # Several products share each price so the id tiebreak is exercised
+    for i in range(15):
+        product = Product(user_id=user.id, nombre=f"Producto {14 - i:02d}", margen_publico=Decimal("40"),
+                          margen_mayorista=Decimal("30"), margen_distribuidor=Decimal("20"),
+                          costo_transporte=Decimal("0"))
+        product.product_materials.append(ProductMaterial(material_id=materials[0].id, cantidad=Decimal(100 * (i % 4 + 1))))
+        session.add(product)
+    session.commit()
+    return user
+
+
+def _walk(fetch, limit):
+    """Every item of a listing, following X-Next-Cursor until it runs out"""
+    items, cursor, pages = [], None, 0
+    while True:
+        page = fetch(cursor=cursor, limit=limit)
+        items.extend(page)
+        pages += 1
+        assert pages <= 50, "cursor never runs out"
+        if page.next_cursor is None:
+            return items, pages
+        cursor = page.next_cursor
+
+
+@pytest.mark.parametrize("sort_by", [None, "nombre", "-nombre", "precio", "-precio"])
+def test_cursor_walk_matches_full_listing(session, catalog, sort_by):
+    full = get_products(session, catalog, limit=1000, sort_by=sort_by, tipo_cliente="mayorista")
+
+    walked, pages = _walk(
+        lambda cursor, limit: get_products(session, catalog, limit=limit, sort_by=sort_by,
+                                           tipo_cliente="mayorista", cursor=cursor),
+        limit=4
+    )
+
+    assert [p.id for p in walked] == [p.id for p in full]
+    assert pages == 4
+
+
+def test_materials_pages_and_totals(session, catalog):
+    first = get_materials(session, catalog, limit=5, total="exact")
+    assert first.total == 12 and not first.total_estimated
+
+    walked, pages = _walk(lambda cursor, limit: get_materials(session, catalog, limit=limit, cursor=cursor), 5)
+    assert [m.nombre for m in walked] == [f"Material {i:02d}" for i in range(12)]
+    assert pages == 3
+
+    # Offset callers keep working; SQLite has no planner estimate and counts exactly
+    offset = get_materials(session, catalog, skip=10, limit=5, total="estimated")
+    assert [m.nombre for m in offset] == ["Material 10", "Material 11"]
+    assert offset.next_cursor is None and offset.total == 12
+
+
+def test_movements_newest_first_with_tied_timestamps(session, catalog):
+    product = session.query(Product).first()
+    inventory = Inventory(user_id=catalog.id, product_id=product.id, lote="L1", fecha_produccion=datetime(2026, 1, 1),
+                          cantidad_producida=Decimal("100"), costo_unitario=Decimal("1"),
+                          costo_total=Decimal("100"), stock_actual=Decimal("100"))
+    session.add(inventory)
+    session.flush()
+    inicio = datetime(2026, 1, 1)
+    for i in range(9):
+        session.add(InventoryMovement(
+            user_id=catalog.id, inventory_id=inventory.id, tipo_movimiento="salida", cantidad=Decimal("-1"),
+            motivo=f"Venta {i}", stock_anterior=Decimal(100 - i), stock_posterior=Decimal(99 - i),
+            usuario_responsable="pager", created_at=inicio + timedelta(hours=i // 3)
+        ))
+    session.commit()
+
+    walked, pages = _walk(
+        lambda cursor, limit: get_inventory_movements(session, inventory.id, catalog, limit=limit, cursor=cursor), 2
+    )
+
+    assert [m.motivo for m in walked] == [f"Venta {i}" for i in reversed(range(9))]
+    assert pages == 5
+
+
+def test_movements_with_server_default_timestamps(session, catalog):
+    # created_at comes from the database default, stored in a different text form than bound datetimes on SQLite
+    product = session.query(Product).first()
+    inventory = Inventory(user_id=catalog.id, product_id=product.id, lote="L2", fecha_produccion=datetime(2026, 1, 1),
+                          cantidad_producida=Decimal("100"), costo_unitario=Decimal("1"),
+                          costo_total=Decimal("100"), stock_actual=Decimal("100"))
+    session.add(inventory)
+    session.commit()
+    for i in range(6):
+        register_stock_movement(session, inventory.id, InventoryMovementCreate(
+            tipo_movimiento="salida", cantidad=Decimal("1"), motivo=f"Venta {i}"
+        ), catalog, "pager")
+
+    walked, pages = _walk(
+        lambda cursor, limit: get_inventory_movements(session, inventory.id, catalog, limit=limit, cursor=cursor), 2
+    )
+
+    assert [m.motivo for m in walked] == [f"Venta {i}" for i in reversed(range(6))]
+    assert pages == 3
+
+
+def test_cursor_is_bound_to_its_ordering(session, catalog):
+    cursor = get_products(session, catalog, limit=2, sort_by="nombre").next_cursor
+
+    with pytest.raises(HTTPException) as exc:
+        get_products(session, catalog, limit=2, sort_by="precio", cursor=cursor)
+    assert exc.value.status_code == 400
+
+    with pytest.raises(HTTPException) as exc:
+        get_materials(session, catalog, cursor="not-a-cursor")
+    assert exc.value.status_code == 400
+
+    with pytest.raises(HTTPException) as exc:
+        get_materials(session, catalog, total="approximate")
+    assert exc.value.status_code == 400
+
+
+def test_cursor_round_trips_typed_values():
+    for value in (Decimal("12.345678"), datetime(2026, 3, 1, 12, 30), "Jabón", 7):
+        assert decode_cursor(encode_cursor("k", value, 42), "k") == (value, 42)
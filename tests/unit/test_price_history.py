@@ -0,0 +1,137 @@
+import pytest
+from datetime import datetime
+from decimal import Decimal
+
+from fastapi import HTTPException
+from sqlalchemy import event
+
+from app.models.material import Material
+from app.models.material_price_history import MaterialPriceHistory
+from app.models.product import Product, ProductMaterial, ProductComponent
+from app.models.user import User
+from app.schemas.material import MaterialCreate, MaterialUpdate
+from app.services.material_service import create_material, delete_material, update_material
+from app.services.price_history_service import (
+    date_series, get_material_price_history, get_product_costs_as_of, record_material_price
+)
+
+
+ENERO = datetime(2026, 1, 1)
+MARZO = datetime(2026, 3, 1)
+MAYO = datetime(2026, 5, 1)
+
+
+def _set_price(session, material, precio_unidad_pequena, at):
+    material.precio_base = precio_unidad_pequena * 1000
+    material.precio_unidad_pequena = precio_unidad_pequena
+    material.version = (material.version or 1) + 1
+    record_material_price(session, material, at)
+    session.flush()
+
+
+@pytest.fixture
+def catalog(session):
+    user = User(username="hist", email="hist@example.com", hashed_password="x")
+    session.add(user)
+    session.flush()
+
+    aceite = Material(user_id=user.id, nombre="Aceite", precio_base=Decimal("4"),
+                      unidad_base="kg", precio_unidad_pequena=Decimal("0.004"), version=1)
+    soda = Material(user_id=user.id, nombre="Soda", precio_base=Decimal("2"),
+                    unidad_base="kg", precio_unidad_pequena=Decimal("0.002"), version=1)
+    session.add_all([aceite, soda])
+    session.flush()
+    record_material_price(session, aceite, ENERO)
+    record_material_price(session, soda, ENERO)
+    session.flush()
+    _set_price(session, aceite, Decimal("0.006"), MARZO)
+
+    base = Product(user_id=user.id, nombre="Base", margen_publico=Decimal("50"), margen_mayorista=Decimal("25"),
+                   margen_distribuidor=Decimal("20"), costo_transporte=Decimal("0"),
+                   peso_final_producido=Decimal("1000"))
+    base.product_materials.append(ProductMaterial(material_id=aceite.id, cantidad=Decimal("800")))
+    base.product_materials.append(ProductMaterial(material_id=soda.id, cantidad=Decimal("200")))
+    session.add(base)
+    session.flush()
+
+    jabon = Product(user_id=user.id, nombre="Jabon", margen_publico=Decimal("50"), margen_mayorista=Decimal("25"),
+                    margen_distribuidor=Decimal("20"), costo_transporte=Decimal("0"),
+                    peso_empaque=Decimal("100"))
+    jabon.product_materials.append(ProductMaterial(material_id=soda.id, cantidad=Decimal("10")))
+    jabon.components.append(ProductComponent(component_product_id=base.id, cantidad=Decimal("90")))
+    session.add(jabon)
+    session.commit()
+    return user, aceite, soda, base, jabon
+
+
+def test_costs_as_of_each_date(session, catalog):
+    user, aceite, soda, base, jabon = catalog
+
+    result = get_product_costs_as_of(session, user, [datetime(2026, 2, 1), datetime(2026, 4, 1)])
+
+    series = {serie.product_id: serie for serie in result.productos}
+    febrero, abril = series[base.id].puntos
+    # 800g * 0.004 + 200g * 0.002, then 800g * 0.006 + 200g * 0.002
+    assert febrero.costo_materiales == Decimal("3.6")
+    assert abril.costo_materiales == Decimal("5.2")
+    assert abril.costo_materiales == base.calcular_costo_total()
+
+    # The intermediate product is priced at the same date: 10g * 0.002 + 90g * 0.0036
+    assert series[jabon.id].puntos[0].costo_materiales == Decimal("0.344")
+    assert series[jabon.id].puntos[1].costo_materiales == jabon.calcular_costo_total()
+
+
+def test_date_before_history_has_no_material_cost(session, catalog):
+    user, aceite, soda, base, jabon = catalog
+
+    result = get_product_costs_as_of(session, user, [datetime(2025, 6, 1)], [base.id])
+
+    assert [serie.product_id for serie in result.productos] == [base.id]
+    assert result.productos[0].puntos[0].costo_materiales == Decimal("0")
+
+
+def test_date_series_resolves_in_one_history_query(session, catalog):
+    user, aceite, soda, base, jabon = catalog
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if "material_price_history" in statement:
+            statements.append(statement)
+
+    fechas = date_series(ENERO, MAYO, 7)
+    event.listen(session.get_bind(), "before_cursor_execute", count)
+    try:
+        result = get_product_costs_as_of(session, user, fechas)
+    finally:
+        event.remove(session.get_bind(), "before_cursor_execute", count)
+
+    assert len(statements) == 1
+    costos = [punto.costo_materiales for punto in result.productos[0].puntos]
+    assert len(costos) == len(fechas)
+    assert costos[0] == Decimal("3.6") and costos[-1] == Decimal("5.2")
+    assert costos == sorted(costos)
+
+
+def test_date_series_is_bounded():
+    with pytest.raises(HTTPException) as exc:
+        date_series(datetime(2020, 1, 1), datetime(2026, 1, 1))
+    assert exc.value.status_code == 400
+
+
+def test_material_writes_append_and_close_intervals(session):
+    user = User(username="hist2", email="hist2@example.com", hashed_password="x")
+    session.add(user)
+    session.commit()
+
+    material = create_material(session, MaterialCreate(nombre="Glicerina", precio_base=Decimal("3")), user)
+    update_material(session, material.id, MaterialUpdate(nombre="Glicerina USP"), user)
+    update_material(session, material.id, MaterialUpdate(precio_base=Decimal("5")), user)
+
+    history = get_material_price_history(session, material.id, user)
+    assert [entry.precio_base for entry in history] == [Decimal("3"), Decimal("5")]
+    assert history[0].valid_to is not None and history[1].valid_to is None
+    assert history[1].version == material.version
+
+    delete_material(session, material.id, user)
+    open_intervals = session.query(MaterialPriceHistory).filter(MaterialPriceHistory.valid_to.is_(None)).count()
+    assert open_intervals == 0
@@ -0,0 +1,193 @@
+import threading
+from decimal import Decimal
+
+import pytest
+
+from app.models.material import Material
+from app.models.product import Product, ProductComponent, ProductMaterial
+from app.utils.fixed_point import from_micro, round_div, to_micro
+from app.utils.pricing import RecipeCycleError, calcular_matriz_precios, pricing_stats
+
+
+def _make_product(**overrides):
+    fields = dict(
+        nombre="Jabon",
+        iva_percentage=Decimal("21"),
+        margen_publico=Decimal("40"),
+        margen_mayorista=Decimal("30"),
+        margen_distribuidor=Decimal("20"),
+        costo_transporte=Decimal("0.50"),
+        costo_envase=Decimal("0.25"),
+        peso_final_producido=Decimal("1000"),
+        peso_empaque=Decimal("250"),
+    )
+    fields.update(overrides)
+    product = Product(**fields)
+    glicerina = Material(nombre="Glicerina", precio_base=Decimal("3.00"),
+                         precio_unidad_pequena=Decimal("0.003"), is_active=True)
+    soda = Material(nombre="Soda", precio_base=Decimal("2.00"),
+                    precio_unidad_pequena=Decimal("0.002"), is_active=True)
+    product.product_materials.append(ProductMaterial(material=glicerina, cantidad=Decimal("600")))
+    product.product_materials.append(ProductMaterial(material=soda, cantidad=Decimal("400")))
+    return product
+
+
+def test_snapshot_values():
+    product = _make_product()
+    snapshot = product.pricing_snapshot()
+
+    # 600g * 0.003 + 400g * 0.002
+    assert snapshot.costo_materiales == Decimal("2.6")
+    assert snapshot.costo_por_gramo == Decimal("0.0026")
+    assert snapshot.costo_paquete == Decimal("1.4")
+    # 1.4 / 0.6 rounded half up to micro-units
+    assert snapshot.precio_publico == Decimal("2.333333")
+    assert snapshot.iva_mayorista == Decimal("0.42")
+    assert product.precio_distribuidor_con_iva == Decimal("2.1175")
+
+
+def test_snapshot_is_reused_across_properties():
+    product = _make_product()
+    pricing_stats.reset()
+
+    product.precio_publico
+    product.precio_mayorista_con_iva
+    product.iva_distribuidor
+    product.calcular_precios_por_empaque()
+    product.calcular_costo_por_gramo_ajustado()
+
+    assert pricing_stats.misses == 1
+    assert pricing_stats.hits == 4
+
+
+def test_snapshot_invalidated_by_pricing_column():
+    product = _make_product()
+    before = product.precio_publico
+
+    product.margen_publico = Decimal("50")
+
+    assert product.precio_publico == Decimal("2.8")
+    assert product.precio_publico != before
+
+
+def test_snapshot_invalidated_by_recipe_and_material_price():
+    product = _make_product()
+    assert product.calcular_costo_total() == Decimal("2.6")
+
+    product.product_materials[0].cantidad = Decimal("700")
+    assert product.calcular_costo_total() == Decimal("2.9")
+
+    product.product_materials[1].material.precio_unidad_pequena = Decimal("0.004")
+    assert product.calcular_costo_total() == Decimal("3.7")
+
+    product.product_materials[1].material.is_active = False
+    assert product.calcular_costo_total() == Decimal("2.1")
+
+
+def _use_base(base, nombre="Jabon de base"):
+    product = _make_product(nombre=nombre, peso_final_producido=None, is_active=True)
+    product.components.append(ProductComponent(component=base, cantidad=Decimal("100")))
+    return product
+
+
+def test_change_invalidates_only_downstream_snapshots():
+    base = _make_product(nombre="Base", is_active=True)
+    jabon = _use_base(base)
+    otro = _make_product(nombre="Otro")
+    for product in (base, jabon, otro):
+        product.pricing_snapshot()
+
+    base.product_materials[0].material.precio_unidad_pequena = Decimal("0.004")
+
+    # The base and the product built on it are recomputed; the unrelated one is not
+    assert "_pricing_cache" not in base.__dict__ and "_pricing_cache" not in jabon.__dict__
+    assert "_pricing_cache" in otro.__dict__
+    pricing_stats.reset()
+    jabon.pricing_snapshot()
+    otro.pricing_snapshot()
+    assert (pricing_stats.misses, pricing_stats.hits) == (2, 1)
+    assert base.calcular_costo_total() == Decimal("3.2")
+
+    # A pricing column of the base reaches its dependents too
+    before = jabon.pricing_snapshot().costo_por_gramo
+    base.peso_final_producido = Decimal("500")
+    assert jabon.pricing_snapshot().costo_por_gramo != before
+
+
+def test_cycle_guard_is_local_to_each_evaluation():
+    base = _make_product(nombre="Base", is_active=True)
+    jabon = _use_base(base)
+    base.components.append(ProductComponent(component=jabon, cantidad=Decimal("1")))
+    with pytest.raises(RecipeCycleError):
+        jabon.pricing_snapshot()
+
+    # A failed evaluation leaves no state behind, and evaluations in other threads never see each other's path
+    base.components.pop()
+    errors = []
+
+    def evaluate():
+        try:
+            for _ in range(200):
+                shared_base = _make_product(nombre="Base", is_active=True)
+                _use_base(shared_base).pricing_snapshot()
+                _use_base(shared_base, "Otro").pricing_snapshot()
+        except RecipeCycleError as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=evaluate) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert jabon.pricing_snapshot() is not None
+
+
+def test_snapshot_without_package_weight():
+    product = _make_product(peso_empaque=None, iva_percentage=None)
+    snapshot = product.pricing_snapshot()
+
+    assert snapshot.costo_paquete == Decimal("0.75")
+    assert snapshot.iva_mayorista == Decimal("0.225")
+    assert snapshot.precio_mayorista == Decimal("1.071429")
+
+
+def test_price_matrix_matches_snapshot():
+    product = _make_product()
+    snapshot = product.pricing_snapshot()
+
+    matriz = calcular_matriz_precios(
+        snapshot,
+        [Decimal("100"), Decimal("250")],
+        [Decimal("20"), Decimal("30"), Decimal("40")],
+        [Decimal("12"), Decimal("21")]
+    )
+
+    assert matriz["costos_paquete"] == [Decimal("1.01"), snapshot.costo_paquete]
+    assert len(matriz["precios"]) == 2 and len(matriz["precios"][0]) == 3
+    assert matriz["precios"][1] == [snapshot.precio_distribuidor, snapshot.precio_mayorista, snapshot.precio_publico]
+    assert matriz["precios_con_iva"][1][2][1] == snapshot.precio_publico_con_iva
+    # 1.01 / 0.8 * 1.12, rounded once
+    assert matriz["precios_con_iva"][0][0][0] == Decimal("1.414")
+
+
+def test_fixed_point_helpers():
+    assert to_micro(Decimal("0.0034565")) == 3457
+    assert to_micro(Decimal("-0.0000005")) == -1
+    assert to_micro(12) == 12000000
+    assert round_div(5, 2) == 3
+    assert round_div(-5, 2) == -3
+    assert round_div(7, -2) == -4
+    assert str(from_micro(1500000)) == "1.500000"
+
+
+def test_round_div_breaks_exact_ties_away_from_zero():
+    # Exact halves always move away from zero, never to the even neighbour
+    assert [round_div(n, 2) for n in (1, 3, 5, -1, -3, -5)] == [1, 2, 3, -1, -2, -3]
+    assert round_div(25, 10) == 3 and round_div(-25, 10) == -3
+    # Just below and above a tie round to the nearest value
+    assert round_div(24, 10) == 2 and round_div(26, 10) == 3
+    # iva_distribuidor of the first golden case is exactly 0.4090625: it rounds up to
+    # 0.409063, where the previous 28-digit Decimal path produced 0.40906249... and 0.409062
+    assert round_div(4090625, 10) == 409063
+    assert from_micro(round_div(4090625, 10)) == Decimal("0.409063")
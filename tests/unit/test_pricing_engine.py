@@ -0,0 +1,170 @@
+import pytest
+from decimal import Decimal
+from fastapi import HTTPException
+
+from app.models.material import Material
+from app.models.material_unit import MaterialUnit
+from app.models.product import Product, ProductMaterial
+from app.models.user import User
+from app.services.pricing_engine import price_catalog
+from app.schemas.product import CostQuoteLine, CostQuoteRequest
+from app.services.product_service import calculate_cost_quote, calculate_total_costs, get_products, _build_product_response
+
+
+@pytest.fixture
+def catalog(session):
+    user = User(username="engine", email="engine@example.com", hashed_password="x")
+    session.add(user)
+    session.flush()
+
+    materials = [
+        Material(user_id=user.id, nombre=f"Material {i}", precio_base=Decimal("3.45") + i,
+                 precio_unidad_pequena=(Decimal("3.45") + i) / 1000)
+        for i in range(4)
+    ]
+    materials[3].is_active = False
+    session.add_all(materials)
+    session.flush()
+
+    for i in range(6):
+        product = Product(
+            user_id=user.id,
+            nombre=f"Producto {i}",
+            iva_percentage=Decimal("12"),
+            margen_publico=Decimal("45"),
+            margen_mayorista=Decimal("30"),
+            margen_distribuidor=Decimal("15"),
+            costo_transporte=Decimal("0.35"),
+            costo_etiqueta=Decimal("0.10"),
+            peso_final_producido=Decimal("950") if i % 2 else None,
+            peso_empaque=Decimal("250") if i != 5 else None,
+        )
+        for j, material in enumerate(materials[: (i % 4) + 1]):
+            product.product_materials.append(
+                ProductMaterial(material_id=material.id, cantidad=Decimal(100 * (j + 1) + i))
+            )
+        session.add(product)
+
+    session.commit()
+    return user
+
+
+def test_price_catalog_matches_per_object_pricing(session, catalog):
+    products = session.query(Product).all()
+    pricing = price_catalog(session, catalog, products)
+
+    for product in products:
+        assert pricing.snapshots[product.id] == product.pricing_snapshot()
+
+
+def test_get_products_matches_per_object_response(session, catalog):
+    responses = get_products(session, catalog)
+
+    assert len(responses) == 6
+    for response in responses:
+        product = session.get(Product, response.id)
+        assert response == _build_product_response(product)
+
+
+def test_calculate_total_costs(session, catalog):
+    result = calculate_total_costs(session, catalog)
+
+    products = session.query(Product).all()
+    assert result.total_productos == 6
+    assert result.costo_total_general == sum(p.calcular_costo_total() for p in products)
+    assert [p.materiales_count for p in result.productos] == [len(p.product_materials) for p in products]
+
+
+def test_sql_price_expressions_match_snapshot(session, catalog):
+    columns = [
+        "costo_materiales", "costo_por_gramo", "costo_paquete", "precio_publico",
+        "precio_mayorista_con_iva", "iva_distribuidor", "precio_distribuidor_con_iva",
+    ]
+    rows = session.query(Product, *[getattr(Product, column) for column in columns]).all()
+
+    for product, *values in rows:
+        for column, value in zip(columns, values):
+            assert Decimal(str(value)) == pytest.approx(getattr(product, column), abs=Decimal("0.000001"))
+
+
+def test_get_products_filters_and_sorts_by_price_in_database(session, catalog):
+    precios = sorted(p.precio_mayorista_con_iva for p in session.query(Product).all())
+    low, high = precios[1], precios[-2]
+
+    responses = get_products(session, catalog, min_price=low, max_price=high,
+                             sort_by="-precio", tipo_cliente="mayorista")
+
+    assert [r.precio_mayorista_con_iva for r in responses] == sorted(
+        (p for p in precios if low <= p <= high), reverse=True
+    )
+
+    first_page = get_products(session, catalog, limit=2, sort_by="precio", tipo_cliente="mayorista")
+    assert [r.precio_mayorista_con_iva for r in first_page] == precios[:2]
+
+
+def test_get_products_rejects_unknown_sort(session, catalog):
+    with pytest.raises(HTTPException):
+        get_products(session, catalog, sort_by="color")
+    with pytest.raises(HTTPException):
+        get_products(session, catalog, min_price=Decimal("1"), tipo_cliente="vip")
+
+
+def test_cost_quote_prices_every_line_from_one_evaluation(session, catalog):
+    products = session.query(Product).order_by(Product.id).all()
+    request = CostQuoteRequest(lines=[
+        CostQuoteLine(product_id=products[0].id, quantity=Decimal("2.5"), unit="kg"),
+        CostQuoteLine(product_id=products[1].id, quantity=Decimal("1"), unit="galon"),
+        CostQuoteLine(product_id=products[0].id, quantity=Decimal("300"), unit="g"),
+    ])
+
+    quote = calculate_cost_quote(session, request, catalog)
+
+    assert [line.gramos for line in quote.lines] == [Decimal("2500.0"), Decimal("3785.411784"), Decimal("300")]
+    costo_por_gramo = products[0].pricing_snapshot().costo_por_gramo
+    assert quote.lines[0].costo_por_gramo == costo_por_gramo
+    # 100g of material 0 per 100g of recipe: cost per gram is the material price
+    assert quote.lines[0].costo_total == Decimal("8.625")
+    assert quote.costo_total == sum(line.costo_total for line in quote.lines)
+
+
+def test_cost_quote_converts_material_lines_with_their_own_units(session, catalog):
+    material = session.query(Material).filter(Material.nombre == "Material 0").one()
+    material.densidad = Decimal("0.92")
+    material.unidades.append(MaterialUnit(nombre="caneca", cantidad=Decimal("20"), unidad="l"))
+    product = session.query(Product).order_by(Product.id).first()
+    session.commit()
+
+    quote = calculate_cost_quote(session, CostQuoteRequest(lines=[
+        CostQuoteLine(material_id=material.id, quantity=Decimal("1"), unit="caneca"),
+        CostQuoteLine(material_id=material.id, quantity=Decimal("2"), unit="l"),
+        CostQuoteLine(product_id=product.id, quantity=Decimal("2"), unit="l"),
+    ]), catalog)
+
+    # 20 l at 0.92 g/ml; the product has no density and converts as water
+    assert [line.gramos for line in quote.lines] == [Decimal("18400"), Decimal("1840"), Decimal("2000")]
+    assert quote.lines[0].costo_total == Decimal("63.48")
+    assert (quote.lines[0].material_id, quote.lines[0].nombre) == (material.id, "Material 0")
+
+    with pytest.raises(HTTPException) as exc:
+        calculate_cost_quote(session, CostQuoteRequest(lines=[
+            CostQuoteLine(product_id=product.id, quantity=Decimal("1"), unit="caneca")
+        ]), catalog)
+    assert exc.value.status_code == 400
+    with pytest.raises(ValueError):
+        CostQuoteLine(product_id=product.id, material_id=material.id, quantity=Decimal("1"))
+
+
+def test_cost_quote_rejects_unknown_units_and_products(session, catalog):
+    product = session.query(Product).first()
+
+    with pytest.raises(HTTPException) as exc:
+        calculate_cost_quote(session, CostQuoteRequest(lines=[
+            CostQuoteLine(product_id=product.id, quantity=Decimal("1"), unit="barril")
+        ]), catalog)
+    assert exc.value.status_code == 400
+
+    with pytest.raises(HTTPException) as exc:
+        calculate_cost_quote(session, CostQuoteRequest(lines=[
+            CostQuoteLine(product_id=product.id + 1000, quantity=Decimal("1"), unit="kg")
+        ]), catalog)
+    assert exc.value.status_code == 404
@@ -0,0 +1,75 @@
+import pytest
+from decimal import Decimal as D
+
+from app.models.material import Material
+from app.models.product import Product, ProductMaterial
+
+
+# Values produced by the previous Decimal implementation, rounded half up to 6 decimals
+GOLDEN = [
+    (
+        dict(iva_percentage=D("21"), margen_publico=D("40"), margen_mayorista=D("30"), margen_distribuidor=D("20"),
+             costo_transporte=D("0.50"), costo_envase=D("0.25"), peso_final_producido=D("900"), peso_empaque=D("250")),
+        [(D("0.003450"), D("600"), True), (D("0.002100"), D("400"), True)],
+        ["2.910000", "0.003233", "1.558333", "2.597222", "2.226190", "1.947917",
+         # iva_distribuidor is exactly 0.4090625; the old 28-digit intermediate gave 0.40906249...
+         "0.545417", "0.467500", "0.409063", "3.142639", "2.693690", "2.356979"],
+    ),
+    (
+        dict(iva_percentage=D("12"), margen_publico=D("45.50"), margen_mayorista=D("33.33"), margen_distribuidor=D("17.25"),
+             costo_transporte=D("0.35"), costo_etiqueta=D("0.12"), costo_caja=D("0.07"), peso_final_producido=None,
+             peso_empaque=D("1000")),
+        [(D("0.004567"), D("123.45"), True), (D("0.000890"), D("876.55"), True), (D("0.010000"), D("50"), False)],
+        ["1.343926", "0.001344", "1.883926", "3.456744", "2.825747", "2.276647",
+         "0.414809", "0.339090", "0.273198", "3.871554", "3.164837", "2.549845"],
+    ),
+    (
+        dict(iva_percentage=None, margen_publico=D("60"), margen_mayorista=D("35"), margen_distribuidor=D("0"),
+             costo_transporte=D("1.10"), costo_mano_obra=D("0.40"), peso_final_producido=D("3785"), peso_empaque=D("3785")),
+        [(D("0.001234"), D("2000"), True), (D("0.000777"), D("1500.50"), True), (D("0.003000"), D("333.33"), True)],
+        ["4.633879", "0.001224", "6.133879", "15.334696", "9.436736", "6.133879",
+         "3.220286", "1.981715", "1.288114", "18.554982", "11.418451", "7.421993"],
+    ),
+    (
+        dict(iva_percentage=D("15"), margen_publico=D("99.99"), margen_mayorista=D("50"), margen_distribuidor=D("25"),
+             costo_transporte=D("0.00"), peso_final_producido=D("0"), peso_empaque=None),
+        [(D("0.002500"), D("10"), True)],
+        ["0.025000", "0.002500", "0.000000", "0.000000", "0.000000", "0.000000",
+         "0.000000", "0.000000", "0.000000", "0.000000", "0.000000", "0.000000"],
+    ),
+    (
+        dict(iva_percentage=D("22"), margen_publico=D("38"), margen_mayorista=D("27"), margen_distribuidor=D("14"),
+             costo_transporte=D("0.75"), costo_energia=D("0.03"), costo_financiero=D("0.02"),
+             peso_final_producido=D("475.50"), peso_empaque=D("100")),
+        [],
+        ["0.000000", "0.000000", "0.800000", "1.290323", "1.095890", "0.930233",
+         "0.283871", "0.241096", "0.204651", "1.574194", "1.336986", "1.134884"],
+    ),
+    (
+        dict(iva_percentage=D("21"), margen_publico=D("42.5"), margen_mayorista=D("31.75"), margen_distribuidor=D("22.2"),
+             costo_transporte=D("0.33"), costo_envase=D("0.19"), costo_depreciacion=D("0.011"),
+             peso_final_producido=D("950"), peso_empaque=D("333")),
+        [(D("0.003333"), D("333.33"), True), (D("0.001111"), D("666.67"), True), (D("0.007777"), D("12.34"), True)],
+        ["1.947627", "0.002050", "1.213695", "2.110773", "1.778307", "1.560019",
+         "0.443262", "0.373445", "0.327604", "2.554036", "2.151752", "1.887623"],
+    ),
+]
+
+FIELDS = [
+    "costo_materiales", "costo_por_gramo", "costo_paquete",
+    "precio_publico", "precio_mayorista", "precio_distribuidor",
+    "iva_publico", "iva_mayorista", "iva_distribuidor",
+    "precio_publico_con_iva", "precio_mayorista_con_iva", "precio_distribuidor_con_iva",
+]
+
+
+@pytest.mark.parametrize("fields,lines,expected", GOLDEN)
+def test_pricing_matches_golden_values(fields, lines, expected):
+    product = Product(nombre="Golden", **fields)
+    for i, (precio, cantidad, activo) in enumerate(lines):
+        material = Material(nombre=f"M{i}", precio_base=precio * 1000, precio_unidad_pequena=precio, is_active=activo)
+        product.product_materials.append(ProductMaterial(material=material, cantidad=cantidad))
+
+    snapshot = product.pricing_snapshot()
+
+    assert [str(getattr(snapshot, field)) for field in FIELDS] == expected
@@ -0,0 +1,119 @@
+import io
+import json
+
+import pytest
+from decimal import Decimal
+from sqlalchemy import event, text
+
+from app.models.material import Material
+from app.models.product import Product, ProductMaterial
+from app.models.product_cost_snapshot import ProductCostSnapshot
+from app.models.user import User
+from app.services.product_import_service import import_products, read_csv, read_ndjson
+
+
+@pytest.fixture
+def user(session):
+    user = User(username="importer", email="import@example.com", hashed_password="x")
+    session.add(user)
+    session.flush()
+    session.add_all([
+        Material(user_id=user.id, nombre="Aceite", precio_base=Decimal("6"), precio_unidad_pequena=Decimal("0.006")),
+        Material(user_id=user.id, nombre="Soda", precio_base=Decimal("2"), precio_unidad_pequena=Decimal("0.002")),
+    ])
+    session.add(Product(user_id=user.id, nombre="Existente", margen_publico=40, margen_mayorista=30,
+                        margen_distribuidor=20, costo_transporte=Decimal("0")))
+    session.commit()
+    return user
+
+
+CSV = """nombre,margen_publico,margen_mayorista,margen_distribuidor,costo_transporte,peso_empaque,material,cantidad
+Jabon,40,30,20,0.5,100,Aceite,800
+Jabon,40,30,20,0.5,100,Soda,150
+Jabon,40,30,20,0.5,100,Soda,50
+Vela,40,30,20,0,,Aceite,100
+Existente,40,30,20,0,,Aceite,100
+Roto,40,30,20,0,,Cera,100
+Sin margen,,30,20,0,,Aceite,100
+"""
+
+
+def test_csv_import_reports_row_errors_without_aborting(session, user):
+    result = import_products(session, user, read_csv(io.StringIO(CSV)))
+
+    assert result.created == 2
+    assert result.failed == 3
+    errores = {error.nombre: error for error in result.errors}
+    assert errores["Existente"].line == 6
+    assert "already exists" in errores["Existente"].error
+    assert "'Cera' not found" in errores["Roto"].error
+    assert "margen_publico" in errores["Sin margen"].error
+
+    jabon = session.query(Product).filter(Product.nombre == "Jabon").one()
+    # Repeated materials are merged into one recipe line
+    cantidades = {pm.material.nombre: pm.cantidad for pm in jabon.product_materials}
+    assert cantidades == {"Aceite": Decimal("800"), "Soda": Decimal("200")}
+    assert jabon.peso_empaque == Decimal("100")
+
+    # Cost snapshots are written as part of the import
+    snapshot = session.query(ProductCostSnapshot).filter(ProductCostSnapshot.product_id == jabon.id).one()
+    assert snapshot.costo_materiales == jabon.calcular_costo_total()
+
+
+def test_ndjson_import_queries_per_chunk_not_per_row(session, user):
+    aceite = session.query(Material).filter(Material.nombre == "Aceite").one()
+    lines = [
+        json.dumps({
+            "nombre": f"Producto {i}", "margen_publico": 40, "margen_mayorista": 30, "margen_distribuidor": 20,
+            "costo_transporte": "0.25",
+            "product_materials": [{"material_id": aceite.id, "cantidad": "100"}, {"material": "Soda", "cantidad": str(10 + i)}]
+        })
+        for i in range(40)
+    ]
+    lines.insert(3, "{not json")
+    lines.append(json.dumps({"nombre": "Producto 0", "margen_publico": 40, "margen_mayorista": 30,
+                             "margen_distribuidor": 20, "costo_transporte": "0"}))
+
+    selects = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            selects.append(statement)
+
+    event.listen(session.get_bind(), "before_cursor_execute", count)
+    try:
+        result = import_products(session, user, read_ndjson(lines), chunk_size=1000)
+    finally:
+        event.remove(session.get_bind(), "before_cursor_execute", count)
+
+    assert result.created == 40
+    assert [(error.line, error.error.split(":")[0]) for error in result.errors] == [
+        (4, "Invalid JSON"), (42, "Product name already exists for this user")
+    ]
+    assert session.query(ProductMaterial).count() == 80
+    # Material lookup and name check once for the whole chunk, whatever its size
+    assert len(selects) < 15
+
+
+def test_rows_rejected_by_the_database_fail_alone(session, user):
+    # Stands in for a constraint the validation cannot see, e.g. a concurrent insert of the same name
+    session.execute(text(
+        "CREATE TRIGGER reject_product BEFORE INSERT ON products WHEN NEW.nombre = 'Rechazado' "
+        "BEGIN SELECT RAISE(ABORT, 'rejected'); END"
+    ))
+    session.commit()
+    lines = [
+        json.dumps({"nombre": nombre, "margen_publico": 40, "margen_mayorista": 30, "margen_distribuidor": 20,
+                    "costo_transporte": "0", "product_materials": [{"material": "Aceite", "cantidad": "100"}]})
+        for nombre in ("Uno", "Rechazado", "Dos")
+    ]
+
+    result = import_products(session, user, read_ndjson(lines))
+
+    assert result.created == 2
+    assert [(error.line, error.nombre, error.error) for error in result.errors] == [
+        (2, "Rechazado", "Database error: IntegrityError")
+    ]
+    nombres = {product.nombre for product in session.query(Product).filter(Product.id.in_(result.product_ids))}
+    assert nombres == {"Uno", "Dos"}
+    assert session.query(ProductMaterial).filter(ProductMaterial.product_id.in_(result.product_ids)).count() == 2
@@ -0,0 +1,199 @@
+import pytest
+from contextlib import contextmanager
+from decimal import Decimal
+from fastapi import HTTPException
+from sqlalchemy import event
+
+from app.models.material import Material
+from app.models.product import Product, ProductComponent, ProductMaterial
+from app.models.product_cost_snapshot import ProductCostSnapshot
+from app.models.user import User
+from app.schemas.product import (
+    ProductBulkDuplicateRequest, ProductCreate, ProductDuplicateItem, ProductMaterialCreate, ProductUpdate
+)
+from app.services.product_service import (
+    create_product, duplicate_product, duplicate_product_bulk, update_product
+)
+
+
+@pytest.fixture
+def materials(session):
+    user = User(username="writer", email="writer@example.com", hashed_password="x")
+    session.add(user)
+    session.flush()
+    materials = [
+        Material(user_id=user.id, nombre=f"Material {i}", precio_base=Decimal("2") + i,
+                 precio_unidad_pequena=(Decimal("2") + i) / 1000)
+        for i in range(30)
+    ]
+    session.add_all(materials)
+    session.commit()
+    return user, materials
+
+
+@contextmanager
+def count_statements(session):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(session.get_bind(), "before_cursor_execute", count)
+    try:
+        yield statements
+    finally:
+        event.remove(session.get_bind(), "before_cursor_execute", count)
+
+
+def _product(nombre, materials, cantidad="100"):
+    return ProductCreate(
+        nombre=nombre, margen_publico=40, margen_mayorista=30, margen_distribuidor=20,
+        costo_transporte=Decimal("0.5"),
+        product_materials=[ProductMaterialCreate(material_id=m.id, cantidad=Decimal(cantidad)) for m in materials]
+    )
+
+
+def test_create_product_statement_count_does_not_grow_with_recipe(session, materials):
+    user, materials = materials
+
+    pequeno = _product("Pequeno", materials[:2])
+    grande = _product("Grande", materials[:25])
+
+    with count_statements(session) as small:
+        create_product(session, pequeno, user)
+    with count_statements(session) as large:
+        create_product(session, grande, user)
+
+    assert len(large) == len(small)
+
+
+def test_update_product_writes_only_changed_lines(session, materials):
+    user, materials = materials
+    product = create_product(session, _product("Jabon", materials[:3]), user)
+    ids_before = {pm.material_id: pm.id for pm in product.product_materials}
+
+    cambios = ProductUpdate(product_materials=[
+        ProductMaterialCreate(material_id=materials[0].id, cantidad=Decimal("100")),  # unchanged
+        ProductMaterialCreate(material_id=materials[1].id, cantidad=Decimal("250")),  # changed
+        ProductMaterialCreate(material_id=materials[3].id, cantidad=Decimal("50")),   # added; materials[2] removed
+    ])
+    with count_statements(session) as statements:
+        result = update_product(session, product.id, cambios, user)
+
+    writes = [s.split()[0].upper() for s in statements if s.split()[0].upper() in ("INSERT", "UPDATE", "DELETE")]
+    assert writes.count("DELETE") == 1
+    assert "INSERT" in writes
+
+    lines = {pm.material_id: pm for pm in result.product_materials}
+    assert set(lines) == {materials[0].id, materials[1].id, materials[3].id}
+    assert lines[materials[0].id].id == ids_before[materials[0].id]
+    assert lines[materials[1].id].id == ids_before[materials[1].id]
+    assert lines[materials[1].id].cantidad == Decimal("250")
+    assert session.query(ProductMaterial).count() == 3
+
+
+def test_update_product_statement_count_does_not_grow_with_recipe(session, materials):
+    user, materials = materials
+    small = create_product(session, _product("Pequeno", materials[:2]), user)
+    large = create_product(session, _product("Grande", materials[:20]), user)
+
+    def replace_recipe(recipe):
+        return ProductUpdate(product_materials=[
+            ProductMaterialCreate(material_id=m.id, cantidad=Decimal("75")) for m in recipe
+        ])
+
+    # Change every quantity, drop one line and add another on both products
+    small_update = replace_recipe(materials[1:3])
+    large_update = replace_recipe(materials[1:21])
+    with count_statements(session) as small_statements:
+        update_product(session, small.id, small_update, user)
+    with count_statements(session) as large_statements:
+        update_product(session, large.id, large_update, user)
+
+    assert len(large_statements) == len(small_statements)
+
+
+def test_recipe_validation_errors(session, materials):
+    user, materials = materials
+    duplicated = _product("Duplicado", [materials[0], materials[0]])
+    with pytest.raises(HTTPException) as exc:
+        create_product(session, duplicated, user)
+    assert exc.value.status_code == 400
+    assert "Material 0" in exc.value.detail
+
+    missing = _product("Inexistente", materials[:1])
+    missing.product_materials.append(ProductMaterialCreate(material_id=9999, cantidad=Decimal("1")))
+    with pytest.raises(HTTPException) as exc:
+        create_product(session, missing, user)
+    assert exc.value.status_code == 404
+
+
+def _sizes(*pesos):
+    return ProductBulkDuplicateRequest(variantes=[
+        ProductDuplicateItem(nombre=f"Jabon {peso}g", peso_empaque=Decimal(peso)) for peso in pesos
+    ])
+
+
+def test_bulk_duplicate_prices_every_size_from_one_recipe(session, materials):
+    user, materials = materials
+    base = create_product(session, _product("Base", materials[:2]), user)
+    original = create_product(session, _product("Jabon", materials[2:5]), user)
+    session.add(ProductComponent(product_id=original.id, component_product_id=base.id, cantidad=Decimal("40")))
+    session.commit()
+
+    responses = duplicate_product_bulk(session, original.id, _sizes(100, 250, 500, 1000, 5000), user)
+
+    assert [r.peso_empaque for r in responses] == [100, 250, 500, 1000, 5000]
+    session.expire_all()
+    for response in responses:
+        duplicate = session.get(Product, response.id)
+        precios = duplicate.pricing_snapshot()
+        assert response.precio_publico_con_iva == precios.precio_publico_con_iva
+        assert response.costo_por_gramo == precios.costo_por_gramo
+        assert {pm.material_id for pm in duplicate.product_materials} == {m.id for m in materials[2:5]}
+        assert [pc.component_product_id for pc in duplicate.components] == [base.id]
+        assert [line.id for line in response.product_materials] == [pm.id for pm in duplicate.product_materials]
+        snapshot = session.query(ProductCostSnapshot).filter(ProductCostSnapshot.product_id == duplicate.id).one()
+        assert snapshot.precio_publico_con_iva == precios.precio_publico_con_iva
+
+
+def test_duplicate_keeps_intermediate_bases(session, materials):
+    user, materials = materials
+    base = create_product(session, _product("Base", materials[:2]), user)
+    original = create_product(session, _product("Jabon", materials[2:5]), user)
+    session.add(ProductComponent(product_id=original.id, component_product_id=base.id, cantidad=Decimal("40")))
+    session.commit()
+
+    response = duplicate_product(session, original.id, "Jabon copia", original.peso_empaque, user)
+
+    session.expire_all()
+    duplicate = session.get(Product, response.id)
+    assert [pc.component_product_id for pc in duplicate.components] == [base.id]
+    assert [pc.cantidad for pc in duplicate.components] == [Decimal("40")]
+    precios = session.get(Product, original.id).pricing_snapshot()
+    assert duplicate.pricing_snapshot().costo_por_gramo == precios.costo_por_gramo
+    snapshot = session.query(ProductCostSnapshot).filter(ProductCostSnapshot.product_id == duplicate.id).one()
+    assert snapshot.precio_publico_con_iva == precios.precio_publico_con_iva
+
+
+def test_bulk_duplicate_statement_count_does_not_grow_with_sizes(session, materials):
+    user, materials = materials
+    original = create_product(session, _product("Jabon", materials[:10]), user)
+
+    few, many = _sizes(100, 250), _sizes(500, 1000, 2000, 3000, 5000)
+    with count_statements(session) as small:
+        duplicate_product_bulk(session, original.id, few, user)
+    with count_statements(session) as large:
+        duplicate_product_bulk(session, original.id, many, user)
+    assert len(large) == len(small)
+
+
+def test_bulk_duplicate_rejects_existing_names(session, materials):
+    user, materials = materials
+    original = create_product(session, _product("Jabon", materials[:2]), user)
+    create_product(session, _product("Jabon 250g", materials[:1]), user)
+
+    with pytest.raises(HTTPException) as exc:
+        duplicate_product_bulk(session, original.id, _sizes(100, 250), user)
+    assert exc.value.status_code == 400 and "Jabon 250g" in exc.value.detail
+    assert session.query(Product).count() == 2
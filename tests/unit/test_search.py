@@ -0,0 +1,119 @@
+import pytest
+from datetime import datetime
+from decimal import Decimal
+from fastapi import HTTPException
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql
+
+from app.models.inventory import Inventory
+from app.models.material import Material
+from app.models.product import Product
+from app.models.user import User
+from app.services import search_service
+from app.services.search_service import clear_search_indexes, parse_search_types, search, search_statement
+
+
+@pytest.fixture(autouse=True)
+def fresh_indexes():
+    clear_search_indexes()
+    yield
+    clear_search_indexes()
+
+
+def _product(user, nombre, **extra):
+    return Product(user_id=user.id, nombre=nombre, margen_publico=Decimal("40"), margen_mayorista=Decimal("30"),
+                   margen_distribuidor=Decimal("20"), costo_transporte=Decimal("0"), **extra)
+
+
+@pytest.fixture
+def catalog(session):
+    user = User(username="finder", email="finder@example.com", hashed_password="x")
+    session.add(user)
+    session.flush()
+    products = [_product(user, nombre) for nombre in ("Jabon de coco", "Jabon", "Aceite de Coco", "Champu")]
+    products.append(_product(user, "Coco retirado", is_active=False))
+    session.add_all(products)
+    session.add(Material(user_id=user.id, nombre="Coco rallado", precio_base=Decimal("4"),
+                         precio_unidad_pequena=Decimal("0.004")))
+    session.flush()
+    session.add(Inventory(user_id=user.id, product_id=products[0].id, lote="COCO-2026",
+                          fecha_produccion=datetime(2026, 1, 1), cantidad_producida=Decimal("10"),
+                          costo_unitario=Decimal("1"), costo_total=Decimal("10"), stock_actual=Decimal("10")))
+    session.commit()
+    session.refresh(user)
+    return user
+
+
+def _names(results):
+    return [(result.tipo, result.nombre, result.rank) for result in results]
+
+
+def test_results_are_ranked_across_types(session, catalog):
+    assert _names(search(session, catalog, "coco")) == [
+        ("material", "Coco rallado", 1),
+        ("lote", "COCO-2026", 1),
+        ("producto", "Aceite de Coco", 2),
+        ("producto", "Jabon de coco", 2),
+    ]
+    assert _names(search(session, catalog, "JABON")) == [("producto", "Jabon", 0), ("producto", "Jabon de coco", 1)]
+    # Every word of the query must start a word of the name
+    assert _names(search(session, catalog, "de co")) == [("producto", "Aceite de Coco", 2), ("producto", "Jabon de coco", 2)]
+    assert search(session, catalog, "oco") == []
+
+    lote = search(session, catalog, "coco", tipos=("lote",))
+    assert [(result.nombre, result.detalle) for result in lote] == [("COCO-2026", "Jabon de coco")]
+    assert len(search(session, catalog, "co", limit=2)) == 2
+
+
+def test_index_is_reused_until_the_catalog_changes(session, catalog, monkeypatch):
+    search(session, catalog, "jab")
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(session.get_bind(), "before_cursor_execute", record)
+    try:
+        search(session, catalog, "jabon d")
+        assert statements == []
+
+        # Revalidation of an unchanged catalog is the version aggregate alone
+        monkeypatch.setattr(search_service, "INDEX_REVALIDATE_SECONDS", 0)
+        search(session, catalog, "jabon d")
+        assert len(statements) == 1
+    finally:
+        event.remove(session.get_bind(), "before_cursor_execute", record)
+
+    session.add(_product(catalog, "Jabon de avena"))
+    session.commit()
+    assert [result.nombre for result in search(session, catalog, "jabon de")] == ["Jabon de avena", "Jabon de coco"]
+
+
+def test_search_types_are_validated():
+    assert parse_search_types(None) == ("producto", "material", "lote")
+    assert parse_search_types("lote, producto") == ("producto", "lote")
+    with pytest.raises(HTTPException) as exc:
+        parse_search_types("cliente")
+    assert exc.value.status_code == 400
+
+
+def test_postgres_statement_escapes_like_wildcards():
+    statement = search_statement(User(id=1), "50%_off", ("producto",), 5)
+    compiled = statement.compile(dialect=postgresql.dialect())
+
+    assert "LIKE" in str(compiled) and "ESCAPE '/'" in str(compiled)
+    assert "%50/%/_off%" in compiled.params.values()
+
+
+def test_search_endpoint(client):
+    client.post("/auth/register", json={"username": "searcher", "email": "searcher@example.com", "password": "pass"})
+    token = client.post("/auth/login", json={"username": "searcher", "password": "pass"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    client.post("/api/materials/", json={"nombre": "Glicerina", "precio_base": "5.00"}, headers=headers)
+
+    response = client.get("/api/search/?q=gli", headers=headers)
+    assert response.status_code == 200
+    assert [(item["tipo"], item["nombre"]) for item in response.json()] == [("material", "Glicerina")]
+
+    assert client.get("/api/search/?q=gli&tipos=cliente", headers=headers).status_code == 400